@@ -0,0 +1,292 @@
+"""
+Contains the buddhabrot command of the CLI
+"""
+
+import time
+
+from cli.common import display_header, display_cli_args, display_timings, console
+from fractals.backends import get_backend, backend_names, AUTO, BUDDHABROT
+from fractals.common import Plane2d, HsvColor, ComplexPlane, image_rgb, image_rgb_from_hsv, SAMPLING_MODES
+from fractals.checkpoint import BuddhabrotCheckpoint
+
+# Arguments saved in checkpoints and restored when resuming
+CHECKPOINT_PARAMETERS = ("width", "height", "re_start", "re_end", "im_start", "im_end", "max_iterations",
+                         "channel_iterations", "samples_per_thread", "total_samples", "sampling", "warmup_samples",
+                         "seed", "backend", "cuda_threads_per_block", "cuda_blocks")
+
+DESCRIPTION = "FractalGen: Buddhabrot Generator"
+
+
+def add_arguments(parser):
+    """
+    Add the arguments of the command to a parser
+
+    Args:
+        parser: Parser of the command
+    """
+
+    parser.add_argument("--width", required=False, type=int, default="1920",
+                        help="Width of the output image in pixels", dest="width")
+
+    parser.add_argument("--height", required=False, type=int, default="1080",
+                        help="Height of the output image in pixels", dest="height")
+
+    parser.add_argument("--real-start", required=False, type=float, default="-2.2",
+                        help="Minimum value of the real complex plane", dest="re_start")
+
+    parser.add_argument("--real-end", required=False, type=float, default="1.2",
+                        help="Maximum value of the real complex plane", dest="re_end")
+
+    parser.add_argument("--imag-start", required=False, type=float, default="-1.2",
+                        help="Minimum value of the imaginary complex plane", dest="im_start")
+
+    parser.add_argument("--imag-end", required=False, type=float, default="1.2",
+                        help="Maximum value of the imaginary complex plane", dest="im_end")
+
+    parser.add_argument("--iterations", required=False, type=int, default="200",
+                        help="Max iterations for orbital escape", dest="max_iterations")
+
+    parser.add_argument("--channel-iterations", required=False, type=int, nargs=3, default=None,
+                        help="Max iterations for orbital escape of the red, green and blue channels, to generate a "
+                             "nebulabrot in a single pass. Overrides --iterations.", dest="channel_iterations",
+                        metavar=("RED", "GREEN", "BLUE"))
+
+    parser.add_argument("--samples-per-thread", required=False, type=int, default="256",
+                        help="Number of samples to compute per CUDA thread. Ignored with the numba backend.",
+                        dest="samples_per_thread")
+
+    parser.add_argument("--total-samples", required=False, type=int, default="100000000",
+                        help="Total number of samples to distribute to CPU cores. Ignored with the cuda backend.",
+                        dest="total_samples")
+
+    parser.add_argument("--sampling", required=False, type=str, default="uniform", choices=SAMPLING_MODES,
+                        help="How samples are drawn. Metropolis sampling concentrates samples on orbits that cross "
+                             "the view, which helps zoomed renders.", dest="sampling")
+
+    parser.add_argument("--warmup-samples", required=False, type=int, default="1000",
+                        help="Number of warm-up mutations per Markov chain. Ignored with uniform sampling.",
+                        dest="warmup_samples")
+
+    parser.add_argument("--seed", required=False, type=int, default="3123",
+                        help="Seed of the random number generator used to draw samples", dest="seed")
+
+    parser.add_argument("--checkpoint", required=False, type=str, default=None,
+                        help="Directory where the histogram is periodically saved, so that the job can be resumed",
+                        dest="checkpoint_path")
+
+    parser.add_argument("--checkpoint-interval", required=False, type=float, default="600",
+                        help="Minimum number of seconds between two checkpoints", dest="checkpoint_interval")
+
+    parser.add_argument("--resume", required=False, action="store_true",
+                        help="Continue the job saved in the checkpoint, with the parameters it was started with",
+                        dest="resume")
+
+    parser.add_argument("--add-samples", required=False, type=int, default="0",
+                        help="Number of samples (per thread with the cuda backend) to add to the job saved in the "
+                             "checkpoint, e.g. to refine a finished job. Implies --resume.", dest="add_samples")
+
+    parser.add_argument("--shard-dir", required=False, type=str, default=None,
+                        help="Directory of the partial histograms of a sharded job. Unless --shard-index is given, "
+                             "the shards in it are merged into the output image.", dest="shard_dir")
+
+    parser.add_argument("--shard-index", required=False, type=int, default=None,
+                        help="Only trace the samples of this shard into --shard-dir, e.g. on one of several hosts",
+                        dest="shard_index")
+
+    parser.add_argument("--shard-count", required=False, type=int, default="1",
+                        help="Total number of shards of the job. Used with --shard-index, and to merge shards traced "
+                             "on several hosts.", dest="shard_count")
+
+    parser.add_argument("--allow-partial", required=False, action="store_true",
+                        help="Merge the shards in --shard-dir even if some are missing or have not finished",
+                        dest="allow_partial")
+
+    parser.add_argument("--workers", required=False, type=int, default="0",
+                        help="Number of local worker processes that each trace one shard into --shard-dir before "
+                             "the shards are merged", dest="workers")
+
+    parser.add_argument("--color-hue", required=False, type=int, default="204",
+                        help="Hue of the color used for the buddhabrot visualization", dest="color_hue")
+
+    parser.add_argument("--color-saturation", required=False, type=float, default="0.64",
+                        help="Saturation of the color used for the buddhabrot visualization",
+                        dest="color_saturation")
+
+    parser.add_argument("--color-intensity", required=False, type=float, default="8.0",
+                        help="Intensity of the color used for the buddhabrot visualization",
+                        dest="color_intensity")
+
+    parser.add_argument("--output-image", required=False, type=str, default="buddhabrot.png",
+                        help="Path of the output image file", dest="output_image_path")
+
+    parser.add_argument("--backend", required=False, type=str, default=AUTO, choices=backend_names(BUDDHABROT),
+                        help="Backend computing the buddhabrot: numba on the CPU cores or cuda. auto picks the "
+                             "fastest backend available. Sharded jobs always use numba.", dest="backend")
+
+    parser.add_argument("--use-gpu", required=False, action="store_const", const="cuda",
+                        help="Same as --backend cuda", dest="backend")
+
+    parser.add_argument("--threads", required=False, type=int, default=None,
+                        help="Number of threads of the numba backend, defaults to one per core", dest="threads")
+
+    parser.add_argument("--cuda-threads-per-block", required=False, type=int, default=None,
+                        help="Number of threads per block of the cuda backend, defaults to 256",
+                        dest="cuda_threads_per_block")
+
+    parser.add_argument("--cuda-blocks", required=False, type=int, default=None,
+                        help="Number of blocks of the cuda backend, defaults to 2048", dest="cuda_blocks")
+
+
+def check_arguments(parser, args):
+    """
+    Check the combinations of arguments that argparse cannot check
+
+    Args:
+        parser: Parser of the command, to report errors
+        args: CLI arguments from argparse
+    """
+
+    if (args.resume or args.add_samples > 0) and args.checkpoint_path is None:
+        parser.error("--resume and --add-samples require --checkpoint")
+
+    if (args.shard_index is not None or args.workers > 0 or args.allow_partial) and args.shard_dir is None:
+        parser.error("--shard-index, --workers and --allow-partial require --shard-dir")
+
+    if args.shard_dir is not None and (args.backend == "cuda" or args.checkpoint_path is not None):
+        parser.error("--shard-dir cannot be combined with --backend cuda or --checkpoint, shards are checkpointed "
+                     "already")
+
+    for name, value in (("--threads", args.threads), ("--cuda-threads-per-block", args.cuda_threads_per_block),
+                        ("--cuda-blocks", args.cuda_blocks)):
+        if value is not None and value <= 0:
+            parser.error(f"{name} must be positive")
+
+
+def create_buddhabrot(args):
+    from fractals.Buddhabrot import Buddhabrot
+
+    plane = Plane2d(args.width, args.height)
+    complex_plane = ComplexPlane(args.re_start, args.re_end, args.im_start, args.im_end)
+    hsv_color = HsvColor(args.color_hue, args.color_saturation, args.color_intensity)
+
+    return Buddhabrot(plane, complex_plane, args.max_iterations, hsv_color, args.channel_iterations)
+
+
+def create_backend(args):
+    # Shards are traced by processes on the CPU
+    name = "numba" if args.shard_dir is not None else args.backend
+
+    return get_backend(name, BUDDHABROT, threads=args.threads, threads_per_block=args.cuda_threads_per_block,
+                       total_blocks=args.cuda_blocks)
+
+
+def open_checkpoint(args):
+    """
+    Open the checkpoint of a resumed job and restore its parameters into args, or create the checkpoint of a new job
+
+    Args:
+        args: CLI arguments from argparse
+
+    Returns:
+        The checkpoint of the job
+    """
+
+    if args.resume or args.add_samples > 0:
+        if not BuddhabrotCheckpoint.exists(args.checkpoint_path):
+            raise SystemExit(f"No checkpoint found in {args.checkpoint_path}")
+
+        checkpoint = BuddhabrotCheckpoint.open(args.checkpoint_path)
+        for name, value in checkpoint.parameters.items():
+            setattr(args, name, value)
+
+        if args.add_samples > 0:
+            samples_name = "samples_per_thread" if args.backend == "cuda" else "total_samples"
+            setattr(args, samples_name, getattr(args, samples_name) + args.add_samples)
+            checkpoint.update_parameters(**{samples_name: getattr(args, samples_name)})
+
+        return checkpoint
+
+    if BuddhabrotCheckpoint.exists(args.checkpoint_path):
+        raise SystemExit(f"A checkpoint already exists in {args.checkpoint_path}, use --resume or --add-samples")
+
+    buddhabrot = create_buddhabrot(args)
+
+    return BuddhabrotCheckpoint.create(args.checkpoint_path, buddhabrot.counters_shape,
+                                       {name: getattr(args, name) for name in CHECKPOINT_PARAMETERS},
+                                       buddhabrot.counters_dtype(args.sampling))
+
+
+def main(args, started):
+    """
+    Run the command
+
+    Args:
+        args: CLI arguments from argparse
+        started: Value of time.perf_counter() when the process started, to time the startup
+    """
+
+    from fractals.sharding import run_shard, run_shards, merge_shards, shard_job
+
+    timings = {"Startup": time.perf_counter() - started}
+
+    # The auto backend is resolved before it is saved in a new checkpoint, resumed jobs restore their backend
+    args.backend = create_backend(args).name
+    checkpoint = open_checkpoint(args) if args.checkpoint_path is not None else None
+    backend = create_backend(args)
+
+    display_header()
+    display_cli_args("buddhabrot", args)
+
+    buddhabrot = create_buddhabrot(args)
+    image = image_rgb if buddhabrot.is_nebulabrot else image_rgb_from_hsv
+
+    console.print("Generating Buddhabrot fractal...", style="yellow")
+    if args.shard_dir is not None:
+        # Shards of another job, and missing or unfinished shards, are reported without a traceback
+        try:
+            if args.shard_index is not None:
+                run_shard(buddhabrot, args.shard_dir, args.shard_index, args.shard_count, args.total_samples,
+                          args.seed, args.sampling, args.warmup_samples, args.checkpoint_interval)
+
+                display_timings(timings)
+
+                console.print("Done.\n", style="green")
+                return
+
+            if args.workers > 0:
+                run_shards(buddhabrot, args.shard_dir, args.workers, args.total_samples, args.seed, args.sampling,
+                           args.warmup_samples, args.checkpoint_interval)
+
+            # Shards run by local workers are one per worker
+            shard_count = args.workers if args.workers > 0 else args.shard_count
+            job = shard_job(buddhabrot, shard_count, args.total_samples, args.seed, args.sampling, args.warmup_samples)
+
+            console.print("Merging shards...", style="yellow")
+            counters, samples = merge_shards(args.shard_dir, job, buddhabrot.counters_shape,
+                                             buddhabrot.counters_dtype(args.sampling), args.allow_partial)
+        except ValueError as error:
+            raise SystemExit(str(error))
+
+        console.print(f"Merged {samples} samples", style="yellow")
+
+        buddhabrot_image = image(buddhabrot.draw(counters))
+    elif backend.name == "cuda":
+        buddhabrot_image = image(buddhabrot.compute_gpu(args.samples_per_thread, args.seed, args.sampling,
+                                                        args.warmup_samples, checkpoint, args.checkpoint_interval,
+                                                        backend))
+    else:
+        buddhabrot_image = image(buddhabrot.compute(args.total_samples, args.seed, args.sampling,
+                                                    args.warmup_samples, checkpoint, args.checkpoint_interval,
+                                                    backend))
+
+    if buddhabrot.sampling_statistics is not None:
+        statistics = buddhabrot.sampling_statistics
+        console.print(f"Accepted {statistics.accepted} of {statistics.proposed} mutations "
+                      f"({statistics.acceptance_rate:.1%})", style="yellow")
+
+    console.print("Saving output image...", style="yellow")
+    buddhabrot_image.save(args.output_image_path)
+
+    display_timings(timings)
+
+    console.print("Done.\n", style="green")
@@ -0,0 +1,326 @@
+"""
+Contains the burningship command of the CLI
+"""
+
+import functools
+import time
+
+from cli.common import display_header, display_cli_args, display_timings, console, check_backend, escape_time_capability
+from cli.common import compute_progressive_field
+from fractals.backends import get_backend, backend_names, AUTO
+from fractals.common import Plane2d, HsvColor, ComplexPlane, timed, BURNING_SHIP_ENGINES, DeepZoomView
+from fractals.writers import resolve_format, EXTENSION_FORMATS, FORMATS
+
+DESCRIPTION = "FractalGen: Burning Ship Generator"
+
+
+def add_arguments(parser):
+    """
+    Add the arguments of the command to a parser
+
+    Args:
+        parser: Parser of the command
+    """
+
+    parser.add_argument("--width", required=False, type=int, default="1920",
+                        help="Width of the output image in pixels", dest="width")
+
+    parser.add_argument("--height", required=False, type=int, default="1080",
+                        help="Height of the output image in pixels", dest="height")
+
+    parser.add_argument("--real-start", required=False, type=float, default="-2.2",
+                        help="Minimum value of the real complex plane", dest="re_start")
+
+    parser.add_argument("--real-end", required=False, type=float, default="1.2",
+                        help="Maximum value of the real complex plane", dest="re_end")
+
+    parser.add_argument("--imag-start", required=False, type=float, default="-1.9",
+                        help="Minimum value of the imaginary complex plane", dest="im_start")
+
+    parser.add_argument("--imag-end", required=False, type=float, default="0.7",
+                        help="Maximum value of the imaginary complex plane", dest="im_end")
+
+    parser.add_argument("--iterations", required=False, type=int, default="100",
+                        help="Max iterations for orbital escape", dest="max_iterations")
+
+    parser.add_argument("--auto-iterations", required=False, action="store_true",
+                        help="Keep doubling the max iterations, only continuing the orbits that are still bounded, "
+                             "until the fraction of unresolved pixels on the boundary of the set stops changing. "
+                             "--iterations is the first max iterations.", dest="auto_iterations")
+
+    parser.add_argument("--iterations-limit", required=False, type=int, default="100000",
+                        help="Max iterations at which --auto-iterations stops", dest="iterations_limit")
+
+    parser.add_argument("--periodicity-check", required=False, action="store_true",
+                        help="Whether to stop iterating orbits that are detected to be periodic",
+                        dest="periodicity_check")
+
+    parser.add_argument("--periodicity-tolerance", required=False, type=float, default="1e-10",
+                        help="Distance under which an orbit is considered periodic", dest="periodicity_tolerance")
+
+    parser.add_argument("--color-hue", required=False, type=int, default="204",
+                        help="Hue of the color used for the burning ship visualization", dest="color_hue")
+
+    parser.add_argument("--color-saturation", required=False, type=float, default="0.64",
+                        help="Saturation of the color used for the burning ship visualization",
+                        dest="color_saturation")
+
+    parser.add_argument("--color-intensity", required=False, type=float, default="2.0",
+                        help="Intensity of the color used for the burning ship visualization",
+                        dest="color_intensity")
+
+    parser.add_argument("--output-image", required=False, type=str, default="burningship.png",
+                        help="Path of the output image file", dest="output_image_path")
+
+    parser.add_argument("--progressive", required=False, action="store_true",
+                        help="Compute the image progressively, from blocks of 32x32 pixels to single pixels in "
+                             "interlaced passes, and report the time of each frame", dest="progressive")
+
+    parser.add_argument("--progressive-tolerance", required=False, type=float, default="0.0",
+                        help="Fraction of the pixels of a pass that changed from the previous frame under which a "
+                             "progressive rendering stops early and saves its last frame, 0 to compute every pass",
+                        dest="progressive_tolerance")
+
+    parser.add_argument("--anti-aliasing", required=False, action="store_true",
+                        help="Supersample the pixels on edges, whose smooth iteration counts differ from those of a "
+                             "neighbour, with jittered sub-pixel samples", dest="anti_aliasing")
+
+    parser.add_argument("--aa-samples", required=False, type=int, default="4",
+                        help="Width and height of the grid of jittered samples of a pixel on an edge",
+                        dest="aa_samples")
+
+    parser.add_argument("--aa-threshold", required=False, type=float, default="1.0",
+                        help="Difference between the smooth iteration counts of neighbouring pixels above which they "
+                             "are on an edge", dest="aa_threshold")
+
+    parser.add_argument("--cache-dir", required=False, type=str, default=None,
+                        help="Directory of a tile cache. The image is assembled from tiles of 256x256 pixels on a grid "
+                             "at its pixel spacing, snapped to the nearest pixels of the grid, and only the tiles that "
+                             "are not in the cache are computed and added to it.", dest="cache_dir")
+
+    parser.add_argument("--save-field", required=False, type=str, default=None,
+                        help="Path of a .npz file to save the smooth iteration counts to, for recoloring with "
+                             "recolor-cli.py", dest="field_path")
+
+    parser.add_argument("--backend", required=False, type=str, default=AUTO, choices=backend_names(),
+                        help="Backend computing the burning ship: numba on the CPU cores, cuda, or numpy, which needs "
+                             "no compilation. auto picks the fastest backend available.", dest="backend")
+
+    parser.add_argument("--use-gpu", required=False, action="store_const", const="cuda",
+                        help="Same as --backend cuda", dest="backend")
+
+    parser.add_argument("--threads", required=False, type=int, default=None,
+                        help="Number of threads of the numba backend, defaults to one per core", dest="threads")
+
+    parser.add_argument("--cuda-block-size", required=False, type=int, default=None,
+                        help="Width and height in threads of the blocks of the cuda backend, defaults to 16",
+                        dest="cuda_block_size")
+
+    parser.add_argument("--engine", required=False, type=str, default="brute-force", choices=BURNING_SHIP_ENGINES,
+                        help="Engine used to compute the burning ship. mariani-silver is not supported, as the set is "
+                             "not simply connected.", dest="engine")
+
+    parser.add_argument("--zoom", required=False, type=str, default=None,
+                        help="Magnification of a deep zoom, as a decimal string. Replaces the complex plane with a "
+                             "view around --center-real and --center-imag, computed with perturbation. At zoom 1, "
+                             "the view is 3.4 wide.", dest="zoom")
+
+    parser.add_argument("--center-real", required=False, type=str, default="-0.5",
+                        help="Real part of the center of a deep zoom, as a decimal string", dest="center_real")
+
+    parser.add_argument("--center-imag", required=False, type=str, default="-0.6",
+                        help="Imaginary part of the center of a deep zoom, as a decimal string", dest="center_imag")
+
+    parser.add_argument("--tile-size", required=False, type=int, default=None,
+                        help="Width and height in pixels of tiles. When set, the image is rendered one tile at a time "
+                             "and streamed to --output-image, which must be in one of the formats of --format, so "
+                             "that images larger than memory can be rendered.", dest="tile_size")
+
+    parser.add_argument("--format", required=False, type=str, default=None, choices=FORMATS,
+                        help="Format of the output image: png compressed by several threads, uncompressed tiled tiff, "
+                             "or uncompressed row-major RGB as a npy array or raw bytes. Defaults to the format of "
+                             "the extension of --output-image, or to Pillow for other extensions.", dest="format")
+
+    parser.add_argument("--encoder-threads", required=False, type=int, default=None,
+                        help="Number of threads compressing png images, defaults to one per core",
+                        dest="encoder_threads")
+
+
+def check_arguments(parser, args):
+    """
+    Check the combinations of arguments that argparse cannot check
+
+    Args:
+        parser: Parser of the command, to report errors
+        args: CLI arguments from argparse
+    """
+
+    if args.zoom is not None:
+        from fractals.perturbation import parse_decimal
+
+        if args.auto_iterations:
+            parser.error("--zoom cannot be used with --auto-iterations")
+
+        if args.anti_aliasing:
+            parser.error("--zoom cannot be used with --anti-aliasing")
+
+        if args.progressive:
+            parser.error("--zoom cannot be used with --progressive")
+
+        if args.cache_dir is not None:
+            parser.error("--zoom cannot be used with --cache-dir")
+
+        try:
+            for value in (args.zoom, args.center_real, args.center_imag):
+                parse_decimal(value)
+        except ValueError as error:
+            parser.error(str(error))
+
+    if args.auto_iterations:
+        if args.tile_size is not None:
+            parser.error("--auto-iterations cannot be used with --tile-size")
+
+        if args.iterations_limit < args.max_iterations:
+            parser.error("--iterations-limit must be at least --iterations")
+
+    if args.progressive:
+        if args.auto_iterations:
+            parser.error("--progressive cannot be used with --auto-iterations")
+
+        if args.tile_size is not None:
+            parser.error("--progressive cannot be used with --tile-size")
+
+        if not 0.0 <= args.progressive_tolerance <= 1.0:
+            parser.error("--progressive-tolerance must be between 0 and 1")
+
+    if args.cache_dir is not None:
+        if args.auto_iterations:
+            parser.error("--cache-dir cannot be used with --auto-iterations")
+
+        if args.progressive:
+            parser.error("--cache-dir cannot be used with --progressive")
+
+        if args.tile_size is not None:
+            parser.error("--cache-dir cannot be used with --tile-size")
+
+    if args.anti_aliasing:
+        if args.tile_size is not None:
+            parser.error("--anti-aliasing cannot be used with --tile-size")
+
+        if args.aa_samples <= 0:
+            parser.error("--aa-samples must be positive")
+
+        if args.aa_threshold < 0.0:
+            parser.error("--aa-threshold cannot be negative")
+
+    check_backend(parser, args, escape_time_capability(args))
+
+    if args.threads is not None and args.threads <= 0:
+        parser.error("--threads must be positive")
+
+    if args.cuda_block_size is not None and args.cuda_block_size <= 0:
+        parser.error("--cuda-block-size must be positive")
+
+    if args.tile_size is not None:
+        if args.tile_size <= 0:
+            parser.error("--tile-size must be positive")
+
+        if args.field_path is not None:
+            parser.error("--tile-size cannot be used with --save-field")
+
+        if resolve_format(args.output_image_path, args.format) is None:
+            parser.error(f"--tile-size requires --format or an --output-image with one of the extensions "
+                         f"{', '.join(EXTENSION_FORMATS)}")
+
+    if args.encoder_threads is not None and args.encoder_threads <= 0:
+        parser.error("--encoder-threads must be positive")
+
+
+def main(args, started):
+    """
+    Run the command
+
+    Args:
+        args: CLI arguments from argparse
+        started: Value of time.perf_counter() when the process started, to time the startup
+    """
+
+    from fractals.BurningShip import BurningShip
+    from fractals.coloring import save_field
+    from fractals.refinement import deepen_until_stable
+    from fractals.tilecache import TileCache
+    from fractals.tiling import render_tiles
+    from fractals.writers import open_writer, save_image
+
+    timings = {"Startup": time.perf_counter() - started}
+
+    backend = get_backend(args.backend, escape_time_capability(args), threads=args.threads,
+                          block_size=args.cuda_block_size)
+    args.backend = backend.name
+
+    display_header()
+    display_cli_args("burning-ship", args)
+
+    plane = Plane2d(args.width, args.height)
+    complex_plane = ComplexPlane(args.re_start, args.re_end, args.im_start, args.im_end)
+    hsv_color = HsvColor(args.color_hue, args.color_saturation, args.color_intensity)
+
+    burning_ship = BurningShip(plane, complex_plane, args.max_iterations, hsv_color)
+
+    periodicity_tolerance = args.periodicity_tolerance if args.periodicity_check else 0.0
+
+    if args.zoom is not None:
+        view = DeepZoomView(args.center_real, args.center_imag, args.zoom)
+        compute_field = functools.partial(burning_ship.compute_deep_zoom_field, view, backend)
+    elif args.auto_iterations:
+        compute_field = functools.partial(deepen_until_stable, burning_ship, backend, periodicity_tolerance,
+                                          args.iterations_limit)
+    elif args.cache_dir is not None:
+        cache = TileCache(directory=args.cache_dir)
+        compute_field = functools.partial(burning_ship.compute_cached_field, cache, backend, periodicity_tolerance,
+                                          args.engine)
+    elif args.progressive:
+        compute_field = functools.partial(compute_progressive_field, burning_ship, backend, periodicity_tolerance,
+                                          args.progressive_tolerance)
+    else:
+        compute_field = functools.partial(burning_ship.compute_field, backend,
+                                          periodicity_tolerance=periodicity_tolerance, engine=args.engine)
+
+    if args.tile_size is not None:
+        console.print("Generating and streaming Burning Ship fractal tiles...", style="yellow")
+        with open_writer(args.output_image_path, plane, args.format, args.encoder_threads) as writer:
+            render_tiles(compute_field, burning_ship.colorize, plane, writer, args.tile_size, timings)
+
+            with timed(timings, "Encode"):
+                writer.close()
+    else:
+        console.print("Generating Burning Ship fractal...", style="yellow")
+        with timed(timings, "Compute"):
+            burning_ship_field = compute_field()
+
+        if args.auto_iterations:
+            console.print(f"Refined to {burning_ship.max_iterations} iterations", style="yellow")
+
+        if args.cache_dir is not None:
+            console.print(f"Tile cache: {cache.statistics.hits + cache.statistics.disk_hits} hits, "
+                          f"{cache.statistics.misses} misses", style="yellow")
+
+        if args.field_path is not None:
+            console.print("Saving field...", style="yellow")
+            save_field(args.field_path, burning_ship_field, burning_ship.max_iterations)
+
+        if args.anti_aliasing:
+            with timed(timings, "Anti-aliasing"):
+                burning_ship_pixels = burning_ship.anti_alias(burning_ship_field, backend, periodicity_tolerance,
+                                                              samples=args.aa_samples, threshold=args.aa_threshold)
+        else:
+            with timed(timings, "Colorize"):
+                burning_ship_pixels = burning_ship.colorize(burning_ship_field)
+
+        console.print("Saving output image...", style="yellow")
+        with timed(timings, "Encode"):
+            save_image(args.output_image_path, burning_ship_pixels, args.format, args.encoder_threads)
+
+    display_timings(timings)
+
+    console.print("Done.\n", style="green")
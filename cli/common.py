@@ -2,9 +2,14 @@
 Contains methods for the CLI
 """
 
+import time
+
 from rich.console import Console
 from rich.table import Table
 
+from fractals.backends import AUTO, BACKENDS, DEEP_ZOOM, REFINE, PROGRESSIVE
+from fractals.common import engine_capability
+
 console = Console()
 
 
@@ -30,42 +35,168 @@ def display_cli_args(fractal_type, args):
 
     if fractal_type in {"mandelbrot", "burning-ship"}:
         args_table.add_row("Iterations", str(args.max_iterations))
+        args_table.add_row("Auto Iterations", str(args.auto_iterations))
+        args_table.add_row("Iterations Limit", str(args.iterations_limit))
         args_table.add_row("Real Start", str(args.re_start))
         args_table.add_row("Real End", str(args.re_end))
         args_table.add_row("Imaginary Start", str(args.im_start))
         args_table.add_row("Imaginary End", str(args.im_end))
-        args_table.add_row("Use GPU", str(args.use_gpu))
+        args_table.add_row("Zoom", str(args.zoom))
+        args_table.add_row("Center Real", str(args.center_real))
+        args_table.add_row("Center Imaginary", str(args.center_imag))
+        args_table.add_row("Periodicity Check", str(args.periodicity_check))
+        args_table.add_row("Engine", str(args.engine))
+        args_table.add_row("Progressive", str(args.progressive))
+        args_table.add_row("Progressive Tolerance", str(args.progressive_tolerance))
+        args_table.add_row("Anti-aliasing", str(args.anti_aliasing))
+        args_table.add_row("AA Samples", str(args.aa_samples))
+        args_table.add_row("AA Threshold", str(args.aa_threshold))
+        args_table.add_row("Cache Directory", str(args.cache_dir))
+        args_table.add_row("Save Field", str(args.field_path))
+        args_table.add_row("Tile Size", str(args.tile_size))
+        args_table.add_row("Format", str(args.format))
+        args_table.add_row("Encoder Threads", str(args.encoder_threads))
+        args_table.add_row("Backend", str(args.backend))
     elif fractal_type == "julia":
         args_table.add_row("Iterations", str(args.max_iterations))
+        args_table.add_row("Auto Iterations", str(args.auto_iterations))
+        args_table.add_row("Iterations Limit", str(args.iterations_limit))
         args_table.add_row("Real Start", str(args.re_start))
         args_table.add_row("Real End", str(args.re_end))
         args_table.add_row("Imaginary Start", str(args.im_start))
         args_table.add_row("Imaginary End", str(args.im_end))
         args_table.add_row("CX", str(args.cx))
         args_table.add_row("CY", str(args.cy))
-        args_table.add_row("Use GPU", str(args.use_gpu))
+        args_table.add_row("Periodicity Check", str(args.periodicity_check))
+        args_table.add_row("Engine", str(args.engine))
+        args_table.add_row("Progressive", str(args.progressive))
+        args_table.add_row("Progressive Tolerance", str(args.progressive_tolerance))
+        args_table.add_row("Anti-aliasing", str(args.anti_aliasing))
+        args_table.add_row("AA Samples", str(args.aa_samples))
+        args_table.add_row("AA Threshold", str(args.aa_threshold))
+        args_table.add_row("Cache Directory", str(args.cache_dir))
+        args_table.add_row("Save Field", str(args.field_path))
+        args_table.add_row("Tile Size", str(args.tile_size))
+        args_table.add_row("Format", str(args.format))
+        args_table.add_row("Encoder Threads", str(args.encoder_threads))
+        args_table.add_row("Backend", str(args.backend))
+    elif fractal_type == "recolor":
+        args_table.add_row("Field", str(args.field_path))
+        args_table.add_row("Iterations", str(args.max_iterations))
     elif fractal_type == "buddhabrot":
-        if args.use_gpu:
+        if args.backend == "cuda":
             args_table.add_row("Iterations", str(args.max_iterations))
             args_table.add_row("Real Start", str(args.re_start))
             args_table.add_row("Real End", str(args.re_end))
             args_table.add_row("Imaginary Start", str(args.im_start))
             args_table.add_row("Imaginary End", str(args.im_end))
+            args_table.add_row("Channel Iterations", str(args.channel_iterations))
             args_table.add_row("Samples per thread", str(args.samples_per_thread))
-            args_table.add_row("Use GPU", "True")
+            args_table.add_row("Sampling", str(args.sampling))
+            args_table.add_row("Seed", str(args.seed))
+            args_table.add_row("Checkpoint", str(args.checkpoint_path))
+            args_table.add_row("Backend", str(args.backend))
         else:
             args_table.add_row("Iterations", str(args.max_iterations))
             args_table.add_row("Real Start", str(args.re_start))
             args_table.add_row("Real End", str(args.re_end))
             args_table.add_row("Imaginary Start", str(args.im_start))
             args_table.add_row("Imaginary End", str(args.im_end))
+            args_table.add_row("Channel Iterations", str(args.channel_iterations))
             args_table.add_row("Total samples", str(args.total_samples))
-            args_table.add_row("Use GPU", "False")
+            args_table.add_row("Sampling", str(args.sampling))
+            args_table.add_row("Seed", str(args.seed))
+            args_table.add_row("Checkpoint", str(args.checkpoint_path))
+            args_table.add_row("Shard Directory", str(args.shard_dir))
+            args_table.add_row("Backend", str(args.backend))
 
     console.print(args_table)
     print()
 
 
+def escape_time_capability(args):
+    """
+    Get the capability that backends need to compute an escape-time fractal
+
+    Args:
+        args: CLI arguments from argparse
+
+    Returns:
+        Capability of the backends, see fractals.backends
+    """
+
+    if getattr(args, "zoom", None) is not None:
+        return DEEP_ZOOM
+
+    if args.auto_iterations:
+        return REFINE
+
+    if getattr(args, "progressive", False):
+        return PROGRESSIVE
+
+    return engine_capability(args.engine)
+
+
+def check_backend(parser, args, capability):
+    """
+    Check that the backend of the CLI arguments can compute what is asked
+
+    Args:
+        parser: Parser of the command, to report errors
+        args: CLI arguments from argparse
+        capability: What the backend must be able to compute, see fractals.backends
+    """
+
+    if args.backend != AUTO and capability not in BACKENDS[args.backend].capabilities:
+        parser.error(f"--backend {args.backend} cannot compute {capability}")
+
+
+def compute_progressive_field(fractal, backend, periodicity_tolerance, tolerance):
+    """
+    Compute the field of an escape-time fractal progressively, and display each frame as it is computed
+
+    Args:
+        fractal: Escape-time fractal
+        backend: Backend computing the passes, see fractals.backends
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        tolerance: Fraction of the pixels of a pass that changed under which the rendering stops early
+
+    Returns:
+        Array of smooth iteration counts of the last frame computed
+    """
+
+    start = time.perf_counter()
+
+    for frame in fractal.compute_progressive(backend, periodicity_tolerance):
+        console.print(f"Frame of {frame.block_width}x{frame.block_height} blocks after "
+                      f"{time.perf_counter() - start:.3f} seconds, {frame.changed_fraction:.1%} of the pass changed")
+
+        if frame.changed_fraction < tolerance:
+            break
+
+    return frame.field
+
+
+def display_timings(timings):
+    """
+    Display the time spent in each stage in the form of a table
+
+    Args:
+        timings: Seconds spent in each stage, by name of stage
+    """
+
+    timings_table = Table(title="Timings")
+
+    timings_table.add_column("Stage", justify="left", no_wrap=True)
+    timings_table.add_column("Seconds", justify="right")
+
+    for stage, seconds in timings.items():
+        timings_table.add_row(stage, f"{seconds:.3f}")
+
+    console.print(timings_table)
+    print()
+
+
 def display_header():
     """
     Display program header (banner)
@@ -0,0 +1,78 @@
+"""
+Contains the recolor command of the CLI
+"""
+
+import time
+
+from cli.common import display_header, display_cli_args, display_timings, console
+from fractals.common import HsvColor
+
+DESCRIPTION = "FractalGen: Recolor a saved field of smooth iteration counts"
+
+
+def add_arguments(parser):
+    """
+    Add the arguments of the command to a parser
+
+    Args:
+        parser: Parser of the command
+    """
+
+    parser.add_argument("--field", required=True, type=str,
+                        help="Path of the .npz field saved with --save-field", dest="field_path")
+
+    parser.add_argument("--color-hue", required=False, type=int, default="204",
+                        help="Hue of the color used for the visualization", dest="color_hue")
+
+    parser.add_argument("--color-saturation", required=False, type=float, default="0.64",
+                        help="Saturation of the color used for the visualization", dest="color_saturation")
+
+    parser.add_argument("--color-intensity", required=False, type=float, default="3.0",
+                        help="Intensity of the color used for the visualization", dest="color_intensity")
+
+    parser.add_argument("--output-image", required=False, type=str, default="recolored.png",
+                        help="Path of the output image file", dest="output_image_path")
+
+
+def check_arguments(parser, args):
+    """
+    Check the combinations of arguments that argparse cannot check
+
+    Args:
+        parser: Parser of the command, to report errors
+        args: CLI arguments from argparse
+    """
+
+
+def main(args, started):
+    """
+    Run the command
+
+    Args:
+        args: CLI arguments from argparse
+        started: Value of time.perf_counter() when the process started, to time the startup
+    """
+
+    from fractals.coloring import load_field, colorize_field, rgb_lut
+    from fractals.writers import save_image
+
+    timings = {"Startup": time.perf_counter() - started}
+
+    field, max_iterations = load_field(args.field_path)
+    args.height, args.width = field.shape
+    args.max_iterations = max_iterations
+
+    display_header()
+    display_cli_args("recolor", args)
+
+    hsv_color = HsvColor(args.color_hue, args.color_saturation, args.color_intensity)
+
+    console.print("Recoloring field...", style="yellow")
+    pixels = colorize_field(field, max_iterations, rgb_lut(hsv_color), hsv_color.intensity)
+
+    console.print("Saving output image...", style="yellow")
+    save_image(args.output_image_path, pixels)
+
+    display_timings(timings)
+
+    console.print("Done.\n", style="green")
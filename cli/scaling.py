@@ -0,0 +1,128 @@
+"""
+Contains the scaling command of the CLI
+"""
+
+import time
+
+from rich.table import Table
+
+from cli.common import display_header, display_timings, console
+from fractals.common import Plane2d
+from fractals.scaling import SCALING_FRACTALS
+
+DESCRIPTION = ("FractalGen: Measure the scaling of the CPU kernels with the number of threads, with static and "
+               "load-balanced scheduling")
+
+
+def add_arguments(parser):
+    """
+    Add the arguments of the command to a parser
+
+    Args:
+        parser: Parser of the command
+    """
+
+    parser.add_argument("--fractal", required=False, type=str, default="mandelbrot", choices=SCALING_FRACTALS,
+                        help="Fractal to compute, in the default view of its CLI", dest="fractal")
+
+    parser.add_argument("--width", required=False, type=int, default="1920",
+                        help="Width of the image in pixels", dest="width")
+
+    parser.add_argument("--height", required=False, type=int, default="1080",
+                        help="Height of the image in pixels", dest="height")
+
+    parser.add_argument("--iterations", required=False, type=int, default="1000",
+                        help="Max iterations for orbital escape", dest="max_iterations")
+
+    parser.add_argument("--threads", required=False, type=int, nargs="+", default=None,
+                        help="Numbers of threads to measure, defaults to powers of two up to the number of cores",
+                        dest="thread_counts")
+
+    parser.add_argument("--repeats", required=False, type=int, default="3",
+                        help="Number of measurements of each number of threads, of which the fastest is kept",
+                        dest="repeats")
+
+
+def check_arguments(parser, args):
+    """
+    Check the combinations of arguments that argparse cannot check
+
+    Args:
+        parser: Parser of the command, to report errors
+        args: CLI arguments from argparse
+    """
+
+    if args.thread_counts is not None and min(args.thread_counts) <= 0:
+        parser.error("--threads must be positive")
+
+    if args.repeats <= 0:
+        parser.error("--repeats must be positive")
+
+
+def display_scaling(measurements):
+    """
+    Display the time and efficiency of each number of threads in the form of a table. Efficiencies are relative to the
+    load-balanced time with the fewest threads.
+
+    Args:
+        measurements: Measurements of the scaling benchmark
+    """
+
+    base = measurements[0]
+    base_work = base.balanced_seconds * base.threads
+
+    scaling_table = Table(title="Scaling (seconds and efficiency)")
+
+    scaling_table.add_column("Threads", justify="right", no_wrap=True)
+    scaling_table.add_column("Static", justify="right")
+    scaling_table.add_column("Balanced", justify="right")
+    scaling_table.add_column("Static Eff.", justify="right")
+    scaling_table.add_column("Balanced Eff.", justify="right")
+
+    for measurement in measurements:
+        scaling_table.add_row(str(measurement.threads), f"{measurement.static_seconds:.3f}",
+                              f"{measurement.balanced_seconds:.3f}",
+                              f"{base_work / (measurement.static_seconds * measurement.threads):.0%}",
+                              f"{base_work / (measurement.balanced_seconds * measurement.threads):.0%}")
+
+    console.print(scaling_table)
+    print()
+
+
+def main(args, started):
+    """
+    Run the command
+
+    Args:
+        args: CLI arguments from argparse
+        started: Value of time.perf_counter() when the process started, to time the startup
+    """
+
+    import numba
+
+    from fractals.scaling import create_fractal, default_thread_counts, measure_scaling
+
+    timings = {"Startup": time.perf_counter() - started}
+
+    display_header()
+
+    thread_counts = sorted(args.thread_counts or default_thread_counts())
+    if thread_counts[-1] > numba.config.NUMBA_NUM_THREADS:
+        raise SystemExit(f"Numba runs at most {numba.config.NUMBA_NUM_THREADS} threads, set NUMBA_NUM_THREADS to "
+                         f"measure more")
+    fractal = create_fractal(args.fractal, Plane2d(args.width, args.height), args.max_iterations)
+
+    console.print(f"Measuring threads {', '.join(map(str, thread_counts))}...", style="yellow")
+    display_scaling(measure_scaling(fractal, thread_counts, args.repeats))
+
+    # Known only once a parallel kernel has run
+    threading_layer = numba.threading_layer()
+    console.print(f"Threading layer: {threading_layer}")
+    if threading_layer != "tbb":
+        console.print(f"The {threading_layer} threading layer assigns chunks statically, so balanced scheduling only "
+                      f"balances the load with TBB", style="red")
+    print()
+
+    display_timings(timings)
+
+    console.print("Done.\n", style="green")
@@ -0,0 +1,222 @@
+"""
+Contains the serve command of the CLI
+"""
+
+import time
+
+from rich.table import Table
+
+from cli.common import display_header, display_timings, console
+from fractals.backends import backend_names, AUTO
+from fractals.tileserver import TILE_FRACTALS
+
+DESCRIPTION = ("FractalGen: Serve the tiles of the escape-time fractals to a web map viewer, or benchmark the tile "
+               "server with local clients")
+
+
+def add_arguments(parser):
+    """
+    Add the arguments of the command to a parser
+
+    Args:
+        parser: Parser of the command
+    """
+
+    parser.add_argument("--host", required=False, type=str, default="127.0.0.1",
+                        help="Address to listen on", dest="host")
+
+    parser.add_argument("--port", required=False, type=int, default="8000",
+                        help="Port to listen on", dest="port")
+
+    parser.add_argument("--workers", required=False, type=int, default=None,
+                        help="Number of worker processes computing tiles, defaults to one per core", dest="workers")
+
+    parser.add_argument("--iterations", required=False, type=int, default="500",
+                        help="Max iterations for orbital escape of the tiles of zoom 0", dest="max_iterations")
+
+    parser.add_argument("--iterations-per-zoom", required=False, type=int, default="0",
+                        help="Max iterations added per zoom level", dest="iterations_per_zoom")
+
+    parser.add_argument("--cx", required=False, type=float, default="-0.4",
+                        help="Real part of the julia set constant", dest="cx")
+
+    parser.add_argument("--cy", required=False, type=float, default="0.6",
+                        help="Imaginary part of the julia set constant", dest="cy")
+
+    parser.add_argument("--periodicity-check", required=False, action="store_true",
+                        help="Whether to stop iterating orbits that are detected to be periodic",
+                        dest="periodicity_check")
+
+    parser.add_argument("--periodicity-tolerance", required=False, type=float, default="1e-10",
+                        help="Distance under which an orbit is considered periodic", dest="periodicity_tolerance")
+
+    parser.add_argument("--color-hue", required=False, type=int, default="204",
+                        help="Hue of the color of the tiles", dest="color_hue")
+
+    parser.add_argument("--color-saturation", required=False, type=float, default="0.64",
+                        help="Saturation of the color of the tiles", dest="color_saturation")
+
+    parser.add_argument("--color-intensity", required=False, type=float, default="3.0",
+                        help="Intensity of the color of the tiles", dest="color_intensity")
+
+    parser.add_argument("--backend", required=False, type=str, default=AUTO, choices=backend_names(),
+                        help="Backend computing the tiles. auto picks the fastest backend available.", dest="backend")
+
+    parser.add_argument("--cache-dir", required=False, type=str, default=None,
+                        help="Directory of the disk tier of the tile caches of the workers, shared by all workers and "
+                             "kept across runs", dest="cache_dir")
+
+    parser.add_argument("--benchmark", required=False, action="store_true",
+                        help="Instead of serving, start the server on a free local port and measure the tiles per "
+                             "second and the latencies of visible tiles under the load of clients exploring a fractal",
+                        dest="benchmark")
+
+    parser.add_argument("--fractal", required=False, type=str, default="mandelbrot", choices=tuple(TILE_FRACTALS),
+                        help="Fractal explored by the clients of the benchmark", dest="fractal")
+
+    parser.add_argument("--clients", required=False, type=int, default="8",
+                        help="Number of concurrent clients of the benchmark", dest="clients")
+
+    parser.add_argument("--duration", required=False, type=float, default="10.0",
+                        help="Duration of the benchmark in seconds", dest="duration")
+
+    parser.add_argument("--seed", required=False, type=int, default="0",
+                        help="Seed of the random walks of the clients of the benchmark", dest="seed")
+
+
+def check_arguments(parser, args):
+    """
+    Check the combinations of arguments that argparse cannot check
+
+    Args:
+        parser: Parser of the command, to report errors
+        args: CLI arguments from argparse
+    """
+
+    if not 0 <= args.port < 65536:
+        parser.error("--port must be between 0 and 65535")
+
+    if args.workers is not None and args.workers <= 0:
+        parser.error("--workers must be positive")
+
+    if args.max_iterations <= 0:
+        parser.error("--iterations must be positive")
+
+    if args.iterations_per_zoom < 0:
+        parser.error("--iterations-per-zoom cannot be negative")
+
+    if args.clients <= 0:
+        parser.error("--clients must be positive")
+
+    if args.duration <= 0.0:
+        parser.error("--duration must be positive")
+
+
+def display_benchmark(results, statistics):
+    """
+    Display the results of the benchmark and the statistics of the server in the form of tables
+
+    Args:
+        results: Results of the load, see fractals.tileload.LoadResults
+        statistics: Statistics of the server, see fractals.tileserver.ServerStatistics
+    """
+
+    load_table = Table(title="Load")
+
+    load_table.add_column("Metric", justify="left", no_wrap=True)
+    load_table.add_column("Value", justify="right")
+
+    load_table.add_row("Tiles", str(results.tiles))
+    load_table.add_row("Tiles per second", f"{results.tiles_per_second:.1f}")
+    load_table.add_row("Visible tiles", str(len(results.latencies)))
+    load_table.add_row("Prefetched tiles", str(results.prefetched))
+    load_table.add_row("Aborted prefetches", str(results.aborted))
+    load_table.add_row("Errors", str(results.errors))
+    load_table.add_row("p50 latency (ms)", f"{results.latency_percentile(50) * 1000:.1f}")
+    load_table.add_row("p99 latency (ms)", f"{results.latency_percentile(99) * 1000:.1f}")
+
+    console.print(load_table)
+    print()
+
+    server_table = Table(title="Server")
+
+    server_table.add_column("Requests", justify="left", no_wrap=True)
+    server_table.add_column("Count", justify="right")
+
+    server_table.add_row("Received", str(statistics.requests))
+    server_table.add_row("Served from memory", str(statistics.response_hits))
+    server_table.add_row("Coalesced", str(statistics.coalesced))
+    server_table.add_row("Computed", str(statistics.computed))
+    server_table.add_row("Cancelled", str(statistics.cancelled))
+    server_table.add_row("Errors", str(statistics.errors))
+
+    console.print(server_table)
+    print()
+
+
+async def serve(args, settings):
+    """
+    Serve tiles until interrupted
+
+    Args:
+        args: CLI arguments from argparse
+        settings: Settings of the tiles
+    """
+
+    import asyncio
+
+    from fractals.tileserver import TileServer
+
+    server = TileServer(settings, args.workers, args.cache_dir)
+
+    console.print("Starting workers...", style="yellow")
+    await server.start(args.host, args.port)
+
+    console.print(f"Serving on http://{args.host}:{server.port}/, press Ctrl+C to stop", style="green")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(args, started):
+    """
+    Run the command
+
+    Args:
+        args: CLI arguments from argparse
+        started: Value of time.perf_counter() when the process started, to time the startup
+    """
+
+    import asyncio
+
+    from fractals.common import HsvColor
+    from fractals.tileload import benchmark_server
+    from fractals.tileserver import TileSettings
+
+    timings = {"Startup": time.perf_counter() - started}
+
+    display_header()
+
+    settings = TileSettings(args.max_iterations, args.iterations_per_zoom,
+                            HsvColor(args.color_hue, args.color_saturation, args.color_intensity), args.cx, args.cy,
+                            args.periodicity_tolerance if args.periodicity_check else 0.0, args.backend)
+
+    if not args.benchmark:
+        try:
+            asyncio.run(serve(args, settings))
+        except KeyboardInterrupt:
+            console.print("Stopped.\n", style="green")
+
+        return
+
+    console.print(f"Benchmarking {args.clients} clients for {args.duration} seconds...", style="yellow")
+    start = time.perf_counter()
+    results, statistics = asyncio.run(benchmark_server(settings, args.workers, args.cache_dir, args.fractal,
+                                                       args.clients, args.duration, args.seed))
+    timings["Benchmark"] = time.perf_counter() - start
+
+    display_benchmark(results, statistics)
+    display_timings(timings)
+
+    console.print("Done.\n", style="green")
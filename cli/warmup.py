@@ -0,0 +1,55 @@
+"""
+Contains the warmup command of the CLI
+"""
+
+import time
+
+from cli.common import display_header, display_timings, console
+
+DESCRIPTION = ("FractalGen: Compile and cache the kernels of every fractal, so that later renders start without "
+               "compiling them")
+
+
+def add_arguments(parser):
+    """
+    Add the arguments of the command to a parser
+
+    Args:
+        parser: Parser of the command
+    """
+
+    parser.add_argument("--use-gpu", required=False, action="store_true",
+                        help="Whether to also compile the CUDA kernels", dest="use_gpu")
+
+
+def check_arguments(parser, args):
+    """
+    Check the combinations of arguments that argparse cannot check
+
+    Args:
+        parser: Parser of the command, to report errors
+        args: CLI arguments from argparse
+    """
+
+
+def main(args, started):
+    """
+    Run the command
+
+    Args:
+        args: CLI arguments from argparse
+        started: Value of time.perf_counter() when the process started, to time the startup
+    """
+
+    from fractals.warmup import warmup
+
+    timings = {"Startup": time.perf_counter() - started}
+
+    display_header()
+
+    console.print("Compiling kernels...", style="yellow")
+    timings.update(warmup(use_gpu=args.use_gpu))
+
+    display_timings(timings)
+
+    console.print("Done.\n", style="green")
@@ -0,0 +1,56 @@
+"""
+Contains the fractalgen entry point, which runs the commands in cli. Commands import Numba, the kernels and CUDA only
+when they run, so that --help and invalid arguments return immediately and CPU renders never load the CUDA driver.
+"""
+
+import argparse
+import importlib
+import os
+import time
+
+# Value of time.perf_counter() when the entry point was imported, to time the startup of commands
+STARTED = time.perf_counter()
+
+# The load-balanced chunks of the numba backend are only handed to idle threads by TBB, the OpenMP and workqueue layers
+# assign them statically. This must be set before Numba is imported.
+os.environ.setdefault("NUMBA_THREADING_LAYER", "tbb")
+
+# Commands, by name of their module in cli
+COMMANDS = ("mandelbrot", "julia", "burningship", "buddhabrot", "recolor", "warmup", "scaling", "serve")
+
+
+def parse_cli_args(argv=None):
+    """
+    Parse the command and its arguments
+
+    Args:
+        argv: Arguments without the program name, or None for sys.argv
+
+    Returns:
+        Module of the command and CLI arguments from argparse
+    """
+
+    parser = argparse.ArgumentParser(prog="fractalgen", description="FractalGen: High-performance fractal generator")
+    subparsers = parser.add_subparsers(title="commands", dest="command", required=True)
+
+    commands = {}
+    for command in COMMANDS:
+        module = importlib.import_module(f"cli.{command}")
+        subparser = subparsers.add_parser(command, description=module.DESCRIPTION, help=module.DESCRIPTION)
+        module.add_arguments(subparser)
+        commands[command] = (module, subparser)
+
+    args = parser.parse_args(argv)
+    module, subparser = commands[args.command]
+    module.check_arguments(subparser, args)
+
+    return module, args
+
+
+def main(argv=None):
+    module, args = parse_cli_args(argv)
+    module.main(args, STARTED)
+
+
+if __name__ == '__main__':
+    main()
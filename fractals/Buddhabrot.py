@@ -1,48 +1,300 @@
+import math
+import time
+
+import numba
 import numpy as np
-from numba.cuda.random import create_xoroshiro128p_states
 
 from fractals.MandelbrotBase import MandelbrotBase
-from fractals.kernels.buddhabrot import buddhabrot, buddhabrot_cuda, draw_buddhabrot
+from fractals.backends import get_backend, BUDDHABROT, CudaBackend, NumbaBackend
+from fractals.common import SamplingStatistics, SAMPLING_MODES
+from fractals.kernels.buddhabrot import buddhabrot, buddhabrot_metropolis, buddhabrot_binned, \
+    buddhabrot_metropolis_binned, draw_buddhabrot, draw_nebulabrot
+from fractals.kernels.xoroshiro import create_xoroshiro128p_states as create_xoroshiro128p_states_cpu
+from fractals.symmetry import is_conjugate_symmetric
+
+# Number of samples traced at once on the CPU. The private histograms of the threads are merged after each batch, so
+# that their counters cannot overflow, and checkpoints can be saved between batches.
+BATCH_SAMPLES = 10000000
+
+# Number of samples per thread traced between two opportunities to save a checkpoint on the GPU
+CHECKPOINT_BATCH_SAMPLES_PER_THREAD = 16
+
+# Max size in bytes of the private histograms of the threads on the CPU. When a histogram per thread does not fit,
+# e.g. for very large images, threads bin their hits by band of the histogram instead, see buddhabrot_binned.
+PRIVATE_COUNTERS_BYTES = 4 * 1024 * 1024 * 1024
+
+# Size in bytes of the bins of the threads, when the histogram is too large for private histograms. Larger bins mean
+# fewer rounds of tracing and adding bins.
+BINS_BYTES = 1024 * 1024 * 1024
+
+# Number of bands of the histogram per thread. Bands are added to the histogram in parallel, and more bands than
+# threads balance the bands of the middle of the image, which get more hits.
+BANDS_PER_THREAD = 4
 
 
 class Buddhabrot(MandelbrotBase):
-    def __init__(self, plane, complex_plane, max_iterations, hsv_color):
+    @property
+    def channel_iterations(self):
+        # Max iterations of each histogram channel. A nebulabrot has red, green and blue channels.
+        if self._channel_iterations is None:
+            return (self._max_iterations,)
+
+        return tuple(self._channel_iterations)
+
+    @channel_iterations.setter
+    def channel_iterations(self, value):
+        self._channel_iterations = value
+
+    @property
+    def is_nebulabrot(self):
+        return len(self.channel_iterations) == 3
+
+    @property
+    def counters_shape(self):
+        return len(self.channel_iterations), self._plane.width, self._plane.height
+
+    @property
+    def sampling_statistics(self) -> SamplingStatistics:
+        return self._sampling_statistics
+
+    def __init__(self, plane, complex_plane, max_iterations, hsv_color, channel_iterations=None):
         super().__init__(plane, complex_plane, max_iterations, hsv_color)
+        self._channel_iterations = channel_iterations
+        self._sampling_statistics = None
+
+    def compute(self, total_samples=10000000, seed=3123, sampling="uniform", warmup_samples=1000, checkpoint=None,
+                checkpoint_interval=600, backend="numba"):
+        return self.draw(self.compute_counters(total_samples, seed, sampling, warmup_samples, checkpoint,
+                                               checkpoint_interval, backend=backend))
 
-    def compute(self, total_samples=10000000):
-        counters = np.zeros([self._plane.width, self._plane.height], dtype=np.uint16)
+    def compute_gpu(self, samples_per_thread=128, seed=3123, sampling="uniform", warmup_samples=1000, checkpoint=None,
+                    checkpoint_interval=600, backend="cuda"):
+        return self.draw(self.compute_counters_gpu(samples_per_thread, seed, sampling, warmup_samples, checkpoint,
+                                                   checkpoint_interval, backend))
+
+    def compute_counters(self, total_samples=10000000, seed=3123, sampling="uniform", warmup_samples=1000,
+                         checkpoint=None, checkpoint_interval=600, first_stream=0, backend="numba", symmetry=True):
+        self.__check_sampling(sampling)
+        self.__check_backend(backend, NumbaBackend).set_threads()
+
+        if checkpoint is None:
+            counters = np.zeros(self.counters_shape, dtype=self.counters_dtype(sampling))
+            rng_states = None
+            samples = 0
+        else:
+            counters = checkpoint.counters
+            rng_states = checkpoint.rng_states
+            samples = checkpoint.samples
+
+        # One RNG stream per thread. Results are reproducible for a given seed and number of threads.
+        if rng_states is None:
+            rng_states = create_xoroshiro128p_states_cpu(numba.get_num_threads(), seed, first_stream)
+
+        # Private histograms, or bins when they do not fit, are allocated once and reused by every batch
+        slots = min(rng_states.shape[0], numba.get_num_threads())
+        private_counters = self.__create_private_counters(slots, sampling)
+        channel_iterations = np.array(self.channel_iterations, dtype=np.int64)
+        statistics = np.zeros(2, dtype=np.int64)
+        mirror = self.__is_mirrored(symmetry)
+        if private_counters is None:
+            bins, weights, bin_counts = self.__create_bins(slots, sampling, mirror)
+        last_checkpoint_time = time.monotonic()
 
         print("Computing buddhabrot...")
-        buddhabrot(counters, self._plane.width, self._plane.height, self._max_iterations, total_samples,
-                   self._complex_plane.real_begin, self._complex_plane.real_end, self._complex_plane.imag_begin,
-                   self._complex_plane.imag_end)
+        while samples < total_samples:
+            batch_samples = min(total_samples - samples, BATCH_SAMPLES)
 
-        pixels = np.zeros([self._plane.width, self._plane.height, 3], dtype=np.uint8)
-        print("Drawing buddhabrot...")
-        draw_buddhabrot(pixels, counters, self._plane.width, self._plane.height, self._hsv_color.hue,
-                        self._hsv_color.saturation, self._hsv_color.intensity)
+            if sampling == "metropolis" and private_counters is None:
+                buddhabrot_metropolis_binned(counters, bins, weights, bin_counts, rng_states, statistics,
+                                             self._plane.width, self._plane.height, channel_iterations,
+                                             self.__traced_samples(batch_samples, mirror), warmup_samples,
+                                             self._complex_plane.real_begin, self._complex_plane.real_end,
+                                             self._complex_plane.imag_begin, self._complex_plane.imag_end, mirror)
+            elif sampling == "metropolis":
+                buddhabrot_metropolis(counters, private_counters, rng_states, statistics, self._plane.width,
+                                      self._plane.height, channel_iterations,
+                                      self.__traced_samples(batch_samples, mirror), warmup_samples,
+                                      self._complex_plane.real_begin, self._complex_plane.real_end,
+                                      self._complex_plane.imag_begin, self._complex_plane.imag_end, mirror)
+            elif private_counters is None:
+                buddhabrot_binned(counters, bins, bin_counts, rng_states, self._plane.width, self._plane.height,
+                                  channel_iterations, self.__traced_samples(batch_samples, mirror),
+                                  self._complex_plane.real_begin, self._complex_plane.real_end,
+                                  self._complex_plane.imag_begin, self._complex_plane.imag_end, mirror)
+            else:
+                buddhabrot(counters, private_counters, rng_states, self._plane.width, self._plane.height,
+                           channel_iterations, self.__traced_samples(batch_samples, mirror),
+                           self._complex_plane.real_begin, self._complex_plane.real_end,
+                           self._complex_plane.imag_begin, self._complex_plane.imag_end, mirror)
 
-        return pixels
+            samples += batch_samples
+
+            if checkpoint is not None and (samples >= total_samples or
+                                           time.monotonic() - last_checkpoint_time >= checkpoint_interval):
+                print(f"Saving checkpoint ({samples} of {total_samples} samples)...")
+                checkpoint.save(rng_states, samples)
+                last_checkpoint_time = time.monotonic()
+
+        self.__update_sampling_statistics(sampling, statistics)
+
+        return counters
+
+    def compute_counters_gpu(self, samples_per_thread=128, seed=3123, sampling="uniform", warmup_samples=1000,
+                             checkpoint=None, checkpoint_interval=600, backend="cuda", symmetry=True):
+        from numba import cuda
+        from numba.cuda.random import create_xoroshiro128p_states
+
+        from fractals.kernels.cuda.buddhabrot import buddhabrot_cuda, buddhabrot_metropolis_cuda, merge_counters_cuda
 
-    def compute_gpu(self, samples_per_thread=128):
-        counters = np.zeros([self._plane.width, self._plane.height], dtype=np.uint16)
+        self.__check_sampling(sampling)
+        backend = self.__check_backend(backend, CudaBackend)
 
-        threads_per_block = 256
-        total_blocks = 2048
-        rng_states = create_xoroshiro128p_states(threads_per_block * total_blocks, seed=3123)
+        threads_per_block = backend.threads_per_block
+        total_blocks = backend.total_blocks
+
+        if checkpoint is None:
+            counters = np.zeros(self.counters_shape, dtype=self.counters_dtype(sampling))
+            rng_states = None
+            samples = 0
+        else:
+            counters = checkpoint.counters
+            rng_states = None if checkpoint.rng_states is None else cuda.to_device(checkpoint.rng_states)
+            samples = checkpoint.samples
+
+        if rng_states is None:
+            rng_states = create_xoroshiro128p_states(threads_per_block * total_blocks, seed=seed)
+
+        # Keep the histogram on the device between launches, and only copy it back for checkpoints
+        device_counters = cuda.to_device(counters)
+        channel_iterations = np.array(self.channel_iterations, dtype=np.int64)
+        statistics = np.zeros(2, dtype=np.int64)
+
+        # Metropolis-Hastings launches trace weighted orbits into a histogram of their own, which is then scaled by
+        # the mean contribution of the random jumps of the launch, see buddhabrot_metropolis_cuda
+        if sampling == "metropolis":
+            device_weighted_counters = cuda.to_device(np.zeros(self.counters_shape, dtype=np.float64))
+            launch_statistics = np.zeros(4, dtype=np.int64)
+        mirror = self.__is_mirrored(symmetry)
+        last_checkpoint_time = time.monotonic()
 
         print("Computing buddhabrot...")
-        buddhabrot_cuda[total_blocks, threads_per_block](counters, rng_states, self._plane.width,
-                                                         self._plane.height, self._max_iterations,
-                                                         samples_per_thread, self._complex_plane.real_begin,
-                                                         self._complex_plane.real_end,
-                                                         self._complex_plane.imag_begin,
-                                                         self._complex_plane.imag_end)
+        while samples < samples_per_thread:
+            # Without a checkpoint, all samples are traced in one launch
+            batch_samples = samples_per_thread - samples
+            if checkpoint is not None:
+                batch_samples = min(batch_samples, CHECKPOINT_BATCH_SAMPLES_PER_THREAD)
+
+            if sampling == "metropolis":
+                launch_statistics[:] = 0
+                buddhabrot_metropolis_cuda[total_blocks, threads_per_block](device_weighted_counters, rng_states,
+                                                                            launch_statistics, self._plane.width,
+                                                                            self._plane.height, channel_iterations,
+                                                                            self.__traced_samples(batch_samples,
+                                                                                                  mirror),
+                                                                            warmup_samples,
+                                                                            self._complex_plane.real_begin,
+                                                                            self._complex_plane.real_end,
+                                                                            self._complex_plane.imag_begin,
+                                                                            self._complex_plane.imag_end, mirror)
+
+                jumps, jump_contribution = launch_statistics[2], launch_statistics[3]
+                merge_counters_cuda[total_blocks, threads_per_block](device_counters.ravel(),
+                                                                     device_weighted_counters.ravel(),
+                                                                     jump_contribution / jumps if jumps > 0 else 0.0)
+                statistics += launch_statistics[:2]
+            else:
+                buddhabrot_cuda[total_blocks, threads_per_block](device_counters, rng_states, self._plane.width,
+                                                                 self._plane.height, channel_iterations,
+                                                                 self.__traced_samples(batch_samples, mirror),
+                                                                 self._complex_plane.real_begin,
+                                                                 self._complex_plane.real_end,
+                                                                 self._complex_plane.imag_begin,
+                                                                 self._complex_plane.imag_end, mirror)
+
+            samples += batch_samples
+
+            if checkpoint is not None and (samples >= samples_per_thread or
+                                           time.monotonic() - last_checkpoint_time >= checkpoint_interval):
+                print(f"Saving checkpoint ({samples} of {samples_per_thread} samples per thread)...")
+                device_counters.copy_to_host(counters)
+                checkpoint.save(rng_states.copy_to_host(), samples)
+                last_checkpoint_time = time.monotonic()
+
+        device_counters.copy_to_host(counters)
+        self.__update_sampling_statistics(sampling, statistics)
+
+        return counters
+
+    @staticmethod
+    def counters_dtype(sampling):
+        """
+        Type of the histograms of a sampling mode: hit counts, or weighted hits with Metropolis-Hastings sampling
+        """
+
+        return np.float64 if sampling == "metropolis" else np.uint64
+
+    def draw(self, counters):
+        """
+        Draw pixels from histograms of orbit hits: RGB pixels for a nebulabrot, HSV pixels otherwise.
+        """
 
         pixels = np.zeros([self._plane.width, self._plane.height, 3], dtype=np.uint8)
 
         print("Drawing buddhabrot...")
-        draw_buddhabrot(pixels, counters, self._plane.width, self._plane.height, self._hsv_color.hue,
-                        self._hsv_color.saturation, self._hsv_color.intensity)
+        if self.is_nebulabrot:
+            draw_nebulabrot(pixels, counters, self._plane.width, self._plane.height, self._hsv_color.intensity)
+        else:
+            draw_buddhabrot(pixels, counters[0], self._plane.width, self._plane.height, self._hsv_color.hue,
+                            self._hsv_color.saturation, self._hsv_color.intensity)
 
         return pixels
+
+    def __create_private_counters(self, slots, sampling):
+        # One private histogram per slot, i.e. per thread, or None if they would exceed PRIVATE_COUNTERS_BYTES
+        dtype = np.float64 if sampling == "metropolis" else np.uint32
+        histogram_bytes = np.dtype(dtype).itemsize * math.prod(self.counters_shape)
+        if slots * histogram_bytes > PRIVATE_COUNTERS_BYTES:
+            return None
+
+        return np.zeros((slots,) + self.counters_shape, dtype=dtype)
+
+    def __create_bins(self, slots, sampling, mirror):
+        # Bins of BANDS_PER_THREAD bands per slot, each of which fits the hits of the longest orbit
+        bands = min(BANDS_PER_THREAD * slots, self._plane.width * self._plane.height)
+        entry_bytes = 16 if sampling == "metropolis" else 8
+        capacity = max(BINS_BYTES // (slots * bands * entry_bytes), (2 if mirror else 1) * max(self.channel_iterations))
+
+        bins = np.empty((slots, bands, capacity), dtype=np.int64)
+        weights = np.empty((slots, bands, capacity) if sampling == "metropolis" else (0, 0, 0), dtype=np.float64)
+
+        return bins, weights, np.zeros((slots, bands), dtype=np.int64)
+
+    def __update_sampling_statistics(self, sampling, statistics):
+        if sampling == "metropolis":
+            self._sampling_statistics = SamplingStatistics(int(statistics[0]), int(statistics[1]))
+        else:
+            self._sampling_statistics = None
+
+    def __is_mirrored(self, symmetry):
+        # Orbits of conjugate samples are conjugate, so in views symmetric about the real axis each traced orbit also
+        # counts as the orbit of its conjugate sample, and half as many samples are traced
+        return symmetry and is_conjugate_symmetric(self._plane, self._complex_plane)
+
+    @staticmethod
+    def __traced_samples(samples, mirror):
+        return (samples + 1) // 2 if mirror else samples
+
+    @staticmethod
+    def __check_backend(backend, backend_class):
+        # Each compute method launches the kernels of one backend
+        backend = get_backend(backend, BUDDHABROT)
+        if not isinstance(backend, backend_class):
+            raise ValueError(f"The {backend.name} backend cannot compute this buddhabrot, use the "
+                             f"{backend_class.name} backend")
+
+        return backend
+
+    @staticmethod
+    def __check_sampling(sampling):
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{sampling}', expected one of {', '.join(SAMPLING_MODES)}")
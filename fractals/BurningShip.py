@@ -1,37 +1,182 @@
-import math
+import copy
+import functools
 
 import numpy as np
 
 from fractals.MandelbrotBase import MandelbrotBase
-from fractals.kernels.burningship import burning_ship, burning_ship_cuda
+from fractals.antialiasing import anti_alias, DEFAULT_SAMPLES, DEFAULT_EDGE_THRESHOLD
+from fractals.backends import get_backend, AUTO, ANTI_ALIASING, PROGRESSIVE, DEEP_ZOOM
+from fractals.common import engine_capability, DeepZoomView, Tile, BURNING_SHIP_ENGINES
+from fractals.kernels.common import BURNING_SHIP
+from fractals.perturbation import reference_orbit, pixel_spacing
+from fractals.progressive import progressive_frames, FIRST_BLOCK_SIZE
+from fractals.refinement import refine_escape_state, EscapeState
+from fractals.tilecache import compute_cached_field, tile_key, TileCache, CACHE_TILE_SIZE
 
 
 class BurningShip(MandelbrotBase):
+    @property
+    def escape_state(self) -> EscapeState:
+        return self._escape_state
+
     def __init__(self, plane, complex_plane, max_iterations, hsv_color):
         super().__init__(plane, complex_plane, max_iterations, hsv_color)
+        self._escape_state = None
+
+    def compute(self, backend=AUTO, periodicity_tolerance=0.0, engine="brute-force", cache: TileCache = None):
+        if cache is not None:
+            return self.colorize(self.compute_cached_field(cache, backend, periodicity_tolerance, engine))
+
+        return self.colorize(self.compute_field(backend, periodicity_tolerance, engine))
+
+    def compute_cached_field(self, cache: TileCache, backend=AUTO, periodicity_tolerance=0.0, engine="brute-force",
+                             tile_size=CACHE_TILE_SIZE):
+        """
+        Compute the smooth iteration counts of the image from the tiles of a cache, computing only the tiles that are
+        not cached yet, see fractals.tilecache. The image is snapped to the nearest pixels of the grid of the tiles.
+
+        Args:
+            cache: Cache of the tiles
+            backend: Backend computing the tiles, or its name, see fractals.backends
+            periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+            engine: Engine computing the tiles, one of fractals.common.BURNING_SHIP_ENGINES
+            tile_size: Width and height in pixels of the tiles of the grid
+
+        Returns:
+            Array of smooth iteration counts
+        """
+
+        backend = get_backend(backend, engine_capability(engine, BURNING_SHIP_ENGINES))
+
+        # The backend is part of the key, as the smooth iteration counts of the cuda backend use other logarithms
+        key = functools.partial(tile_key, BURNING_SHIP, max_iterations=self._max_iterations,
+                                periodicity_tolerance=periodicity_tolerance, engine=engine, backend=backend.name)
+        compute_tile = functools.partial(self.__compute_grid_tile, backend, periodicity_tolerance, engine)
+
+        return compute_cached_field(compute_tile, key, cache, self._plane, self._complex_plane, tile_size)
+
+    def __compute_grid_tile(self, backend, periodicity_tolerance, engine, plane, complex_plane):
+        fractal = copy.copy(self)
+        fractal.plane = plane
+        fractal.complex_plane = complex_plane
+
+        return fractal.compute_field(backend, periodicity_tolerance, engine)
+
+    def compute_field(self, backend=AUTO, periodicity_tolerance=0.0, engine="brute-force", tile=None):
+        backend = get_backend(backend, engine_capability(engine, BURNING_SHIP_ENGINES))
+
+        if tile is None:
+            tile = Tile(0, 0, self._plane.width, self._plane.height)
+
+        field = np.empty([tile.height, tile.width], dtype=np.float32)
+
+        backend.escape_time(field, BURNING_SHIP, tile, self._plane, self._max_iterations, periodicity_tolerance,
+                            self._complex_plane)
+
+        return field
+
+    def compute_deep_zoom(self, view: DeepZoomView, backend=AUTO):
+        return self.colorize(self.compute_deep_zoom_field(view, backend))
+
+    def compute_deep_zoom_field(self, view: DeepZoomView, backend=AUTO, tile=None):
+        """
+        Compute a deep zoom with perturbation, for views too narrow for the float64 complex plane. Only the orbit of
+        the center is computed in high precision, other pixels are iterated as float64 offsets from it.
+
+        Args:
+            view: View of the deep zoom, which replaces the complex plane
+            backend: Backend computing the field, or its name, see fractals.backends
+            tile: Part of the image to compute, or None for the whole image
+
+        Returns:
+            Array of smooth iteration counts
+        """
+
+        backend = get_backend(backend, DEEP_ZOOM)
+
+        if tile is None:
+            tile = Tile(0, 0, self._plane.width, self._plane.height)
+
+        field = np.empty([tile.height, tile.width], dtype=np.float32)
+
+        orbit = reference_orbit(BURNING_SHIP, view, self._plane.width, self._max_iterations)
+        spacing = float(pixel_spacing(view, self._plane.width))
+
+        backend.perturbation(field, BURNING_SHIP, orbit, tile, self._plane, self._max_iterations, spacing)
+
+        return field
+
+    def refine(self, extra_iterations, backend=AUTO, periodicity_tolerance=0.0):
+        return self.colorize(self.refine_field(extra_iterations, backend, periodicity_tolerance))
+
+    def refine_field(self, extra_iterations, backend=AUTO, periodicity_tolerance=0.0):
+        """
+        Raise the max iterations and only continue the orbits of the pixels that were still bounded after the previous
+        refinement, see fractals.refinement. The first refinement iterates every pixel from the start.
+
+        Args:
+            extra_iterations: Number of iterations added to the max iterations
+            backend: Backend computing the field, or its name, see fractals.backends
+            periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+
+        Returns:
+            Array of smooth iteration counts at the new max iterations
+        """
+
+        if extra_iterations < 0:
+            raise ValueError("The extra iterations of a refinement cannot be negative")
+
+        self._max_iterations += extra_iterations
+        self._escape_state = refine_escape_state(self._escape_state, BURNING_SHIP, backend, self._plane,
+                                                 self._complex_plane, self._max_iterations, periodicity_tolerance)
+
+        return self._escape_state.field.copy()
+
+    def anti_alias(self, field, backend=AUTO, periodicity_tolerance=0.0, tile=None, samples=DEFAULT_SAMPLES,
+                   threshold=DEFAULT_EDGE_THRESHOLD):
+        """
+        Colorize a field computed with one sample per pixel, and supersample the pixels on edges with jittered
+        sub-pixel samples, see fractals.antialiasing
+
+        Args:
+            field: Array of smooth iteration counts of the image, or of a tile of it
+            backend: Backend computing the samples, or its name, see fractals.backends
+            periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+            tile: Part of the image of the field, or None for the whole image
+            samples: Width and height of the grid of samples of an edge pixel
+            threshold: Difference between smooth iteration counts above which neighbours are on an edge
+
+        Returns:
+            Array of RGB pixels of shape [height, width, 3]
+        """
+
+        backend = get_backend(backend, ANTI_ALIASING)
+        compute_points = functools.partial(self.__compute_points, backend, periodicity_tolerance)
+
+        return anti_alias(field, self.colorize, compute_points, self._plane, self._complex_plane, tile, samples,
+                          threshold)
+
+    def compute_progressive(self, backend=AUTO, periodicity_tolerance=0.0, first_block_size=FIRST_BLOCK_SIZE):
+        """
+        Compute the image progressively, from a coarse preview to the full image in interlaced passes that only compute
+        the pixels not computed yet, see fractals.progressive
+
+        Args:
+            backend: Backend computing the passes, or its name, see fractals.backends
+            periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+            first_block_size: Width and height in pixels of the blocks of the first frame, a power of 2
+
+        Returns:
+            Generator of frames, see fractals.progressive.ProgressiveFrame
+        """
+
+        backend = get_backend(backend, PROGRESSIVE)
+        compute_points = functools.partial(self.__compute_points, backend, periodicity_tolerance)
+
+        return progressive_frames(compute_points, self._plane, self._complex_plane, first_block_size)
+
+    def __compute_points(self, backend, periodicity_tolerance, points):
+        values = np.empty(points.shape[0], dtype=np.float32)
+        backend.escape_time_points(values, BURNING_SHIP, points, self._max_iterations, periodicity_tolerance)
 
-    def compute(self, use_gpu=True):
-        pixels = np.zeros([self._plane.width, self._plane.height, 3], dtype=np.uint8)
-
-        if use_gpu:
-            threads_per_block = (16, 16)
-            blocks_x = math.ceil(pixels.shape[0] / threads_per_block[0])
-            blocks_y = math.ceil(pixels.shape[1] / threads_per_block[1])
-            blocks_in_grid = (blocks_x, blocks_y)
-
-            burning_ship_cuda[blocks_in_grid, threads_per_block](pixels, self._plane.width, self._plane.height,
-                                                                 self._max_iterations,
-                                                                 self._complex_plane.real_begin,
-                                                                 self._complex_plane.real_end,
-                                                                 self._complex_plane.imag_begin,
-                                                                 self._complex_plane.imag_end,
-                                                                 self._hsv_color.hue,
-                                                                 self._hsv_color.saturation,
-                                                                 self._hsv_color.intensity)
-        else:
-            burning_ship(pixels, self._plane.width, self._plane.height, self._max_iterations,
-                         self._complex_plane.real_begin, self._complex_plane.real_end,
-                         self._complex_plane.imag_begin, self._complex_plane.imag_end,
-                         self._hsv_color.hue, self._hsv_color.saturation, self._hsv_color.intensity)
-
-        return pixels
+        return values
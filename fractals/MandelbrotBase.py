@@ -1,3 +1,4 @@
+from fractals.coloring import colorize_field, rgb_lut
 from fractals.common import Plane2d, ComplexPlane, HsvColor
 
 
@@ -39,3 +40,11 @@ class MandelbrotBase:
         self._complex_plane = complex_plane
         self._max_iterations = max_iterations
         self._hsv_color = hsv_color
+
+    def colorize(self, field):
+        """
+        Map a field of smooth iteration counts to RGB pixels of shape [height, width, 3] with the color of the fractal.
+        Recoloring a field only requires changing the color, not computing the field again.
+        """
+
+        return colorize_field(field, self._max_iterations, rgb_lut(self._hsv_color), self._hsv_color.intensity)
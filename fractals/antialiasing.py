@@ -0,0 +1,117 @@
+"""
+Contains the edge-adaptive anti-aliasing of escape-time fractals. Images are computed once with one sample per pixel,
+and only the pixels on edges, whose smooth iteration counts differ from those of a neighbour, are supersampled with
+jittered sub-pixel samples. Flat regions, which are most of an image, cost nothing more.
+"""
+
+import numpy as np
+
+from fractals.common import Plane2d, ComplexPlane, Tile
+from fractals.kernels.common import INTERIOR
+
+# Width and height of the grid of jittered samples of an edge pixel, and difference between the smooth iteration counts
+# of neighbouring pixels above which they are on an edge
+DEFAULT_SAMPLES = 4
+DEFAULT_EDGE_THRESHOLD = 1.0
+
+
+def edge_mask(field, threshold=DEFAULT_EDGE_THRESHOLD):
+    """
+    Find the pixels on edges: pixels whose smooth iteration count differs from that of a horizontal or vertical
+    neighbour by more than a threshold, or that are inside the set while a neighbour is not.
+
+    Args:
+        field: Array of smooth iteration counts of shape [height, width]
+        threshold: Difference between smooth iteration counts above which neighbours are on an edge
+
+    Returns:
+        Boolean array of shape [height, width]
+    """
+
+    interior = field == INTERIOR
+    edges = np.zeros(field.shape, dtype=bool)
+
+    for axis in (0, 1):
+        before = [slice(None), slice(None)]
+        after = [slice(None), slice(None)]
+        before[axis] = slice(None, -1)
+        after[axis] = slice(1, None)
+        before, after = tuple(before), tuple(after)
+
+        # Both pixels of a pair of neighbours on an edge are supersampled
+        differs = ((interior[before] != interior[after]) |
+                   ((np.abs(field[before] - field[after]) > threshold) & ~interior[before] & ~interior[after]))
+        edges[before] |= differs
+        edges[after] |= differs
+
+    return edges
+
+
+def jittered_points(xs, ys, samples, plane: Plane2d, complex_plane: ComplexPlane, rng):
+    """
+    Create jittered samples of pixels: one sample at a random position in each cell of a grid over each pixel. Pixels
+    cover the area between their coordinates and those of the next pixel, as when rendering at a multiple of the size
+    of the image and downscaling.
+
+    Args:
+        xs: Horizontal positions of the pixels in the image
+        ys: Vertical positions of the pixels in the image
+        samples: Width and height of the grid of samples of a pixel
+        plane: Size of the image
+        complex_plane: Part of the complex plane covered by the image
+        rng: NumPy random generator of the jitter
+
+    Returns:
+        Array of points of shape [pixels, samples * samples] (complex128)
+    """
+
+    cells = np.arange(samples * samples)
+    jitter = rng.random((2, xs.size, cells.size))
+
+    x = xs[:, np.newaxis] + ((cells % samples) + jitter[0]) / samples
+    y = ys[:, np.newaxis] + ((cells // samples) + jitter[1]) / samples
+
+    points = np.empty(x.shape, dtype=np.complex128)
+    points.real = complex_plane.real_begin + (x / plane.width) * (complex_plane.real_end - complex_plane.real_begin)
+    points.imag = complex_plane.imag_begin + (y / plane.height) * (complex_plane.imag_end - complex_plane.imag_begin)
+
+    return points
+
+
+def anti_alias(field, colorize, compute_points, plane: Plane2d, complex_plane: ComplexPlane, tile: Tile = None,
+               samples=DEFAULT_SAMPLES, threshold=DEFAULT_EDGE_THRESHOLD, seed=0):
+    """
+    Colorize a field, and replace the color of its edge pixels by the average color of jittered sub-pixel samples.
+
+    Args:
+        field: Array of smooth iteration counts of shape [tile.height, tile.width], computed with one sample per pixel
+        colorize: Function that maps a field to RGB pixels of shape [height, width, 3]
+        compute_points: Function that computes and returns the smooth iteration counts of an array of points
+        plane: Size of the image
+        complex_plane: Part of the complex plane covered by the image
+        tile: Part of the image of the field, or None for the whole image
+        samples: Width and height of the grid of samples of an edge pixel
+        threshold: Difference between smooth iteration counts above which neighbours are on an edge
+        seed: Seed of the jitter, so that images are reproducible
+
+    Returns:
+        Array of pixels of shape [tile.height, tile.width, 3]
+    """
+
+    if tile is None:
+        tile = Tile(0, 0, plane.width, plane.height)
+
+    pixels = colorize(field)
+
+    ys, xs = np.nonzero(edge_mask(field, threshold))
+    if xs.size == 0:
+        return pixels
+
+    points = jittered_points(tile.x + xs, tile.y + ys, samples, plane, complex_plane, np.random.default_rng(seed))
+    values = compute_points(points.ravel()).reshape(points.shape)
+
+    # Colors are averaged rather than smooth iteration counts, which are not defined inside the set
+    sample_pixels = colorize(values)
+    pixels[ys, xs] = np.rint(sample_pixels.mean(axis=1)).astype(np.uint8)
+
+    return pixels
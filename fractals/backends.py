@@ -0,0 +1,406 @@
+"""
+Contains the compute backends, which run the kernels of the fractals, and the registry that selects them. Backends are
+registered in order of preference, fastest first, and the auto backend is the first registered backend that is
+available on the host and able to compute what is asked. Kernels are imported when they are launched, so that the
+registry can be imported without Numba or CUDA.
+"""
+
+import functools
+import importlib.util
+import math
+from contextlib import contextmanager
+
+# Capabilities of backends: escape-time fields, the Mariani-Silver engine, deep zooms with perturbation, buddhabrots,
+# incremental refinement of escape-time fields, and escape-time samples of arbitrary points, for anti-aliasing and
+# progressive rendering
+ESCAPE_TIME = "escape-time"
+MARIANI_SILVER = "mariani-silver"
+DEEP_ZOOM = "deep-zoom"
+BUDDHABROT = "buddhabrot"
+REFINE = "refine"
+ANTI_ALIASING = "anti-aliasing"
+PROGRESSIVE = "progressive"
+
+# Name of the backend that selects the fastest backend available
+AUTO = "auto"
+
+# Registered backend classes by name, in order of preference
+BACKENDS = {}
+
+
+def register_backend(backend_class):
+    """
+    Register a backend class after the backends already registered, which are preferred to it. Used as a decorator.
+
+    Args:
+        backend_class: Subclass of Backend
+
+    Returns:
+        The backend class
+    """
+
+    BACKENDS[backend_class.name] = backend_class
+
+    return backend_class
+
+
+class Backend:
+    # Name of the backend in the registry and the CLIs
+    name = None
+
+    # What the backend can compute
+    capabilities = frozenset()
+
+    # Tunable parameters of the backend and their default values
+    defaults = {}
+
+    @property
+    def parameters(self):
+        return dict(self._parameters)
+
+    def __init__(self, **parameters):
+        unknown = sorted(set(parameters) - set(self.defaults))
+        if unknown:
+            raise ValueError(f"Unknown parameters {', '.join(unknown)} of the {self.name} backend, expected "
+                             f"{', '.join(self.defaults) or 'none'}")
+
+        self._parameters = {**self.defaults, **parameters}
+
+    @staticmethod
+    def is_available():
+        return True
+
+    def supports(self, capability):
+        return capability in self.capabilities
+
+    def escape_time(self, field, fractal, tile, plane, max_iterations, periodicity_tolerance, complex_plane, cx=0.0,
+                    cy=0.0):
+        """
+        Compute the smooth iteration counts of a tile of an escape-time fractal, every pixel independently.
+
+        Args:
+            field: Reference to the array of smooth iteration counts of shape [tile.height, tile.width]
+            fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+            tile: Part of the image to compute
+            plane: Size of the image
+            max_iterations: Max iterations for orbital escape
+            periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+            complex_plane: Part of the complex plane covered by the image
+            cx: Real part of the julia set constant
+            cy: Imaginary part of the julia set constant
+        """
+
+        raise NotImplementedError(f"The {self.name} backend cannot compute {ESCAPE_TIME}")
+
+    def mariani_silver(self, field, fractal, tile, plane, max_iterations, periodicity_tolerance, complex_plane, cx=0.0,
+                       cy=0.0):
+        """
+        Compute the smooth iteration counts of a tile of an escape-time fractal with Mariani-Silver subdivision. See
+        escape_time for the arguments.
+        """
+
+        raise NotImplementedError(f"The {self.name} backend cannot compute {MARIANI_SILVER}")
+
+    def perturbation(self, field, fractal, orbit, tile, plane, max_iterations, spacing):
+        """
+        Compute the smooth iteration counts of a tile of a deep zoom as offsets from a reference orbit.
+
+        Args:
+            field: Reference to the array of smooth iteration counts of shape [tile.height, tile.width]
+            fractal: Fractal to compute, MANDELBROT or BURNING_SHIP
+            orbit: Reference orbit of the center of the view, see fractals.perturbation
+            tile: Part of the image to compute
+            plane: Size of the image
+            max_iterations: Max iterations for orbital escape
+            spacing: Distance in the complex plane between two neighbouring pixels
+        """
+
+        raise NotImplementedError(f"The {self.name} backend cannot compute {DEEP_ZOOM}")
+
+    def refine(self, field, z, iterations, status, fractal, tile, plane, max_iterations, periodicity_tolerance,
+               complex_plane, cx=0.0, cy=0.0):
+        """
+        Continue the orbits of the pixels of a tile that are still bounded, up to the max iterations.
+
+        Args:
+            field: Reference to the array of smooth iteration counts of shape [tile.height, tile.width]
+            z: Reference to the last value of the orbit of each pixel
+            iterations: Reference to the number of iterations of each pixel
+            status: Reference to the status of each pixel, see fractals.kernels.common.BOUNDED
+            fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+            tile: Part of the image to compute
+            plane: Size of the image
+            max_iterations: Max iterations for orbital escape
+            periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+            complex_plane: Part of the complex plane covered by the image
+            cx: Real part of the julia set constant
+            cy: Imaginary part of the julia set constant
+        """
+
+        raise NotImplementedError(f"The {self.name} backend cannot compute {REFINE}")
+
+    def escape_time_points(self, values, fractal, points, max_iterations, periodicity_tolerance, cx=0.0, cy=0.0):
+        """
+        Compute the smooth iteration counts of arbitrary points of the complex plane, e.g. sub-pixel samples.
+
+        Args:
+            values: Reference to the array of smooth iteration counts of the points (float32)
+            fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+            points: Points of the complex plane (complex128)
+            max_iterations: Max iterations for orbital escape
+            periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+            cx: Real part of the julia set constant
+            cy: Imaginary part of the julia set constant
+        """
+
+        raise NotImplementedError(f"The {self.name} backend cannot compute {ANTI_ALIASING}")
+
+
+@register_backend
+class CudaBackend(Backend):
+    name = "cuda"
+    capabilities = frozenset({ESCAPE_TIME, DEEP_ZOOM, BUDDHABROT, ANTI_ALIASING, PROGRESSIVE})
+
+    # Width and height in threads of the blocks of escape-time kernels, and launch size of the buddhabrot kernels
+    defaults = {"block_size": 16, "threads_per_block": 256, "total_blocks": 2048}
+
+    @property
+    def block_size(self):
+        return self._parameters["block_size"]
+
+    @property
+    def threads_per_block(self):
+        return self._parameters["threads_per_block"]
+
+    @property
+    def total_blocks(self):
+        return self._parameters["total_blocks"]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def is_available():
+        # Initializes the CUDA driver, so it is only checked once
+        try:
+            from numba import cuda
+        except ImportError:
+            return False
+
+        return cuda.is_available()
+
+    def escape_time(self, field, fractal, tile, plane, max_iterations, periodicity_tolerance, complex_plane, cx=0.0,
+                    cy=0.0):
+        from fractals.kernels.common import JULIA, BURNING_SHIP
+        from fractals.kernels.cuda.burningship import burning_ship_cuda
+        from fractals.kernels.cuda.julia import julia_cuda
+        from fractals.kernels.cuda.mandelbrot import mandelbrot_cuda
+
+        threads_per_block, blocks_in_grid = self.__grid(field)
+
+        arguments = (field, tile.x, tile.y, plane.width, plane.height, max_iterations, periodicity_tolerance,
+                     complex_plane.real_begin, complex_plane.real_end, complex_plane.imag_begin, complex_plane.imag_end)
+
+        if fractal == JULIA:
+            julia_cuda[blocks_in_grid, threads_per_block](*arguments, cx, cy)
+        elif fractal == BURNING_SHIP:
+            burning_ship_cuda[blocks_in_grid, threads_per_block](*arguments)
+        else:
+            mandelbrot_cuda[blocks_in_grid, threads_per_block](*arguments)
+
+    def perturbation(self, field, fractal, orbit, tile, plane, max_iterations, spacing):
+        from fractals.kernels.cuda.perturbation import perturbation_cuda
+
+        threads_per_block, blocks_in_grid = self.__grid(field)
+
+        perturbation_cuda[blocks_in_grid, threads_per_block](field, fractal, orbit, tile.x, tile.y, plane.width,
+                                                             plane.height, max_iterations, spacing)
+
+    def escape_time_points(self, values, fractal, points, max_iterations, periodicity_tolerance, cx=0.0, cy=0.0):
+        from fractals.kernels.cuda.antialiasing import escape_time_points_cuda
+
+        # One thread per point, in blocks of as many threads as the square blocks of the other kernels
+        threads_per_block = self.block_size * self.block_size
+        blocks_in_grid = math.ceil(points.shape[0] / threads_per_block)
+
+        escape_time_points_cuda[blocks_in_grid, threads_per_block](values, fractal, points, max_iterations,
+                                                                   periodicity_tolerance, cx, cy)
+
+    def __grid(self, field):
+        # One thread per pixel, in square blocks
+        threads_per_block = (self.block_size, self.block_size)
+        blocks_x = math.ceil(field.shape[1] / threads_per_block[0])
+        blocks_y = math.ceil(field.shape[0] / threads_per_block[1])
+
+        return threads_per_block, (blocks_x, blocks_y)
+
+
+@register_backend
+class NumbaBackend(Backend):
+    name = "numba"
+    capabilities = frozenset({ESCAPE_TIME, MARIANI_SILVER, DEEP_ZOOM, BUDDHABROT, REFINE, ANTI_ALIASING, PROGRESSIVE})
+
+    # Number of threads of the parallel kernels, None for one per core, and number of iterations of their parallel
+    # loops handed to a thread at once, 0 for one equal chunk per thread
+    defaults = {"threads": None, "chunk_size": 1}
+
+    @property
+    def threads(self):
+        return self._parameters["threads"]
+
+    @property
+    def chunk_size(self):
+        return self._parameters["chunk_size"]
+
+    @staticmethod
+    def is_available():
+        return importlib.util.find_spec("numba") is not None
+
+    def set_threads(self):
+        """
+        Set the number of threads of the parallel kernels launched next from the calling thread
+        """
+
+        if self.threads is not None:
+            import numba
+
+            numba.set_num_threads(self.threads)
+
+    @contextmanager
+    def balanced(self):
+        """
+        Context in which the parallel kernels launched from the calling thread are load-balanced. By default, Numba
+        splits parallel loops into one chunk of rows per thread, and the threads given the rows through the interior
+        of the set finish long after the others. Small chunks are instead handed to threads as they become idle, which
+        only the TBB threading layer does. The OpenMP and workqueue layers assign the chunks to threads statically.
+        """
+
+        import numba
+
+        self.set_threads()
+        previous_chunk_size = numba.set_parallel_chunksize(self.chunk_size)
+
+        try:
+            yield
+        finally:
+            numba.set_parallel_chunksize(previous_chunk_size)
+
+    def escape_time(self, field, fractal, tile, plane, max_iterations, periodicity_tolerance, complex_plane, cx=0.0,
+                    cy=0.0):
+        from fractals.kernels.burningship import burning_ship
+        from fractals.kernels.common import JULIA, BURNING_SHIP
+        from fractals.kernels.julia import julia
+        from fractals.kernels.mandelbrot import mandelbrot
+
+        arguments = (field, tile.x, tile.y, plane.width, plane.height, max_iterations, periodicity_tolerance,
+                     complex_plane.real_begin, complex_plane.real_end, complex_plane.imag_begin, complex_plane.imag_end)
+
+        with self.balanced():
+            if fractal == JULIA:
+                julia(*arguments, cx, cy)
+            elif fractal == BURNING_SHIP:
+                burning_ship(*arguments)
+            else:
+                mandelbrot(*arguments)
+
+    def mariani_silver(self, field, fractal, tile, plane, max_iterations, periodicity_tolerance, complex_plane, cx=0.0,
+                       cy=0.0):
+        from fractals.kernels.mariani_silver import mariani_silver
+
+        with self.balanced():
+            mariani_silver(field, fractal, tile.x, tile.y, plane.width, plane.height, max_iterations,
+                           periodicity_tolerance, complex_plane.real_begin, complex_plane.real_end,
+                           complex_plane.imag_begin, complex_plane.imag_end, cx, cy)
+
+    def perturbation(self, field, fractal, orbit, tile, plane, max_iterations, spacing):
+        from fractals.kernels.perturbation import perturbation
+
+        with self.balanced():
+            perturbation(field, fractal, orbit, tile.x, tile.y, plane.width, plane.height, max_iterations, spacing)
+
+    def refine(self, field, z, iterations, status, fractal, tile, plane, max_iterations, periodicity_tolerance,
+               complex_plane, cx=0.0, cy=0.0):
+        from fractals.kernels.refinement import continue_escape
+
+        with self.balanced():
+            continue_escape(field, z, iterations, status, fractal, tile.x, tile.y, plane.width, plane.height,
+                            max_iterations, periodicity_tolerance, complex_plane.real_begin, complex_plane.real_end,
+                            complex_plane.imag_begin, complex_plane.imag_end, cx, cy)
+
+    def escape_time_points(self, values, fractal, points, max_iterations, periodicity_tolerance, cx=0.0, cy=0.0):
+        from fractals.kernels.antialiasing import escape_time_points
+
+        with self.balanced():
+            escape_time_points(values, fractal, points, max_iterations, periodicity_tolerance, cx, cy)
+
+
+@register_backend
+class NumpyBackend(Backend):
+    name = "numpy"
+    capabilities = frozenset({ESCAPE_TIME, ANTI_ALIASING, PROGRESSIVE})
+
+    # Number of pixels iterated at once, which bounds the memory of the temporary arrays
+    defaults = {"chunk_pixels": 1 << 16}
+
+    @property
+    def chunk_pixels(self):
+        return self._parameters["chunk_pixels"]
+
+    def escape_time(self, field, fractal, tile, plane, max_iterations, periodicity_tolerance, complex_plane, cx=0.0,
+                    cy=0.0):
+        from fractals.kernels.vectorized import escape_time_vectorized
+
+        escape_time_vectorized(field, fractal, tile.x, tile.y, plane.width, plane.height, max_iterations,
+                               periodicity_tolerance, complex_plane.real_begin, complex_plane.real_end,
+                               complex_plane.imag_begin, complex_plane.imag_end, cx, cy, self.chunk_pixels)
+
+    def escape_time_points(self, values, fractal, points, max_iterations, periodicity_tolerance, cx=0.0, cy=0.0):
+        from fractals.kernels.vectorized import escape_time_points_vectorized
+
+        escape_time_points_vectorized(values, fractal, points, max_iterations, periodicity_tolerance, cx, cy,
+                                      self.chunk_pixels)
+
+
+def get_backend(backend=AUTO, capability=ESCAPE_TIME, **parameters):
+    """
+    Create a backend by name, or select the first registered backend that is available and has a capability
+
+    Args:
+        backend: Name of a registered backend, AUTO, or a backend, which is returned as is
+        capability: What the backend must be able to compute
+        **parameters: Tunable parameters of the backend. Parameters of other backends and parameters set to None are
+                      ignored, so that callers can pass the parameters of every backend.
+
+    Returns:
+        The backend
+    """
+
+    if isinstance(backend, Backend):
+        if not backend.supports(capability):
+            raise ValueError(f"The {backend.name} backend cannot compute {capability}")
+
+        return backend
+
+    if backend == AUTO:
+        candidates = [backend_class for backend_class in BACKENDS.values() if capability in backend_class.capabilities]
+    elif backend in BACKENDS:
+        candidates = [BACKENDS[backend]]
+
+        if capability not in candidates[0].capabilities:
+            raise ValueError(f"The {backend} backend cannot compute {capability}")
+    else:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join((AUTO,) + tuple(BACKENDS))}")
+
+    for backend_class in candidates:
+        if backend_class.is_available():
+            return backend_class(**{name: value for name, value in parameters.items()
+                                    if name in backend_class.defaults and value is not None})
+
+    raise ValueError(f"No backend able to compute {capability} is available" if backend == AUTO else
+                     f"The {backend} backend is not available on this host")
+
+
+def backend_names(capability=ESCAPE_TIME):
+    """
+    Names of the registered backends that have a capability, after AUTO, e.g. for the choices of CLI arguments
+    """
+
+    return (AUTO,) + tuple(name for name, backend_class in BACKENDS.items() if capability in backend_class.capabilities)
@@ -0,0 +1,154 @@
+"""
+Contains the on-disk checkpoint of long-running buddhabrot jobs
+"""
+
+import json
+import os
+
+import numpy as np
+
+COUNTERS_FILE = "counters-{generation}.npy"
+RNG_STATES_FILE = "rng_states-{generation}.npy"
+METADATA_FILE = "metadata.json"
+
+
+class BuddhabrotCheckpoint:
+    """
+    Checkpoint of a buddhabrot job, stored as a directory with:
+    - counters-N.npy: the histogram of generation N
+    - rng_states-N.npy: the RNG states after the last sample traced into the histogram of generation N
+    - metadata.json: the job parameters, the generation of the last checkpoint and its number of samples
+
+    The histogram is accumulated in memory. Each save writes the files of a new generation, then replaces the metadata
+    atomically to point to them, and only then deletes the files of the previous generation. A crash at any point thus
+    leaves a checkpoint whose histogram, RNG states and number of samples match, and resuming traces the samples after
+    it once.
+    """
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def counters(self) -> np.ndarray:
+        return self._counters
+
+    @property
+    def rng_states(self):
+        return self._rng_states
+
+    @property
+    def samples(self):
+        return self._metadata["samples"]
+
+    @property
+    def parameters(self) -> dict:
+        return self._metadata["parameters"]
+
+    def __init__(self, path, counters, rng_states, metadata):
+        self._path = path
+        self._counters = counters
+        self._rng_states = rng_states
+        self._metadata = metadata
+
+    @staticmethod
+    def exists(path):
+        return os.path.isfile(os.path.join(path, METADATA_FILE))
+
+    @staticmethod
+    def create(path, shape, parameters, dtype=np.uint64):
+        """
+        Create a checkpoint with an empty histogram.
+
+        Args:
+            path: Directory of the checkpoint
+            shape: Shape of the histogram
+            parameters: JSON-serializable job parameters, restored when resuming
+            dtype: Type of the histogram, see Buddhabrot.counters_dtype
+
+        Returns:
+            The new checkpoint
+        """
+
+        os.makedirs(path, exist_ok=True)
+
+        # The empty histogram of generation 0 is written as a sparse file
+        np.lib.format.open_memmap(os.path.join(path, COUNTERS_FILE.format(generation=0)), mode="w+", dtype=dtype,
+                                  shape=shape).flush()
+
+        checkpoint = BuddhabrotCheckpoint(path, np.zeros(shape, dtype=dtype), None,
+                                          {"generation": 0, "samples": 0, "parameters": parameters})
+        checkpoint.__write_metadata()
+
+        return checkpoint
+
+    @staticmethod
+    def open(path, mmap_mode=None):
+        """
+        Open an existing checkpoint.
+
+        Args:
+            path: Directory of the checkpoint
+            mmap_mode: None to load the histogram in memory to accumulate into it, or "r" to memory-map it read-only,
+                       e.g. to merge histograms larger than memory
+
+        Returns:
+            The checkpoint
+        """
+
+        with open(os.path.join(path, METADATA_FILE)) as metadata_file:
+            metadata = json.load(metadata_file)
+
+        generation = metadata["generation"]
+        counters = np.load(os.path.join(path, COUNTERS_FILE.format(generation=generation)), mmap_mode=mmap_mode)
+
+        rng_states_path = os.path.join(path, RNG_STATES_FILE.format(generation=generation))
+        rng_states = np.load(rng_states_path) if os.path.isfile(rng_states_path) else None
+
+        return BuddhabrotCheckpoint(path, counters, rng_states, metadata)
+
+    def update_parameters(self, **parameters):
+        """
+        Update job parameters, e.g. the total number of samples when refining a finished job.
+        """
+
+        self._metadata["parameters"].update(parameters)
+        self.__write_metadata()
+
+    def save(self, rng_states, samples):
+        """
+        Persist the histogram along with the RNG states and the number of samples traced so far.
+
+        Args:
+            rng_states: RNG states after the last traced sample
+            samples: Number of samples traced so far
+        """
+
+        previous_generation = self._metadata["generation"]
+        generation = previous_generation + 1
+
+        self._rng_states = np.array(rng_states)
+        self.__write_array(COUNTERS_FILE.format(generation=generation), self._counters)
+        self.__write_array(RNG_STATES_FILE.format(generation=generation), self._rng_states)
+
+        self._metadata["generation"] = generation
+        self._metadata["samples"] = samples
+        self.__write_metadata()
+
+        for name in (COUNTERS_FILE, RNG_STATES_FILE):
+            path = os.path.join(self._path, name.format(generation=previous_generation))
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def __write_array(self, name, array):
+        # Files of a generation are synced to disk before the metadata points to them
+        with open(os.path.join(self._path, name), "wb") as array_file:
+            np.save(array_file, array)
+            array_file.flush()
+            os.fsync(array_file.fileno())
+
+    def __write_metadata(self):
+        metadata_path = os.path.join(self._path, METADATA_FILE)
+        with open(metadata_path + ".tmp", "w") as metadata_file:
+            json.dump(self._metadata, metadata_file, indent=4)
+        os.replace(metadata_path + ".tmp", metadata_path)
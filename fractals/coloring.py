@@ -0,0 +1,97 @@
+"""
+Contains the colorization stage, which maps fields of smooth iteration counts computed by the escape-time fractals to
+pixels, so that fields can be recolored without computing them again
+"""
+
+import numpy as np
+from PIL import Image as im
+
+from fractals.common import HsvColor
+from fractals.kernels.coloring import colorize
+
+# Number of colors of lookup tables, one per value of a uint8 channel
+LUT_SIZE = 256
+
+
+def hsv_lut(hsv_color: HsvColor, size=LUT_SIZE):
+    """
+    Create the lookup table of a single-hue visualization, whose value grows with the smooth iteration count.
+
+    Args:
+        hsv_color: Color used for the visualization
+        size: Number of colors
+
+    Returns:
+        Lookup table of HSV colors
+    """
+
+    lut = np.zeros([size, 3], dtype=np.uint8)
+    lut[:, 0] = 255 * (hsv_color.hue / 360)
+    lut[:, 1] = 255 * hsv_color.saturation
+    lut[:, 2] = np.arange(0, size) * 255 // (size - 1)
+
+    return lut
+
+
+def rgb_lut(hsv_color: HsvColor, size=LUT_SIZE):
+    """
+    Create the lookup table of a single-hue visualization in RGB, so that pixels are written in their final color
+    space. Colors are converted with Pillow, as images used to be.
+
+    Args:
+        hsv_color: Color used for the visualization
+        size: Number of colors
+
+    Returns:
+        Lookup table of RGB colors
+    """
+
+    return np.asarray(im.fromarray(hsv_lut(hsv_color, size)[np.newaxis], "HSV").convert("RGB"))[0]
+
+
+def colorize_field(field, max_iterations, lut, color_intensity):
+    """
+    Map a field of smooth iteration counts to pixels.
+
+    Args:
+        field: Array of smooth iteration counts of shape [height, width]
+        max_iterations: Max iterations for orbital escape of the field
+        lut: Lookup table of colors, see rgb_lut
+        color_intensity: Intensity of the color used for the visualization
+
+    Returns:
+        Array of pixels of shape [height, width, 3], in the color space of the lookup table
+    """
+
+    pixels = np.empty([field.shape[0], field.shape[1], 3], dtype=np.uint8)
+    colorize(pixels, field, lut, max_iterations, color_intensity)
+
+    return pixels
+
+
+def save_field(path, field, max_iterations):
+    """
+    Save a field of smooth iteration counts along with the max iterations needed to color it.
+
+    Args:
+        path: Path of the .npz file
+        field: Array of smooth iteration counts
+        max_iterations: Max iterations for orbital escape of the field
+    """
+
+    np.savez(path, field=field, max_iterations=max_iterations)
+
+
+def load_field(path):
+    """
+    Load a field of smooth iteration counts saved with save_field.
+
+    Args:
+        path: Path of the .npz file
+
+    Returns:
+        The field and its max iterations
+    """
+
+    with np.load(path) as data:
+        return data["field"], int(data["max_iterations"])
@@ -1,8 +1,24 @@
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 
 import numpy as np
 from PIL import Image as im
 
+from fractals.backends import ESCAPE_TIME, MARIANI_SILVER
+
+# Engines of the escape-time fractals: every pixel computed independently, or Mariani-Silver subdivision (numba
+# backend only)
+ENGINES = ("brute-force", "mariani-silver")
+
+# Engines of the burning ship. Its set is not simply connected, so mariani-silver would fill rectangles whose border is
+# inside the set but which contain escaping points.
+BURNING_SHIP_ENGINES = ("brute-force",)
+
+# Sampling modes of the buddhabrot: uniform over the view, or Metropolis-Hastings
+SAMPLING_MODES = ("uniform", "metropolis")
+
+
 @dataclass
 class Plane2d:
     width: int = 1920
@@ -24,6 +40,69 @@ class HsvColor:
     intensity: float = 2.0
 
 
+@dataclass
+class Tile:
+    # Position and size in pixels of a part of the image
+    x: int = 0
+    y: int = 0
+    width: int = 512
+    height: int = 512
+
+
+@dataclass(frozen=True)
+class DeepZoomView:
+    # Decimal strings, as deep zooms need more digits than float64 has
+    center_real: str = "-0.5"
+    center_imag: str = "0"
+    zoom: str = "1"
+
+
+@dataclass
+class SamplingStatistics:
+    proposed: int = 0
+    accepted: int = 0
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.proposed if self.proposed > 0 else 0.0
+
+
+def engine_capability(engine, engines=ENGINES):
+    """
+    Check the engine of an escape-time fractal
+
+    Args:
+        engine: Engine of the fractal, one of engines
+        engines: Engines supported by the fractal
+
+    Returns:
+        Capability that backends need to compute the fractal with the engine, see fractals.backends
+    """
+
+    if engine not in engines:
+        raise ValueError(f"Unsupported engine '{engine}', expected one of {', '.join(engines)}")
+
+    return MARIANI_SILVER if engine == "mariani-silver" else ESCAPE_TIME
+
+
+@contextmanager
+def timed(timings, stage):
+    """
+    Add the time spent in a block to the time of a stage
+
+    Args:
+        timings: Seconds spent in each stage, by name of stage
+        stage: Name of the stage
+    """
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
 def image_rgb_from_hsv(pixels: np.array) -> im:
     """
     Create RGB Pillow image from numpy array with HSV pixels
@@ -35,4 +114,32 @@ def image_rgb_from_hsv(pixels: np.array) -> im:
         Pillow RGB image
     """
 
-    return im.fromarray(pixels.transpose((1, 0, 2)), 'HSV').convert('RGB')
\ No newline at end of file
+    return im.fromarray(pixels.transpose((1, 0, 2)), 'HSV').convert('RGB')
+
+
+def image_rgb_from_rows(pixels: np.array) -> im:
+    """
+    Create RGB Pillow image from a row-major numpy array with RGB pixels, without transposing or converting it
+
+    Args:
+        pixels: Array of RGB pixels of shape [height, width, 3]
+
+    Returns:
+        Pillow RGB image
+    """
+
+    return im.fromarray(pixels)
+
+
+def image_rgb(pixels: np.array) -> im:
+    """
+    Create RGB Pillow image from numpy array with RGB pixels
+
+    Args:
+        pixels: 2D array of RGB pixels
+
+    Returns:
+        Pillow RGB image
+    """
+
+    return im.fromarray(pixels.transpose((1, 0, 2)), 'RGB')
@@ -0,0 +1,50 @@
+"""
+Contains the kernel of the anti-aliasing of escape-time fractals, which computes the smooth iteration counts of
+arbitrary points of the complex plane, e.g. sub-pixel samples, rather than of a grid of pixels
+"""
+
+import math
+
+import numba
+from numba import prange
+
+from fractals.kernels.burningship import burning_ship_escape
+from fractals.kernels.common import JULIA, BURNING_SHIP, INTERIOR
+from fractals.kernels.julia import julia_escape
+from fractals.kernels.mandelbrot import mandelbrot_escape
+
+# Number of points a thread computes at once, as the parallel loops of the numba backend hand out one chunk at a time
+POINTS_PER_CHUNK = 256
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def escape_time_points(values, fractal, points, max_iterations, periodicity_tolerance, cx, cy):
+    """
+    Compute the smooth iteration counts of points of the complex plane using multi-threading.
+
+    Args:
+        values: Reference to the array of smooth iteration counts of the points, INTERIOR for points inside the set
+        fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+        points: Points of the complex plane (complex128)
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        cx: Real part of the julia set constant
+        cy: Imaginary part of the julia set constant
+    """
+
+    total_chunks = (points.shape[0] + POINTS_PER_CHUNK - 1) // POINTS_PER_CHUNK
+
+    for chunk in prange(0, total_chunks):
+        for i in range(chunk * POINTS_PER_CHUNK, min((chunk + 1) * POINTS_PER_CHUNK, points.shape[0])):
+            if fractal == JULIA:
+                iterations, z = julia_escape(points[i], complex(cx, cy), max_iterations, periodicity_tolerance)
+            elif fractal == BURNING_SHIP:
+                iterations, z = burning_ship_escape(points[i], max_iterations, periodicity_tolerance)
+            else:
+                iterations, z = mandelbrot_escape(points[i], max_iterations, periodicity_tolerance)
+
+            if iterations >= max_iterations:
+                values[i] = INTERIOR
+            else:
+                # Smooth iteration count
+                values[i] = iterations - math.log(math.log(z.real * z.real + z.imag * z.imag)) + 4.0
@@ -1,143 +1,629 @@
-from random import uniform as randuniform
+import math
 
 import numba
 import numpy as np
-from numba import cuda, prange
-from numba.cuda.random import xoroshiro128p_uniform_float32
+from numba import prange
 
+from fractals.kernels.common import in_main_cardioid_or_bulb
+from fractals.kernels.xoroshiro import xoroshiro128p_fill_uniform_float64, xoroshiro128p_uniform_float64
 
-@numba.jit(nopython=True)
-def __check_sample_trajectory_escapes(sample_real, sample_imag, max_iterations):
+# Number of samples drawn at once from the random number generator on the CPU
+SAMPLE_BATCH_SIZE = 1024
+
+# Square of the complex plane that contains every escaping orbit worth tracing, used by Metropolis-Hastings sampling
+SAMPLING_DOMAIN_START = -2.0
+SAMPLING_DOMAIN_SIZE = 4.0
+
+# Metropolis-Hastings mutations: probability of jumping anywhere in the sampling domain, and the min and max radius of
+# small mutations relative to the size of the view
+METROPOLIS_RANDOM_JUMP_PROBABILITY = 0.2
+METROPOLIS_MIN_RADIUS = 0.0001
+METROPOLIS_MAX_RADIUS = 0.1
+
+
+@numba.jit(nopython=True, cache=True)
+def __compute_sample_trajectory(orbit, sample_real, sample_imag, max_iterations):
     c = complex(sample_real, sample_imag)
     z = 0.0j
 
     iterations = 0
     while (abs(z) < 10.0) and iterations < max_iterations:
         z = z * z + c
+        orbit[iterations] = z
         iterations += 1
 
     return iterations
 
 
-@numba.jit(nopython=True)
-def __trace_sample_trajectory(counters, sample_real, sample_imag, width, height, re_start, re_end,
-                              im_start, im_end):
-    c = complex(sample_real, sample_imag)
-    z = 0.0j
+@numba.jit(nopython=True, cache=True)
+def __count_orbit_point(counters, x, y, orbit_length, channel_iterations, weight):
+    if (0 < x < counters.shape[1]) and (0 < y < counters.shape[2]):
+        # The orbit counts towards every channel whose max iterations it escapes within
+        for channel in range(0, counters.shape[0]):
+            if orbit_length < channel_iterations[channel]:
+                counters[channel, x, y] += weight
 
-    while abs(z) < 10.0:
-        z = z * z + c
+
+@numba.jit(nopython=True, cache=True)
+def __trace_sample_trajectory(counters, orbit, orbit_length, channel_iterations, width, height, re_start, re_end,
+                              im_start, im_end, mirror, weight):
+    for i in range(0, orbit_length):
+        z = orbit[i]
 
         x = int((z.real - re_start) / ((re_end - re_start) / width))
         y = int((z.imag - im_start) / ((im_end - im_start) / height))
+        __count_orbit_point(counters, x, y, orbit_length, channel_iterations, weight)
 
-        if (0 < x < counters.shape[0]) and (0 < y < counters.shape[1]):
-            counters[x, y] += 1
+        # The orbit of the conjugate sample is the conjugate of the orbit
+        if mirror:
+            y = int((-z.imag - im_start) / ((im_end - im_start) / height))
+            __count_orbit_point(counters, x, y, orbit_length, channel_iterations, weight)
 
 
-@numba.jit(nopython=True, parallel=True)
-def buddhabrot(counters, width, height, max_iterations, total_samples, re_start, re_end,
-               im_start, im_end):
+@numba.jit(nopython=True, parallel=True, cache=True)
+def buddhabrot(counters, private_counters, rng_states, width, height, channel_iterations, total_samples, re_start,
+               re_end, im_start, im_end, mirror):
     """
-    Generate a mandelbrot visualization using CUDA.
+    Generate a buddhabrot histogram using multi-threading.
 
     Args:
-        pixels: Reference to the RGB pixel array
+        counters: Reference to the histograms of orbit hits per pixel, one per channel (uint64)
+        private_counters: Reference to zeroed private histograms, one per thread, stacked along the first axis
+                          (uint32). They are merged into the counters and zeroed again before returning.
+        rng_states: Xoroshiro128+ RNG states, one stream per chunk of samples
         width: Width of the image in pixels
         height: Height of the image in pixels
-        max_iterations: Max iterations for orbital escape
+        channel_iterations: Max iterations for orbital escape of each channel
+        total_samples: Total number of samples to trace
         re_start: Minimum value of the real complex plane
         re_end: Maximum value of the real complex plane
         im_start: Minimum value of the imaginary complex plane
         im_end: Maximum value of the imaginary complex plane
-        color_hue: Hue of the color used for the visualization
-        color_saturation: Saturation of the color used for the visualization
-        color_intensity: Intensity of the color used for the visualization
+        mirror: Whether each orbit also counts as the orbit of the conjugate sample, for views symmetric about the
+                real axis
     """
 
-    for _ in prange(0, total_samples):
-        # Get random point (sample) in complex plane
-        sample_real = randuniform(0, 1) * (re_end - re_start) + re_start
-        sample_imag = randuniform(0, 1) * (im_end - im_start) + im_start
+    # Split the samples into one chunk per RNG stream (normally one per thread), so that each chunk owns a scratch
+    # buffer for its orbits. Each private histogram is accumulated by one thread, which traces the chunks of its slot
+    # in turn, so that there are no lost updates from concurrent increments of the same counter.
+    total_chunks = rng_states.shape[0]
+    total_slots = private_counters.shape[0]
 
-        # TODO main cardioid and main bulb optimization
+    # Orbits are traced once up to the largest max iterations, and then counted in the channels they belong to
+    max_iterations = channel_iterations.max()
 
-        # Check whether sample escapes, and if so trace its iteration trajectory
-        iterations = __check_sample_trajectory_escapes(sample_real, sample_imag, max_iterations)
-        if 20 < iterations < max_iterations:
-            __trace_sample_trajectory(counters, sample_real, sample_imag, width, height, re_start, re_end, im_start,
-                                      im_end)
+    for slot in prange(0, total_slots):
+        orbit = np.empty(max_iterations, dtype=np.complex128)
+        uniforms = np.empty(2 * SAMPLE_BATCH_SIZE, dtype=np.float64)
 
+        for chunk in range(slot, total_chunks, total_slots):
+            chunk_start = chunk * total_samples // total_chunks
+            chunk_end = (chunk + 1) * total_samples // total_chunks
 
-###################################################################################################################
+            for batch_start in range(chunk_start, chunk_end, SAMPLE_BATCH_SIZE):
+                batch_size = min(SAMPLE_BATCH_SIZE, chunk_end - batch_start)
+                xoroshiro128p_fill_uniform_float64(rng_states, chunk, uniforms[:2 * batch_size])
 
-@cuda.jit(device=True, inline=True)
-def __check_sample_trajectory_escapes_cuda(sample_real, sample_imag, max_iterations):
-    c = complex(sample_real, sample_imag)
-    z = 0.0j
+                for i in range(0, batch_size):
+                    # Get random point (sample) in complex plane
+                    sample_real = uniforms[2 * i] * (re_end - re_start) + re_start
+                    sample_imag = uniforms[2 * i + 1] * (im_end - im_start) + im_start
 
-    iterations = 0
-    while (abs(z) < 10.0) and iterations < max_iterations:
-        z = z * z + c
-        iterations += 1
+                    # Samples in the main cardioid or the period-2 bulb never escape
+                    if in_main_cardioid_or_bulb(sample_real, sample_imag):
+                        continue
 
-    return iterations
+                    # Compute the sample trajectory once, and if the sample escapes replay it into the counters
+                    iterations = __compute_sample_trajectory(orbit, sample_real, sample_imag, max_iterations)
+                    if 20 < iterations < max_iterations:
+                        __trace_sample_trajectory(private_counters[slot], orbit, iterations, channel_iterations,
+                                                  width, height, re_start, re_end, im_start, im_end, mirror, 1)
 
+    merge_counters(counters, private_counters)
 
-@cuda.jit(device=True, inline=True)
-def __trace_sample_trajectory_cuda(counters, sample_real, sample_imag, width, height, re_start, re_end,
-                                   im_start, im_end):
-    c = complex(sample_real, sample_imag)
-    z = 0.0j
 
-    while abs(z) < 10.0:
-        z = z * z + c
+@numba.jit(nopython=True, cache=True)
+def __orbit_contribution(orbit, orbit_length, width, height, re_start, re_end, im_start, im_end):
+    contribution = 0
+
+    for i in range(0, orbit_length):
+        z = orbit[i]
 
         x = int((z.real - re_start) / ((re_end - re_start) / width))
         y = int((z.imag - im_start) / ((im_end - im_start) / height))
 
-        if (0 < x < counters.shape[0]) and (0 < y < counters.shape[1]):
-            counters[x, y] += 1
+        if (0 < x < width) and (0 < y < height):
+            contribution += 1
+
+    return contribution
+
+
+@numba.jit(nopython=True, cache=True)
+def __evaluate_sample(orbit, sample_real, sample_imag, max_iterations, width, height, re_start, re_end, im_start,
+                      im_end):
+    # Samples in the main cardioid or the period-2 bulb never escape
+    if in_main_cardioid_or_bulb(sample_real, sample_imag):
+        return 0, 0
 
+    iterations = __compute_sample_trajectory(orbit, sample_real, sample_imag, max_iterations)
+    if not 20 < iterations < max_iterations:
+        return 0, 0
 
-@cuda.jit
-def buddhabrot_cuda(counters, rng_states, width, height, max_iterations, samples_per_thread, re_start, re_end,
-                    im_start, im_end):
+    return iterations, __orbit_contribution(orbit, iterations, width, height, re_start, re_end, im_start, im_end)
+
+
+@numba.jit(nopython=True, cache=True)
+def __mutate_sample(rng_states, index, sample_real, sample_imag, min_radius, max_radius):
+    # Occasionally jump anywhere in the sampling domain, so that chains do not get stuck in one region
+    if xoroshiro128p_uniform_float64(rng_states, index) < METROPOLIS_RANDOM_JUMP_PROBABILITY:
+        return (SAMPLING_DOMAIN_START + xoroshiro128p_uniform_float64(rng_states, index) * SAMPLING_DOMAIN_SIZE,
+                SAMPLING_DOMAIN_START + xoroshiro128p_uniform_float64(rng_states, index) * SAMPLING_DOMAIN_SIZE, True)
+
+    # Otherwise move by a radius distributed exponentially between the min and max radius
+    radius = max_radius * math.exp(math.log(min_radius / max_radius) *
+                                   xoroshiro128p_uniform_float64(rng_states, index))
+    angle = 2.0 * math.pi * xoroshiro128p_uniform_float64(rng_states, index)
+
+    return sample_real + radius * math.cos(angle), sample_imag + radius * math.sin(angle), False
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def buddhabrot_metropolis(counters, private_counters, rng_states, statistics, width, height, channel_iterations,
+                          total_samples, warmup_samples, re_start, re_end, im_start, im_end, mirror):
     """
-    Generate a mandelbrot visualization using CUDA.
+    Generate a buddhabrot histogram with Metropolis-Hastings sampling using multi-threading.
+
+    Each RNG stream runs a Markov chain over the sampling domain whose target density is the number of orbit points
+    that land in the view, the contribution of samples. Samples are mutated, and each step of the chain traces its
+    current sample into the histogram, so almost all of the work goes to orbits that are visible even on deep zooms.
+
+    As chains visit samples in proportion to their contribution, each traced orbit is weighted by the inverse of its
+    contribution, and the histogram by the mean contribution of the random jumps of the chains, which are uniform
+    samples of the sampling domain. Each step then counts as one uniform sample of the sampling domain on average.
 
     Args:
-        pixels: Reference to the RGB pixel array
+        counters: Reference to the histograms of orbit hits per pixel, one per channel (float64)
+        private_counters: Reference to zeroed private histograms, one per thread, stacked along the first axis
+                          (float64). They are merged into the counters and zeroed again before returning.
+        rng_states: Xoroshiro128+ RNG states, one stream (chain) per chunk of samples
+        statistics: Reference to the number of proposed and accepted mutations (int64 array of size 2)
         width: Width of the image in pixels
         height: Height of the image in pixels
-        max_iterations: Max iterations for orbital escape
+        channel_iterations: Max iterations for orbital escape of each channel
+        total_samples: Total number of chain steps to trace, excluding warm-up
+        warmup_samples: Number of chain steps to discard at the start of each chain
         re_start: Minimum value of the real complex plane
         re_end: Maximum value of the real complex plane
         im_start: Minimum value of the imaginary complex plane
         im_end: Maximum value of the imaginary complex plane
-        color_hue: Hue of the color used for the visualization
-        color_saturation: Saturation of the color used for the visualization
-        color_intensity: Intensity of the color used for the visualization
+        mirror: Whether each orbit also counts as the orbit of the conjugate sample, for views symmetric about the
+                real axis
+    """
+
+    total_chunks = rng_states.shape[0]
+    total_slots = private_counters.shape[0]
+    # Proposed and accepted mutations, and number and total contribution of random jumps, of each chain
+    chunk_statistics = np.zeros((total_chunks, 4), dtype=np.int64)
+    max_iterations = channel_iterations.max()
+
+    # Mutation radii relative to the size of the view
+    view_size = max(re_end - re_start, im_end - im_start)
+    min_radius = METROPOLIS_MIN_RADIUS * view_size
+    max_radius = METROPOLIS_MAX_RADIUS * view_size
+
+    for slot in prange(0, total_slots):
+        orbit = np.empty(max_iterations, dtype=np.complex128)
+        proposal_orbit = np.empty(max_iterations, dtype=np.complex128)
+
+        for chunk in range(slot, total_chunks, total_slots):
+            chunk_samples = (chunk + 1) * total_samples // total_chunks - chunk * total_samples // total_chunks
+
+            # Start the chain at a random sample of the sampling domain
+            sample_real = (SAMPLING_DOMAIN_START +
+                           xoroshiro128p_uniform_float64(rng_states, chunk) * SAMPLING_DOMAIN_SIZE)
+            sample_imag = (SAMPLING_DOMAIN_START +
+                           xoroshiro128p_uniform_float64(rng_states, chunk) * SAMPLING_DOMAIN_SIZE)
+            orbit_length, contribution = __evaluate_sample(orbit, sample_real, sample_imag, max_iterations, width,
+                                                           height, re_start, re_end, im_start, im_end)
+
+            # Negative steps are the warm-up phase of the chain
+            for step in range(-warmup_samples, chunk_samples):
+                proposal_real, proposal_imag, jumped = __mutate_sample(rng_states, chunk, sample_real, sample_imag,
+                                                                       min_radius, max_radius)
+                proposal_length, proposal_contribution = __evaluate_sample(proposal_orbit, proposal_real,
+                                                                           proposal_imag, max_iterations, width,
+                                                                           height, re_start, re_end, im_start, im_end)
+
+                if jumped:
+                    chunk_statistics[chunk, 2] += 1
+                    chunk_statistics[chunk, 3] += proposal_contribution
+
+                # The proposal distribution is symmetric, so the acceptance ratio is the ratio of contributions
+                if proposal_contribution > 0 and (
+                        contribution == 0 or
+                        xoroshiro128p_uniform_float64(rng_states, chunk) * contribution < proposal_contribution):
+                    orbit, proposal_orbit = proposal_orbit, orbit
+                    sample_real, sample_imag = proposal_real, proposal_imag
+                    orbit_length, contribution = proposal_length, proposal_contribution
+
+                    if step >= 0:
+                        chunk_statistics[chunk, 1] += 1
+
+                if step >= 0:
+                    chunk_statistics[chunk, 0] += 1
+
+                    if contribution > 0:
+                        __trace_sample_trajectory(private_counters[slot], orbit, orbit_length, channel_iterations,
+                                                  width, height, re_start, re_end, im_start, im_end, mirror,
+                                                  1.0 / contribution)
+
+    jumps = 0
+    jump_contribution = 0
+    for chunk in range(0, total_chunks):
+        statistics[0] += chunk_statistics[chunk, 0]
+        statistics[1] += chunk_statistics[chunk, 1]
+        jumps += chunk_statistics[chunk, 2]
+        jump_contribution += chunk_statistics[chunk, 3]
+
+    private_counters *= jump_contribution / jumps if jumps > 0 else 0.0
+    merge_counters(counters, private_counters)
+
+
+@numba.jit(nopython=True, cache=True)
+def __chunk_samples(chunk, total_chunks, total_samples):
+    return (chunk + 1) * total_samples // total_chunks - chunk * total_samples // total_chunks
+
+
+@numba.jit(nopython=True, cache=True)
+def __all_chunks_done(progress, total_samples):
+    for chunk in range(0, progress.shape[0]):
+        if progress[chunk] < __chunk_samples(chunk, progress.shape[0], total_samples):
+            return False
+
+    return True
+
+
+@numba.jit(nopython=True, cache=True)
+def __bin_point(bins, weights, bin_counts, slot, fullest, x, y, width, height, channel_mask, channels, weight):
+    if (0 < x < width) and (0 < y < height):
+        pixel = x * height + y
+        band = pixel // ((width * height + bins.shape[1] - 1) // bins.shape[1])
+        count = bin_counts[slot, band]
+
+        # The channels that the hit counts towards are stored in the low bits of the entry
+        bins[slot, band, count] = (pixel << channels) | channel_mask
+        if weights.shape[0] > 0:
+            weights[slot, band, count] = weight
+
+        bin_counts[slot, band] = count + 1
+        fullest = max(fullest, count + 1)
+
+    return fullest
+
+
+@numba.jit(nopython=True, cache=True)
+def __bin_sample_trajectory(bins, weights, bin_counts, slot, fullest, orbit, orbit_length, channel_iterations, width,
+                            height, re_start, re_end, im_start, im_end, mirror, weight):
     """
+    Append the hits of an orbit to the bins of a slot, see __trace_sample_trajectory.
 
-    thread_index = cuda.grid(1)
+    Returns:
+        Number of entries of the fullest bin of the slot
+    """
 
-    for i in range(0, samples_per_thread):
-        # Get random point (sample) in complex plane
-        sample_real = xoroshiro128p_uniform_float32(rng_states, thread_index) * (re_end - re_start) + re_start
-        sample_imag = xoroshiro128p_uniform_float32(rng_states, thread_index) * (im_end - im_start) + im_start
+    channels = channel_iterations.shape[0]
+    channel_mask = 0
+    for channel in range(0, channels):
+        if orbit_length < channel_iterations[channel]:
+            channel_mask |= 1 << channel
 
-        # TODO main cardioid and main bulb optimization
+    for i in range(0, orbit_length):
+        z = orbit[i]
 
-        # Check whether sample escapes, and if so trace its iteration trajectory
-        iterations = __check_sample_trajectory_escapes_cuda(sample_real, sample_imag, max_iterations)
-        if 20 < iterations < max_iterations:
-            __trace_sample_trajectory_cuda(counters, sample_real, sample_imag, width, height, re_start, re_end,
-                                           im_start, im_end)
+        x = int((z.real - re_start) / ((re_end - re_start) / width))
+        y = int((z.imag - im_start) / ((im_end - im_start) / height))
+        fullest = __bin_point(bins, weights, bin_counts, slot, fullest, x, y, width, height, channel_mask, channels,
+                              weight)
+
+        # The orbit of the conjugate sample is the conjugate of the orbit
+        if mirror:
+            y = int((-z.imag - im_start) / ((im_end - im_start) / height))
+            fullest = __bin_point(bins, weights, bin_counts, slot, fullest, x, y, width, height, channel_mask,
+                                  channels, weight)
+
+    return fullest
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def __add_bins(counters, bins, weights, bin_counts, scale):
+    # Each band of the histogram is only added to by the thread that empties its bins, so there are no lost updates
+    channels = counters.shape[0]
+    flat_counters = counters.reshape((channels, counters.shape[1] * counters.shape[2]))
+
+    for band in prange(0, bins.shape[1]):
+        for slot in range(0, bins.shape[0]):
+            for i in range(0, bin_counts[slot, band]):
+                entry = bins[slot, band, i]
+                pixel = entry >> channels
+
+                for channel in range(0, channels):
+                    if entry & (1 << channel):
+                        if weights.shape[0] > 0:
+                            flat_counters[channel, pixel] += scale * weights[slot, band, i]
+                        else:
+                            flat_counters[channel, pixel] += 1
+
+            bin_counts[slot, band] = 0
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def __trace_into_bins(bins, bin_counts, progress, rng_states, width, height, channel_iterations, total_samples,
+                      re_start, re_end, im_start, im_end, mirror):
+    total_chunks = rng_states.shape[0]
+    total_slots = bins.shape[0]
+    max_iterations = channel_iterations.max()
+    weights = np.empty((0, 0, 0), dtype=np.float64)
+
+    for slot in prange(0, total_slots):
+        orbit = np.empty(max_iterations, dtype=np.complex128)
+        fullest = 0
+        full = False
+
+        for chunk in range(slot, total_chunks, total_slots):
+            chunk_samples = __chunk_samples(chunk, total_chunks, total_samples)
+
+            while progress[chunk] < chunk_samples:
+                state = (rng_states[chunk, 0], rng_states[chunk, 1])
+
+                # Get random point (sample) in complex plane
+                sample_real = xoroshiro128p_uniform_float64(rng_states, chunk) * (re_end - re_start) + re_start
+                sample_imag = xoroshiro128p_uniform_float64(rng_states, chunk) * (im_end - im_start) + im_start
+
+                # Samples in the main cardioid or the period-2 bulb never escape
+                if not in_main_cardioid_or_bulb(sample_real, sample_imag):
+                    iterations = __compute_sample_trajectory(orbit, sample_real, sample_imag, max_iterations)
+                    if 20 < iterations < max_iterations:
+                        # A sample whose hits might not fit is drawn again in the next round
+                        if fullest + (2 if mirror else 1) * iterations > bins.shape[2]:
+                            rng_states[chunk, 0], rng_states[chunk, 1] = state
+                            full = True
+                            break
+
+                        fullest = __bin_sample_trajectory(bins, weights, bin_counts, slot, fullest, orbit, iterations,
+                                                          channel_iterations, width, height, re_start, re_end,
+                                                          im_start, im_end, mirror, 1.0)
+
+                progress[chunk] += 1
+
+            if full:
+                break
+
+
+@numba.jit(nopython=True, cache=True)
+def buddhabrot_binned(counters, bins, bin_counts, rng_states, width, height, channel_iterations, total_samples,
+                      re_start, re_end, im_start, im_end, mirror):
+    """
+    Generate a buddhabrot histogram using multi-threading, for histograms too large for a private copy per thread.
 
+    The histogram is split into bands, one bin per band and per thread. Threads trace samples in rounds, appending the
+    hits of their orbits to their bins, until the bins of some thread are full. Each band then adds the entries of its
+    bins into the histogram, in parallel over the bands. All threads trace samples whatever the size of the histogram,
+    and the histogram is the same as with private histograms.
 
-@numba.jit(nopython=True, parallel=True)
+    Args:
+        counters: Reference to the histograms of orbit hits per pixel, one per channel (uint64)
+        bins: Entries of the bins of each slot (thread) and band, the pixel shifted by the number of channels and
+              the mask of the channels of the hit (int64 array of shape [slots, bands, capacity]). The capacity must
+              fit the hits of the longest orbit.
+        bin_counts: Reference to zeroed numbers of entries of each bin (int64 array of shape [slots, bands])
+        rng_states: Xoroshiro128+ RNG states, one stream per chunk of samples
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        channel_iterations: Max iterations for orbital escape of each channel
+        total_samples: Total number of samples to trace
+        re_start: Minimum value of the real complex plane
+        re_end: Maximum value of the real complex plane
+        im_start: Minimum value of the imaginary complex plane
+        im_end: Maximum value of the imaginary complex plane
+        mirror: Whether each orbit also counts as the orbit of the conjugate sample, for views symmetric about the
+                real axis
+    """
+
+    # Number of samples traced by each chunk so far
+    progress = np.zeros(rng_states.shape[0], dtype=np.int64)
+    weights = np.empty((0, 0, 0), dtype=np.float64)
+
+    while True:
+        __trace_into_bins(bins, bin_counts, progress, rng_states, width, height, channel_iterations, total_samples,
+                          re_start, re_end, im_start, im_end, mirror)
+        __add_bins(counters, bins, weights, bin_counts, 1.0)
+
+        if __all_chunks_done(progress, total_samples):
+            break
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def __trace_chains_into_bins(bins, weights, bin_counts, chains, chain_steps, chunk_statistics, rng_states, width,
+                             height, channel_iterations, total_samples, re_start, re_end, im_start, im_end, mirror):
+    total_chunks = rng_states.shape[0]
+    total_slots = bins.shape[0]
+    max_iterations = channel_iterations.max()
+
+    # Mutation radii relative to the size of the view
+    view_size = max(re_end - re_start, im_end - im_start)
+    min_radius = METROPOLIS_MIN_RADIUS * view_size
+    max_radius = METROPOLIS_MAX_RADIUS * view_size
+
+    for slot in prange(0, total_slots):
+        orbit = np.empty(max_iterations, dtype=np.complex128)
+        proposal_orbit = np.empty(max_iterations, dtype=np.complex128)
+        fullest = 0
+        full = False
+
+        for chunk in range(slot, total_chunks, total_slots):
+            chunk_samples = __chunk_samples(chunk, total_chunks, total_samples)
+            if chain_steps[chunk] >= chunk_samples:
+                continue
+
+            # The orbit of the current sample of the chain is computed again in each round
+            sample_real, sample_imag = chains[chunk, 0], chains[chunk, 1]
+            orbit_length, contribution = __evaluate_sample(orbit, sample_real, sample_imag, max_iterations, width,
+                                                           height, re_start, re_end, im_start, im_end)
+
+            while chain_steps[chunk] < chunk_samples:
+                step = chain_steps[chunk]
+                state = (rng_states[chunk, 0], rng_states[chunk, 1])
+
+                proposal_real, proposal_imag, jumped = __mutate_sample(rng_states, chunk, sample_real, sample_imag,
+                                                                       min_radius, max_radius)
+                proposal_length, proposal_contribution = __evaluate_sample(proposal_orbit, proposal_real,
+                                                                           proposal_imag, max_iterations, width,
+                                                                           height, re_start, re_end, im_start, im_end)
+
+                # The proposal distribution is symmetric, so the acceptance ratio is the ratio of contributions
+                accepted = proposal_contribution > 0 and (
+                        contribution == 0 or
+                        xoroshiro128p_uniform_float64(rng_states, chunk) * contribution < proposal_contribution)
+
+                # A step whose hits might not fit is taken again in the next round
+                traced_length = proposal_length if accepted else orbit_length
+                if step >= 0 and (accepted or contribution > 0) and \
+                        fullest + (2 if mirror else 1) * traced_length > bins.shape[2]:
+                    rng_states[chunk, 0], rng_states[chunk, 1] = state
+                    full = True
+                    break
+
+                if jumped:
+                    chunk_statistics[chunk, 2] += 1
+                    chunk_statistics[chunk, 3] += proposal_contribution
+
+                if accepted:
+                    orbit, proposal_orbit = proposal_orbit, orbit
+                    sample_real, sample_imag = proposal_real, proposal_imag
+                    orbit_length, contribution = proposal_length, proposal_contribution
+
+                    if step >= 0:
+                        chunk_statistics[chunk, 1] += 1
+
+                if step >= 0:
+                    chunk_statistics[chunk, 0] += 1
+
+                    if contribution > 0:
+                        fullest = __bin_sample_trajectory(bins, weights, bin_counts, slot, fullest, orbit,
+                                                          orbit_length, channel_iterations, width, height, re_start,
+                                                          re_end, im_start, im_end, mirror, 1.0 / contribution)
+
+                chain_steps[chunk] = step + 1
+
+            chains[chunk, 0], chains[chunk, 1] = sample_real, sample_imag
+
+            if full:
+                break
+
+
+@numba.jit(nopython=True, cache=True)
+def buddhabrot_metropolis_binned(counters, bins, weights, bin_counts, rng_states, statistics, width, height,
+                                 channel_iterations, total_samples, warmup_samples, re_start, re_end, im_start, im_end,
+                                 mirror):
+    """
+    Generate a buddhabrot histogram with Metropolis-Hastings sampling using multi-threading, for histograms too large
+    for a private copy per thread. Chains are traced into bins in rounds, see buddhabrot_binned, and the weighted hits
+    of each round are scaled by the mean contribution of the random jumps of the round, see buddhabrot_metropolis.
+
+    Args:
+        counters: Reference to the histograms of orbit hits per pixel, one per channel (float64)
+        bins: Entries of the bins of each slot (thread) and band, see buddhabrot_binned
+        weights: Weights of the entries of the bins (float64 array of the shape of bins)
+        bin_counts: Reference to zeroed numbers of entries of each bin (int64 array of shape [slots, bands])
+        rng_states: Xoroshiro128+ RNG states, one stream (chain) per chunk of samples
+        statistics: Reference to the number of proposed and accepted mutations (int64 array of size 2)
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        channel_iterations: Max iterations for orbital escape of each channel
+        total_samples: Total number of chain steps to trace, excluding warm-up
+        warmup_samples: Number of chain steps to discard at the start of each chain
+        re_start: Minimum value of the real complex plane
+        re_end: Maximum value of the real complex plane
+        im_start: Minimum value of the imaginary complex plane
+        im_end: Maximum value of the imaginary complex plane
+        mirror: Whether each orbit also counts as the orbit of the conjugate sample, for views symmetric about the
+                real axis
+    """
+
+    total_chunks = rng_states.shape[0]
+
+    # Current sample and next step of each chain. Negative steps are the warm-up phase of the chain.
+    chains = np.empty((total_chunks, 2), dtype=np.float64)
+    chain_steps = np.full(total_chunks, -warmup_samples, dtype=np.int64)
+    chunk_statistics = np.zeros((total_chunks, 4), dtype=np.int64)
+
+    # Start each chain at a random sample of the sampling domain
+    for chunk in range(0, total_chunks):
+        for part in range(0, 2):
+            chains[chunk, part] = (SAMPLING_DOMAIN_START +
+                                   xoroshiro128p_uniform_float64(rng_states, chunk) * SAMPLING_DOMAIN_SIZE)
+
+    while True:
+        __trace_chains_into_bins(bins, weights, bin_counts, chains, chain_steps, chunk_statistics, rng_states, width,
+                                 height, channel_iterations, total_samples, re_start, re_end, im_start, im_end,
+                                 mirror)
+
+        # The random jumps of all rounds so far estimate the mean contribution
+        jumps = 0
+        jump_contribution = 0
+        for chunk in range(0, total_chunks):
+            jumps += chunk_statistics[chunk, 2]
+            jump_contribution += chunk_statistics[chunk, 3]
+
+        __add_bins(counters, bins, weights, bin_counts, jump_contribution / jumps if jumps > 0 else 0.0)
+
+        if __all_chunks_done(chain_steps, total_samples):
+            break
+
+    for chunk in range(0, total_chunks):
+        statistics[0] += chunk_statistics[chunk, 0]
+        statistics[1] += chunk_statistics[chunk, 1]
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def merge_counters(counters, partial_counters):
+    """
+    Add partial histograms into a histogram, in parallel over the counters. The partial histograms are zeroed, so
+    that they can be reused.
+
+    Args:
+        counters: Reference to the histogram to accumulate into
+        partial_counters: Reference to the partial histograms, stacked along the first axis
+    """
+
+    flat_counters = counters.reshape(counters.size)
+    flat_partial_counters = partial_counters.reshape((partial_counters.shape[0], counters.size))
+
+    for i in prange(0, counters.size):
+        total = flat_counters[i]
+        for j in range(0, flat_partial_counters.shape[0]):
+            total += flat_partial_counters[j, i]
+            flat_partial_counters[j, i] = 0
+        flat_counters[i] = total
+
+
+###################################################################################################################
+
+@numba.jit(nopython=True, parallel=True, cache=True)
 def draw_buddhabrot(pixels, counters, width, height, color_hue, color_saturation, color_intensity):
+    """
+    Draw HSV pixels from a histogram of orbit hits, normalized by its max.
+
+    Args:
+        pixels: Reference to the HSV pixel array
+        counters: Histogram of orbit hits per pixel
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        color_hue: Hue of the color used for the visualization
+        color_saturation: Saturation of the color used for the visualization
+        color_intensity: Intensity of the color used for the visualization
+    """
+
     max_counter = np.amax(counters)
 
     for x in prange(0, width):
@@ -145,3 +631,24 @@ def draw_buddhabrot(pixels, counters, width, height, color_hue, color_saturation
             pixels[x, y, 0] = 255 * (color_hue / 360)
             pixels[x, y, 1] = 255 * color_saturation
             pixels[x, y, 2] = 255 * min(color_intensity * counters[x, y] / max_counter, 1)
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def draw_nebulabrot(pixels, counters, width, height, color_intensity):
+    """
+    Draw RGB pixels from the red, green and blue histograms of a nebulabrot, each normalized by its own max.
+
+    Args:
+        pixels: Reference to the RGB pixel array
+        counters: Histograms of orbit hits per pixel of the red, green and blue channels
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        color_intensity: Intensity of the colors used for the visualization
+    """
+
+    for channel in range(0, 3):
+        max_counter = np.amax(counters[channel])
+
+        for x in prange(0, width):
+            for y in range(0, height):
+                pixels[x, y, channel] = 255 * min(color_intensity * counters[channel, x, y] / max_counter, 1)
@@ -0,0 +1,39 @@
+"""
+Contains the colorization kernel, which maps smooth iteration counts to pixels
+"""
+
+import numba
+from numba import prange
+
+from fractals.kernels.common import INTERIOR
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def colorize(pixels, field, lut, max_iterations, color_intensity):
+    """
+    Map smooth iteration counts to pixels through a lookup table using multi-threading. Points inside the set are
+    black.
+
+    Args:
+        pixels: Reference to the pixel array of shape [height, width, 3]
+        field: Array of smooth iteration counts of shape [height, width], INTERIOR for points inside the set
+        lut: Lookup table of colors, from the color of escaped points with no intensity to that of full intensity
+        max_iterations: Max iterations for orbital escape of the field
+        color_intensity: Intensity of the color used for the visualization
+    """
+
+    last_color = lut.shape[0] - 1
+
+    for y in prange(0, field.shape[0]):
+        for x in range(0, field.shape[1]):
+            if field[y, x] == INTERIOR:
+                pixels[y, x, 0] = 0
+                pixels[y, x, 1] = 0
+                pixels[y, x, 2] = 0
+            else:
+                intensity = min(max(color_intensity * field[y, x] / max_iterations, 0.0), 1.0)
+                color = int(last_color * intensity)
+
+                pixels[y, x, 0] = lut[color, 0]
+                pixels[y, x, 1] = lut[color, 1]
+                pixels[y, x, 2] = lut[color, 2]
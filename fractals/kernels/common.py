@@ -0,0 +1,44 @@
+"""
+Contains constants and functions shared by the fractal kernels
+"""
+
+import numba
+
+# Escape-time fractals, for kernels shared between them
+MANDELBROT = 0
+JULIA = 1
+BURNING_SHIP = 2
+
+# Smooth iteration count of points inside the set, which never escape
+INTERIOR = -1.0
+
+# Status of the pixels of an incremental field: orbits still bounded after the max iterations, orbits that escaped, and
+# orbits that never escape, in the main cardioid or the period-2 bulb or found periodic
+BOUNDED = 0
+ESCAPED = 1
+PERIODIC = 2
+
+
+@numba.jit(nopython=True, cache=True)
+def in_main_cardioid_or_bulb(c_real, c_imag):
+    """
+    Check whether a point lies in the main cardioid or the period-2 bulb of the mandelbrot set. Points inside either
+    region never escape, so they can be rejected without iterating.
+
+    Args:
+        c_real: Real part of the point
+        c_imag: Imaginary part of the point
+
+    Returns:
+        True if the point is inside the main cardioid or the period-2 bulb, False otherwise
+    """
+
+    c_imag_squared = c_imag * c_imag
+
+    # Main cardioid
+    q = (c_real - 0.25) * (c_real - 0.25) + c_imag_squared
+    if q * (q + (c_real - 0.25)) <= 0.25 * c_imag_squared:
+        return True
+
+    # Period-2 bulb
+    return (c_real + 1.0) * (c_real + 1.0) + c_imag_squared <= 0.0625
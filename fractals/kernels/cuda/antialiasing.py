@@ -0,0 +1,44 @@
+"""
+Contains the CUDA kernel of the anti-aliasing of escape-time fractals, see fractals.kernels.antialiasing
+"""
+
+import math
+
+from numba import cuda
+
+from fractals.kernels.common import JULIA, BURNING_SHIP, INTERIOR
+from fractals.kernels.cuda.burningship import burning_ship_escape_cuda
+from fractals.kernels.cuda.julia import julia_escape_cuda
+from fractals.kernels.cuda.mandelbrot import mandelbrot_escape_cuda
+
+
+@cuda.jit(cache=True)
+def escape_time_points_cuda(values, fractal, points, max_iterations, periodicity_tolerance, cx, cy):
+    """
+    Compute the smooth iteration counts of points of the complex plane using CUDA, one thread per point.
+
+    Args:
+        values: Reference to the array of smooth iteration counts of the points, INTERIOR for points inside the set
+        fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+        points: Points of the complex plane (complex128)
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        cx: Real part of the julia set constant
+        cy: Imaginary part of the julia set constant
+    """
+
+    i = cuda.grid(1)
+
+    if i < points.shape[0]:
+        if fractal == JULIA:
+            iterations, z = julia_escape_cuda(points[i], complex(cx, cy), max_iterations, periodicity_tolerance)
+        elif fractal == BURNING_SHIP:
+            iterations, z = burning_ship_escape_cuda(points[i], max_iterations, periodicity_tolerance)
+        else:
+            iterations, z = mandelbrot_escape_cuda(points[i], max_iterations, periodicity_tolerance)
+
+        if iterations >= max_iterations:
+            values[i] = INTERIOR
+        else:
+            # Smooth iteration count
+            values[i] = iterations - math.log2(math.log2(z.real * z.real + z.imag * z.imag)) + 4.0
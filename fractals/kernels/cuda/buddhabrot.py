@@ -0,0 +1,238 @@
+import math
+
+from numba import cuda
+from numba.cuda.random import xoroshiro128p_uniform_float32, xoroshiro128p_uniform_float64
+
+from fractals.kernels.buddhabrot import SAMPLING_DOMAIN_START, SAMPLING_DOMAIN_SIZE, \
+    METROPOLIS_RANDOM_JUMP_PROBABILITY, METROPOLIS_MIN_RADIUS, METROPOLIS_MAX_RADIUS
+from fractals.kernels.cuda.common import in_main_cardioid_or_bulb_cuda
+
+
+@cuda.jit(device=True, inline=True)
+def __max_channel_iterations_cuda(channel_iterations):
+    max_iterations = channel_iterations[0]
+    for channel in range(1, channel_iterations.shape[0]):
+        max_iterations = max(max_iterations, channel_iterations[channel])
+
+    return max_iterations
+
+
+@cuda.jit(device=True, inline=True)
+def __check_sample_trajectory_escapes_cuda(sample_real, sample_imag, max_iterations):
+    c = complex(sample_real, sample_imag)
+    z = 0.0j
+
+    iterations = 0
+    while (abs(z) < 10.0) and iterations < max_iterations:
+        z = z * z + c
+        iterations += 1
+
+    return iterations
+
+
+@cuda.jit(device=True, inline=True)
+def __count_orbit_point_cuda(counters, x, y, iterations, channel_iterations, weight):
+    if (0 < x < counters.shape[1]) and (0 < y < counters.shape[2]):
+        # The orbit counts towards every channel whose max iterations it escapes within. Global memory atomics are
+        # used, since an image-sized histogram does not fit in shared memory.
+        for channel in range(0, counters.shape[0]):
+            if iterations < channel_iterations[channel]:
+                cuda.atomic.add(counters, (channel, x, y), weight)
+
+
+@cuda.jit(device=True, inline=True)
+def __trace_sample_trajectory_cuda(counters, sample_real, sample_imag, iterations, channel_iterations, width, height,
+                                   re_start, re_end, im_start, im_end, mirror, weight):
+    c = complex(sample_real, sample_imag)
+    z = 0.0j
+
+    # Replay exactly as many iterations as the escape check took. Per-thread orbit buffers are not used on the GPU,
+    # as local memory must be sized at compile time and global buffers would need max_iterations per thread.
+    for _ in range(0, iterations):
+        z = z * z + c
+
+        x = int((z.real - re_start) / ((re_end - re_start) / width))
+        y = int((z.imag - im_start) / ((im_end - im_start) / height))
+        __count_orbit_point_cuda(counters, x, y, iterations, channel_iterations, weight)
+
+        # The orbit of the conjugate sample is the conjugate of the orbit
+        if mirror:
+            y = int((-z.imag - im_start) / ((im_end - im_start) / height))
+            __count_orbit_point_cuda(counters, x, y, iterations, channel_iterations, weight)
+
+
+@cuda.jit(cache=True)
+def buddhabrot_cuda(counters, rng_states, width, height, channel_iterations, samples_per_thread, re_start, re_end,
+                    im_start, im_end, mirror):
+    """
+    Generate a buddhabrot histogram using CUDA.
+
+    Args:
+        counters: Reference to the histograms of orbit hits per pixel, one per channel (uint64)
+        rng_states: Xoroshiro128+ RNG states, one per thread
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        channel_iterations: Max iterations for orbital escape of each channel
+        samples_per_thread: Number of samples to trace per thread
+        re_start: Minimum value of the real complex plane
+        re_end: Maximum value of the real complex plane
+        im_start: Minimum value of the imaginary complex plane
+        im_end: Maximum value of the imaginary complex plane
+        mirror: Whether each orbit also counts as the orbit of the conjugate sample, for views symmetric about the
+                real axis
+    """
+
+    thread_index = cuda.grid(1)
+    max_iterations = __max_channel_iterations_cuda(channel_iterations)
+
+    for i in range(0, samples_per_thread):
+        # Get random point (sample) in complex plane
+        sample_real = xoroshiro128p_uniform_float32(rng_states, thread_index) * (re_end - re_start) + re_start
+        sample_imag = xoroshiro128p_uniform_float32(rng_states, thread_index) * (im_end - im_start) + im_start
+
+        # Samples in the main cardioid or the period-2 bulb never escape
+        if in_main_cardioid_or_bulb_cuda(sample_real, sample_imag):
+            continue
+
+        # Check whether sample escapes, and if so trace its iteration trajectory
+        iterations = __check_sample_trajectory_escapes_cuda(sample_real, sample_imag, max_iterations)
+        if 20 < iterations < max_iterations:
+            __trace_sample_trajectory_cuda(counters, sample_real, sample_imag, iterations, channel_iterations, width,
+                                           height, re_start, re_end, im_start, im_end, mirror, 1)
+
+
+@cuda.jit(device=True, inline=True)
+def __evaluate_sample_cuda(sample_real, sample_imag, max_iterations, width, height, re_start, re_end, im_start,
+                           im_end):
+    # Samples in the main cardioid or the period-2 bulb never escape
+    if in_main_cardioid_or_bulb_cuda(sample_real, sample_imag):
+        return 0, 0
+
+    iterations = __check_sample_trajectory_escapes_cuda(sample_real, sample_imag, max_iterations)
+    if not 20 < iterations < max_iterations:
+        return 0, 0
+
+    c = complex(sample_real, sample_imag)
+    z = 0.0j
+
+    contribution = 0
+    for _ in range(0, iterations):
+        z = z * z + c
+
+        x = int((z.real - re_start) / ((re_end - re_start) / width))
+        y = int((z.imag - im_start) / ((im_end - im_start) / height))
+
+        if (0 < x < width) and (0 < y < height):
+            contribution += 1
+
+    return iterations, contribution
+
+
+@cuda.jit(cache=True)
+def buddhabrot_metropolis_cuda(counters, rng_states, statistics, width, height, channel_iterations,
+                               samples_per_thread, warmup_samples, re_start, re_end, im_start, im_end, mirror):
+    """
+    Generate a buddhabrot histogram with Metropolis-Hastings sampling using CUDA. Each thread runs its own Markov chain,
+    see fractals.kernels.buddhabrot.buddhabrot_metropolis. Orbits are weighted by the inverse of their contribution,
+    and the histogram still has to be weighted by the mean contribution of the random jumps, see merge_counters_cuda.
+
+    Args:
+        counters: Reference to the weighted histograms of orbit hits per pixel, one per channel (float64)
+        rng_states: Xoroshiro128+ RNG states, one per thread
+        statistics: Reference to the number of proposed and accepted mutations, and the number and total contribution
+                    of random jumps (int64 array of size 4)
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        channel_iterations: Max iterations for orbital escape of each channel
+        samples_per_thread: Number of chain steps to trace per thread, excluding warm-up
+        warmup_samples: Number of chain steps to discard at the start of each chain
+        re_start: Minimum value of the real complex plane
+        re_end: Maximum value of the real complex plane
+        im_start: Minimum value of the imaginary complex plane
+        im_end: Maximum value of the imaginary complex plane
+        mirror: Whether each orbit also counts as the orbit of the conjugate sample, for views symmetric about the
+                real axis
+    """
+
+    thread_index = cuda.grid(1)
+    max_iterations = __max_channel_iterations_cuda(channel_iterations)
+
+    # Mutation radii relative to the size of the view
+    view_size = max(re_end - re_start, im_end - im_start)
+    min_radius = METROPOLIS_MIN_RADIUS * view_size
+    max_radius = METROPOLIS_MAX_RADIUS * view_size
+
+    sample_real = SAMPLING_DOMAIN_START + xoroshiro128p_uniform_float64(rng_states, thread_index) * SAMPLING_DOMAIN_SIZE
+    sample_imag = SAMPLING_DOMAIN_START + xoroshiro128p_uniform_float64(rng_states, thread_index) * SAMPLING_DOMAIN_SIZE
+    iterations, contribution = __evaluate_sample_cuda(sample_real, sample_imag, max_iterations, width, height,
+                                                      re_start, re_end, im_start, im_end)
+
+    proposed = 0
+    accepted = 0
+    jumps = 0
+    jump_contribution = 0
+
+    # Negative steps are the warm-up phase of the chain
+    for step in range(-warmup_samples, samples_per_thread):
+        # Occasionally jump anywhere in the sampling domain, otherwise move by an exponentially distributed radius
+        jumped = xoroshiro128p_uniform_float64(rng_states, thread_index) < METROPOLIS_RANDOM_JUMP_PROBABILITY
+        if jumped:
+            proposal_real = (SAMPLING_DOMAIN_START +
+                             xoroshiro128p_uniform_float64(rng_states, thread_index) * SAMPLING_DOMAIN_SIZE)
+            proposal_imag = (SAMPLING_DOMAIN_START +
+                             xoroshiro128p_uniform_float64(rng_states, thread_index) * SAMPLING_DOMAIN_SIZE)
+        else:
+            radius = max_radius * math.exp(math.log(min_radius / max_radius) *
+                                           xoroshiro128p_uniform_float64(rng_states, thread_index))
+            angle = 2.0 * math.pi * xoroshiro128p_uniform_float64(rng_states, thread_index)
+            proposal_real = sample_real + radius * math.cos(angle)
+            proposal_imag = sample_imag + radius * math.sin(angle)
+
+        proposal_iterations, proposal_contribution = __evaluate_sample_cuda(proposal_real, proposal_imag,
+                                                                            max_iterations, width, height, re_start,
+                                                                            re_end, im_start, im_end)
+
+        if jumped:
+            jumps += 1
+            jump_contribution += proposal_contribution
+
+        # The proposal distribution is symmetric, so the acceptance ratio is the ratio of contributions
+        if proposal_contribution > 0 and (
+                contribution == 0 or
+                xoroshiro128p_uniform_float64(rng_states, thread_index) * contribution < proposal_contribution):
+            sample_real = proposal_real
+            sample_imag = proposal_imag
+            iterations = proposal_iterations
+            contribution = proposal_contribution
+
+            if step >= 0:
+                accepted += 1
+
+        if step >= 0:
+            proposed += 1
+
+            if contribution > 0:
+                __trace_sample_trajectory_cuda(counters, sample_real, sample_imag, iterations, channel_iterations,
+                                               width, height, re_start, re_end, im_start, im_end, mirror,
+                                               1.0 / contribution)
+
+    cuda.atomic.add(statistics, 0, proposed)
+    cuda.atomic.add(statistics, 1, accepted)
+    cuda.atomic.add(statistics, 2, jumps)
+    cuda.atomic.add(statistics, 3, jump_contribution)
+
+
+@cuda.jit(cache=True)
+def merge_counters_cuda(counters, partial_counters, scale):
+    """
+    Add a partial histogram multiplied by a scale into a histogram, and zero it, so that it can be reused.
+
+    Args:
+        counters: Reference to the histogram to accumulate into, flattened
+        partial_counters: Reference to the partial histogram, flattened
+        scale: Scale of the partial histogram
+    """
+
+    for i in range(cuda.grid(1), counters.shape[0], cuda.gridsize(1)):
+        counters[i] += scale * partial_counters[i]
+        partial_counters[i] = 0
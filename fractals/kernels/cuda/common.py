@@ -0,0 +1,30 @@
+"""
+Contains device functions shared by the CUDA fractal kernels
+"""
+
+from numba import cuda
+
+
+@cuda.jit(device=True, inline=True)
+def in_main_cardioid_or_bulb_cuda(c_real, c_imag):
+    """
+    Check whether a point lies in the main cardioid or the period-2 bulb of the mandelbrot set. Points inside either
+    region never escape, so they can be rejected without iterating.
+
+    Args:
+        c_real: Real part of the point
+        c_imag: Imaginary part of the point
+
+    Returns:
+        True if the point is inside the main cardioid or the period-2 bulb, False otherwise
+    """
+
+    c_imag_squared = c_imag * c_imag
+
+    # Main cardioid
+    q = (c_real - 0.25) * (c_real - 0.25) + c_imag_squared
+    if q * (q + (c_real - 0.25)) <= 0.25 * c_imag_squared:
+        return True
+
+    # Period-2 bulb
+    return (c_real + 1.0) * (c_real + 1.0) + c_imag_squared <= 0.0625
@@ -0,0 +1,83 @@
+import math
+
+from numba import cuda
+
+from fractals.kernels.common import INTERIOR
+
+
+@cuda.jit(device=True, inline=True)
+def julia_escape_cuda(z, c, max_iterations, periodicity_tolerance):
+    """
+    Iterate z = z^2 + c from the given point until the orbit escapes.
+
+    Args:
+        z: Starting point of the orbit
+        c: Julia set constant
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+
+    Returns:
+        Number of iterations until escape (max_iterations if the orbit does not escape) and the last value of z
+    """
+
+    iterations = 0
+
+    # Brent-style periodicity checking: compare z against a checkpoint that is refreshed after windows of doubling
+    # length. An orbit that returns to its checkpoint is periodic and never escapes.
+    check_periodicity = periodicity_tolerance > 0.0
+    tolerance_squared = periodicity_tolerance * periodicity_tolerance
+    z_checkpoint = z
+    checkpoint_window = 8
+    checkpoint_steps = 0
+
+    while (abs(z) < 4.0) and iterations < max_iterations:
+        z = z * z + c
+        iterations += 1
+
+        if check_periodicity:
+            dz = z - z_checkpoint
+            if dz.real * dz.real + dz.imag * dz.imag < tolerance_squared:
+                return max_iterations, z
+
+            checkpoint_steps += 1
+            if checkpoint_steps == checkpoint_window:
+                z_checkpoint = z
+                checkpoint_steps = 0
+                checkpoint_window *= 2
+
+    return iterations, z
+
+
+@cuda.jit(cache=True)
+def julia_cuda(field, x_offset, y_offset, width, height, max_iterations, periodicity_tolerance, re_start, re_end,
+               im_start, im_end, cx, cy):
+    """
+    Compute the smooth iteration counts of a julia set using CUDA.
+
+    Args:
+        field: Reference to the array of smooth iteration counts of shape [height, width], INTERIOR for points
+               inside the set
+        x_offset: Horizontal position of the field in the image, in pixels
+        y_offset: Vertical position of the field in the image, in pixels
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        cx: CX value
+        cy: CY value
+    """
+
+    x, y = cuda.grid(2)
+
+    if y < field.shape[0] and x < field.shape[1]:
+        c = complex(cx, cy)
+        z = complex((x_offset + x) / width * (re_end - re_start) + re_start,
+                    (y_offset + y) / height * (im_end - im_start) + im_start)
+
+        iterations, z = julia_escape_cuda(z, c, max_iterations, periodicity_tolerance)
+
+        if iterations >= max_iterations:
+            field[y, x] = INTERIOR
+        else:
+            # Smooth iteration count
+            field[y, x] = iterations - math.log2(math.log2(z.real * z.real + z.imag * z.imag)) + 4.0
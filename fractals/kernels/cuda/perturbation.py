@@ -0,0 +1,111 @@
+"""
+Contains the CUDA perturbation kernels of deep zooms, see fractals.kernels.perturbation
+"""
+
+import math
+
+from numba import cuda
+
+from fractals.kernels.common import BURNING_SHIP, INTERIOR
+
+
+@cuda.jit(device=True, inline=True)
+def __diff_abs_cuda(a, b):
+    """
+    Compute |a + b| - |a| without cancellation when b is small compared to a.
+    """
+
+    if a >= 0.0:
+        return b if a + b >= 0.0 else -(2.0 * a + b)
+
+    return 2.0 * a + b if a + b > 0.0 else -b
+
+
+@cuda.jit(device=True, inline=True)
+def __perturb_cuda(fractal, reference_z, dz, dc):
+    """
+    Advance the offset dz of an orbit from the reference orbit by one iteration.
+    """
+
+    if fractal == BURNING_SHIP:
+        # Re(z^2) does not depend on the signs of Re(z) and Im(z), while Im(z) = 2|Re(z)||Im(z)|
+        x = reference_z.real
+        y = reference_z.imag
+        dx = dz.real
+        dy = dz.imag
+
+        return complex((2.0 * x + dx) * dx - (2.0 * y + dy) * dy + dc.real,
+                       2.0 * __diff_abs_cuda(x * y, x * dy + dx * y + dx * dy) + dc.imag)
+
+    return (2.0 * reference_z + dz) * dz + dc
+
+
+@cuda.jit(device=True, inline=True)
+def perturbation_escape_cuda(fractal, reference_orbit, dc, max_iterations):
+    """
+    Iterate an orbit as an offset from a reference orbit until it escapes, rebasing it on glitches.
+    See fractals.kernels.perturbation.perturbation_escape.
+
+    Args:
+        fractal: Fractal to generate (MANDELBROT or BURNING_SHIP)
+        reference_orbit: Reference orbit from z = 0, up to its escape or max_iterations
+        dc: Offset of the point from the reference point
+        max_iterations: Max iterations for orbital escape
+
+    Returns:
+        Number of iterations until escape (max_iterations if the orbit does not escape) and the last value of z
+    """
+
+    reference_length = reference_orbit.shape[0]
+    reference_iteration = 0
+    dz = 0.0j
+    z = reference_orbit[0]
+
+    iterations = 0
+
+    while (abs(z) < 4.0) and iterations < max_iterations:
+        dz = __perturb_cuda(fractal, reference_orbit[reference_iteration], dz, dc)
+        reference_iteration += 1
+        iterations += 1
+
+        z = reference_orbit[reference_iteration] + dz
+
+        if (z.real * z.real + z.imag * z.imag < dz.real * dz.real + dz.imag * dz.imag or
+                reference_iteration == reference_length - 1):
+            dz = z
+            reference_iteration = 0
+
+    return iterations, z
+
+
+@cuda.jit(cache=True)
+def perturbation_cuda(field, fractal, reference_orbit, x_offset, y_offset, width, height, max_iterations,
+                      pixel_spacing):
+    """
+    Compute the smooth iteration counts of a deep zoom with perturbation using CUDA.
+
+    Args:
+        field: Reference to the array of smooth iteration counts of shape [height, width], INTERIOR for points
+               inside the set
+        fractal: Fractal to generate (MANDELBROT or BURNING_SHIP)
+        reference_orbit: Reference orbit of the point at the center of the image
+        x_offset: Horizontal position of the field in the image, in pixels
+        y_offset: Vertical position of the field in the image, in pixels
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        max_iterations: Max iterations for orbital escape
+        pixel_spacing: Distance between two pixels in the complex plane
+    """
+
+    x, y = cuda.grid(2)
+
+    if y < field.shape[0] and x < field.shape[1]:
+        dc = complex((x_offset + x - width / 2) * pixel_spacing, (y_offset + y - height / 2) * pixel_spacing)
+
+        iterations, z = perturbation_escape_cuda(fractal, reference_orbit, dc, max_iterations)
+
+        if iterations >= max_iterations:
+            field[y, x] = INTERIOR
+        else:
+            # Smooth iteration count
+            field[y, x] = iterations - math.log2(math.log2(z.real * z.real + z.imag * z.imag)) + 4.0
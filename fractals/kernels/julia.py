@@ -1,87 +1,83 @@
 import math
 
 import numba
-from numba import cuda, prange
+from numba import prange
 
+from fractals.kernels.common import INTERIOR
 
-@numba.jit(nopython=True, parallel=True)
-def julia(pixels, width, height, max_iterations, re_start, re_end, im_start, im_end, cx, cy, color_hue,
-          color_saturation, color_intensity):
+
+@numba.jit(nopython=True, cache=True)
+def julia_escape(z, c, max_iterations, periodicity_tolerance):
     """
-    Generate a julia visualization using multi-threading.
+    Iterate z = z^2 + c from the given point until the orbit escapes.
 
     Args:
-        pixels: Reference to the RGB pixel array
-        width: Width of the image in pixels
-        height: Height of the image in pixels
+        z: Starting point of the orbit
+        c: Julia set constant
         max_iterations: Max iterations for orbital escape
-        cx: CX value
-        cy: CY value
-        color_hue: Hue of the color used for the visualization
-        color_saturation: Saturation of the color used for the visualization
-        color_intensity: Intensity of the color used for the visualization
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+
+    Returns:
+        Number of iterations until escape (max_iterations if the orbit does not escape) and the last value of z
     """
 
-    for x in prange(0, width):
-        for y in prange(0, height):
-            c = complex(cx, cy)
-            z = complex(x / width * (re_end - re_start) + re_start, y / height * (im_end - im_start) + im_start)
+    iterations = 0
 
-            iterations = 0
-            while (abs(z) < 4.0) and iterations < max_iterations:
-                z = z * z + c
-                iterations += 1
+    # Brent-style periodicity checking: compare z against a checkpoint that is refreshed after windows of doubling
+    # length. An orbit that returns to its checkpoint is periodic and never escapes.
+    check_periodicity = periodicity_tolerance > 0.0
+    tolerance_squared = periodicity_tolerance * periodicity_tolerance
+    z_checkpoint = z
+    checkpoint_window = 8
+    checkpoint_steps = 0
 
-            # Color smoothing
-            smooth_iterations = iterations - math.log(math.log(z.real * z.real + z.imag * z.imag)) + 4.0
+    while (abs(z) < 4.0) and iterations < max_iterations:
+        z = z * z + c
+        iterations += 1
 
-            if iterations >= max_iterations:
-                pixels[x, y, 0] = 0
-                pixels[x, y, 1] = 0
-                pixels[x, y, 2] = 0
-            else:
-                pixels[x, y, 0] = 255 * (color_hue / 360)
-                pixels[x, y, 1] = 255 * color_saturation
-                pixels[x, y, 2] = 255 * min(color_intensity * smooth_iterations / max_iterations, 1)
+        if check_periodicity:
+            dz = z - z_checkpoint
+            if dz.real * dz.real + dz.imag * dz.imag < tolerance_squared:
+                return max_iterations, z
+
+            checkpoint_steps += 1
+            if checkpoint_steps == checkpoint_window:
+                z_checkpoint = z
+                checkpoint_steps = 0
+                checkpoint_window *= 2
 
+    return iterations, z
 
-@cuda.jit
-def julia_cuda(pixels, width, height, max_iterations, re_start, re_end, im_start, im_end, cx, cy, color_hue,
-               color_saturation, color_intensity):
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def julia(field, x_offset, y_offset, width, height, max_iterations, periodicity_tolerance, re_start, re_end, im_start,
+          im_end, cx, cy):
     """
-    Generate a julia visualization using CUDA.
+    Compute the smooth iteration counts of a julia set using multi-threading.
 
     Args:
-        pixels: Reference to the RGB pixel array
+        field: Reference to the array of smooth iteration counts of shape [height, width], INTERIOR for points
+               inside the set
+        x_offset: Horizontal position of the field in the image, in pixels
+        y_offset: Vertical position of the field in the image, in pixels
         width: Width of the image in pixels
         height: Height of the image in pixels
         max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
         cx: CX value
         cy: CY value
-        color_hue: Hue of the color used for the visualization
-        color_saturation: Saturation of the color used for the visualization
-        color_intensity: Intensity of the color used for the visualization
     """
 
-    x, y = cuda.grid(2)
-
-    if x < pixels.shape[0] and y < pixels.shape[1]:
-        c = complex(cx, cy)
-        z = complex(x / width * (re_end - re_start) + re_start, y / height * (im_end - im_start) + im_start)
-
-        iterations = 0
-        while (abs(z) < 4.0) and iterations < max_iterations:
-            z = z * z + c
-            iterations += 1
+    for y in prange(0, field.shape[0]):
+        for x in prange(0, field.shape[1]):
+            c = complex(cx, cy)
+            z = complex((x_offset + x) / width * (re_end - re_start) + re_start,
+                    (y_offset + y) / height * (im_end - im_start) + im_start)
 
-        # Color smoothing
-        smooth_iterations = iterations - math.log2(math.log2(z.real * z.real + z.imag * z.imag)) + 4.0
+            iterations, z = julia_escape(z, c, max_iterations, periodicity_tolerance)
 
-        if iterations >= max_iterations:
-            pixels[x, y, 0] = 0
-            pixels[x, y, 1] = 0
-            pixels[x, y, 2] = 0
-        else:
-            pixels[x, y, 0] = 255 * (color_hue / 360)
-            pixels[x, y, 1] = 255 * color_saturation
-            pixels[x, y, 2] = 255 * min(color_intensity * smooth_iterations / max_iterations, 1)
+            if iterations >= max_iterations:
+                field[y, x] = INTERIOR
+            else:
+                # Smooth iteration count
+                field[y, x] = iterations - math.log(math.log(z.real * z.real + z.imag * z.imag)) + 4.0
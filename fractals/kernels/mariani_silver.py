@@ -0,0 +1,176 @@
+"""
+Contains the Mariani-Silver renderer of the escape-time fractals, which only iterates the borders of rectangles and
+fills rectangles whose border lies entirely inside the set
+"""
+
+import math
+
+import numba
+import numpy as np
+from numba import prange
+
+from fractals.kernels.burningship import burning_ship_escape
+from fractals.kernels.common import JULIA, BURNING_SHIP, INTERIOR
+from fractals.kernels.julia import julia_escape
+from fractals.kernels.mandelbrot import mandelbrot_escape
+
+# Side in pixels of the rectangles the image is initially split into
+INITIAL_RECTANGLE_SIZE = 64
+
+# Rectangles with a side of at most this many pixels are computed pixel by pixel instead of being subdivided
+MIN_RECTANGLE_SIZE = 12
+
+
+@numba.jit(nopython=True, cache=True)
+def __escape(fractal, x, y, width, height, max_iterations, periodicity_tolerance, re_start, re_end, im_start, im_end,
+             cx, cy):
+    point = complex((re_start + (x / width) * (re_end - re_start)), (im_start + (y / height) * (im_end - im_start)))
+
+    if fractal == JULIA:
+        return julia_escape(point, complex(cx, cy), max_iterations, periodicity_tolerance)
+    elif fractal == BURNING_SHIP:
+        return burning_ship_escape(point, max_iterations, periodicity_tolerance)
+
+    return mandelbrot_escape(point, max_iterations, periodicity_tolerance)
+
+
+@numba.jit(nopython=True, cache=True)
+def __set_rectangle(rectangles, index, x_start, y_start, x_end, y_end):
+    rectangles[index, 0] = x_start
+    rectangles[index, 1] = y_start
+    rectangles[index, 2] = x_end
+    rectangles[index, 3] = y_end
+
+
+@numba.jit(nopython=True, cache=True)
+def __compute_pixel(field, iterations, fractal, x, y, x_offset, y_offset, width, height, max_iterations,
+                    periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy):
+    """
+    Compute a pixel, unless it was already computed as part of the border of another rectangle.
+
+    Returns:
+        Number of iterations until escape of the pixel
+    """
+
+    # Neighbouring rectangles share borders, so two threads may compute the same pixel. They write the same values.
+    if iterations[y, x] < 0:
+        pixel_iterations, z = __escape(fractal, x_offset + x, y_offset + y, width, height, max_iterations,
+                                       periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy)
+
+        if pixel_iterations >= max_iterations:
+            field[y, x] = INTERIOR
+        else:
+            # Smooth iteration count
+            field[y, x] = pixel_iterations - math.log(math.log(z.real * z.real + z.imag * z.imag)) + 4.0
+
+        iterations[y, x] = pixel_iterations
+
+    return iterations[y, x]
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def __process_rectangles(field, iterations, rectangles, subdivisions, fractal, x_offset, y_offset, width, height,
+                         max_iterations, periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy):
+    """
+    Compute the borders of rectangles in parallel, then fill, compute or subdivide their interior.
+
+    Args:
+        rectangles: Array of rectangles as rows of inclusive pixel bounds (x_start, y_start, x_end, y_end)
+        subdivisions: Array receiving the four subdivisions of each rectangle, with x_start set to -1 for rectangles
+                      that were not subdivided
+    """
+
+    for index in prange(0, rectangles.shape[0]):
+        x_start = rectangles[index, 0]
+        y_start = rectangles[index, 1]
+        x_end = rectangles[index, 2]
+        y_end = rectangles[index, 3]
+        subdivisions[4 * index:4 * index + 4, 0] = -1
+
+        border_inside = True
+        for y in (y_start, y_end):
+            for x in range(x_start, x_end + 1):
+                if __compute_pixel(field, iterations, fractal, x, y, x_offset, y_offset, width, height, max_iterations,
+                                   periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy) < max_iterations:
+                    border_inside = False
+
+        for y in range(y_start + 1, y_end):
+            for x in (x_start, x_end):
+                if __compute_pixel(field, iterations, fractal, x, y, x_offset, y_offset, width, height, max_iterations,
+                                   periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy) < max_iterations:
+                    border_inside = False
+
+        if border_inside:
+            # A rectangle whose border lies inside the set lies entirely inside the set, as long as no filament
+            # thinner than a pixel crosses the border between two pixels. Only interior rectangles are filled, as
+            # escaped pixels with equal iteration counts have different smooth iteration counts.
+            iterations[y_start + 1:y_end, x_start + 1:x_end] = max_iterations
+            field[y_start + 1:y_end, x_start + 1:x_end] = INTERIOR
+        elif x_end - x_start <= MIN_RECTANGLE_SIZE or y_end - y_start <= MIN_RECTANGLE_SIZE:
+            for y in range(y_start + 1, y_end):
+                for x in range(x_start + 1, x_end):
+                    __compute_pixel(field, iterations, fractal, x, y, x_offset, y_offset, width, height,
+                                    max_iterations, periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy)
+        else:
+            # Subdivisions share their borders with each other and with the rectangle
+            x_middle = (x_start + x_end) // 2
+            y_middle = (y_start + y_end) // 2
+
+            __set_rectangle(subdivisions, 4 * index, x_start, y_start, x_middle, y_middle)
+            __set_rectangle(subdivisions, 4 * index + 1, x_middle, y_start, x_end, y_middle)
+            __set_rectangle(subdivisions, 4 * index + 2, x_start, y_middle, x_middle, y_end)
+            __set_rectangle(subdivisions, 4 * index + 3, x_middle, y_middle, x_end, y_end)
+
+
+@numba.jit(nopython=True, cache=True)
+def mariani_silver(field, fractal, x_offset, y_offset, width, height, max_iterations, periodicity_tolerance, re_start,
+                   re_end, im_start, im_end, cx, cy):
+    """
+    Compute the smooth iteration counts of an escape-time fractal with the Mariani-Silver algorithm using
+    multi-threading. The field is split into rectangles, and each level of subdivision is processed in parallel.
+
+    Args:
+        field: Reference to the array of smooth iteration counts of shape [height, width], INTERIOR for points
+               inside the set
+        fractal: Fractal to generate (MANDELBROT, JULIA or BURNING_SHIP)
+        x_offset: Horizontal position of the field in the image, in pixels
+        y_offset: Vertical position of the field in the image, in pixels
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        re_start: Minimum value of the real complex plane
+        re_end: Maximum value of the real complex plane
+        im_start: Minimum value of the imaginary complex plane
+        im_end: Maximum value of the imaginary complex plane
+        cx: CX value of julia sets
+        cy: CY value of julia sets
+    """
+
+    # Iterations until escape of each pixel, or -1 for pixels not computed yet
+    iterations = np.full(field.shape, -1, dtype=np.int64)
+
+    field_height, field_width = field.shape
+    columns = math.ceil(max(field_width - 1, 1) / INITIAL_RECTANGLE_SIZE)
+    rows = math.ceil(max(field_height - 1, 1) / INITIAL_RECTANGLE_SIZE)
+    rectangles = np.empty((columns * rows, 4), dtype=np.int64)
+    for column in range(0, columns):
+        for row in range(0, rows):
+            x_start = column * INITIAL_RECTANGLE_SIZE
+            y_start = row * INITIAL_RECTANGLE_SIZE
+            __set_rectangle(rectangles, column * rows + row, x_start, y_start,
+                            min(x_start + INITIAL_RECTANGLE_SIZE, field_width - 1),
+                            min(y_start + INITIAL_RECTANGLE_SIZE, field_height - 1))
+
+    while rectangles.shape[0] > 0:
+        subdivisions = np.empty((4 * rectangles.shape[0], 4), dtype=np.int64)
+        __process_rectangles(field, iterations, rectangles, subdivisions, fractal, x_offset, y_offset, width, height,
+                             max_iterations, periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy)
+
+        total_subdivisions = 0
+        for index in range(0, subdivisions.shape[0]):
+            if subdivisions[index, 0] >= 0:
+                subdivisions[total_subdivisions] = subdivisions[index]
+                total_subdivisions += 1
+
+        rectangles = subdivisions[:total_subdivisions].copy()
@@ -0,0 +1,114 @@
+"""
+Contains the perturbation kernels of deep zooms, which iterate the offsets of pixels from a high-precision reference
+orbit in float64
+"""
+
+import math
+
+import numba
+from numba import prange
+
+from fractals.kernels.common import BURNING_SHIP, INTERIOR
+
+
+@numba.jit(nopython=True, cache=True)
+def __diff_abs(a, b):
+    """
+    Compute |a + b| - |a| without cancellation when b is small compared to a.
+    """
+
+    if a >= 0.0:
+        return b if a + b >= 0.0 else -(2.0 * a + b)
+
+    return 2.0 * a + b if a + b > 0.0 else -b
+
+
+@numba.jit(nopython=True, cache=True)
+def __perturb(fractal, reference_z, dz, dc):
+    """
+    Advance the offset dz of an orbit from the reference orbit by one iteration.
+    """
+
+    if fractal == BURNING_SHIP:
+        # Re(z^2) does not depend on the signs of Re(z) and Im(z), while Im(z) = 2|Re(z)||Im(z)|
+        x = reference_z.real
+        y = reference_z.imag
+        dx = dz.real
+        dy = dz.imag
+
+        return complex((2.0 * x + dx) * dx - (2.0 * y + dy) * dy + dc.real,
+                       2.0 * __diff_abs(x * y, x * dy + dx * y + dx * dy) + dc.imag)
+
+    return (2.0 * reference_z + dz) * dz + dc
+
+
+@numba.jit(nopython=True, cache=True)
+def perturbation_escape(fractal, reference_orbit, dc, max_iterations):
+    """
+    Iterate an orbit as an offset from a reference orbit until it escapes.
+
+    The offset loses precision when the orbit gets closer to 0 than to the reference orbit (a glitch), and the
+    reference orbit may escape before the orbit. In both cases the orbit is rebased: the offset becomes the orbit
+    itself and iteration continues from the start of the reference orbit.
+
+    Args:
+        fractal: Fractal to generate (MANDELBROT or BURNING_SHIP)
+        reference_orbit: Reference orbit from z = 0, up to its escape or max_iterations
+        dc: Offset of the point from the reference point
+        max_iterations: Max iterations for orbital escape
+
+    Returns:
+        Number of iterations until escape (max_iterations if the orbit does not escape) and the last value of z
+    """
+
+    reference_length = reference_orbit.shape[0]
+    reference_iteration = 0
+    dz = 0.0j
+    z = reference_orbit[0]
+
+    iterations = 0
+
+    while (abs(z) < 4.0) and iterations < max_iterations:
+        dz = __perturb(fractal, reference_orbit[reference_iteration], dz, dc)
+        reference_iteration += 1
+        iterations += 1
+
+        z = reference_orbit[reference_iteration] + dz
+
+        if (z.real * z.real + z.imag * z.imag < dz.real * dz.real + dz.imag * dz.imag or
+                reference_iteration == reference_length - 1):
+            dz = z
+            reference_iteration = 0
+
+    return iterations, z
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def perturbation(field, fractal, reference_orbit, x_offset, y_offset, width, height, max_iterations, pixel_spacing):
+    """
+    Compute the smooth iteration counts of a deep zoom with perturbation using multi-threading.
+
+    Args:
+        field: Reference to the array of smooth iteration counts of shape [height, width], INTERIOR for points
+               inside the set
+        fractal: Fractal to generate (MANDELBROT or BURNING_SHIP)
+        reference_orbit: Reference orbit of the point at the center of the image
+        x_offset: Horizontal position of the field in the image, in pixels
+        y_offset: Vertical position of the field in the image, in pixels
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        max_iterations: Max iterations for orbital escape
+        pixel_spacing: Distance between two pixels in the complex plane
+    """
+
+    for y in prange(0, field.shape[0]):
+        for x in prange(0, field.shape[1]):
+            dc = complex((x_offset + x - width / 2) * pixel_spacing, (y_offset + y - height / 2) * pixel_spacing)
+
+            iterations, z = perturbation_escape(fractal, reference_orbit, dc, max_iterations)
+
+            if iterations >= max_iterations:
+                field[y, x] = INTERIOR
+            else:
+                # Smooth iteration count
+                field[y, x] = iterations - math.log(math.log(z.real * z.real + z.imag * z.imag)) + 4.0
@@ -0,0 +1,120 @@
+"""
+Contains the incremental kernel of the escape-time fractals, which keeps the orbit of every pixel between launches, so
+that raising the max iterations only continues the orbits that are still bounded
+"""
+
+import math
+
+import numba
+from numba import prange
+
+from fractals.kernels.common import in_main_cardioid_or_bulb, JULIA, MANDELBROT, BURNING_SHIP, INTERIOR, BOUNDED, \
+    ESCAPED, PERIODIC
+
+
+@numba.jit(nopython=True, cache=True)
+def __continue_orbit(fractal, z, c, iterations, max_iterations, periodicity_tolerance):
+    """
+    Continue an orbit until it escapes, see fractals.kernels.mandelbrot.mandelbrot_escape. Periodicity checking starts
+    again from the current value of z.
+
+    Returns:
+        Last value of z, number of iterations and status of the orbit
+    """
+
+    check_periodicity = periodicity_tolerance > 0.0
+    tolerance_squared = periodicity_tolerance * periodicity_tolerance
+    z_checkpoint = z
+    checkpoint_window = 8
+    checkpoint_steps = 0
+
+    while (abs(z) < 4.0) and iterations < max_iterations:
+        if fractal == BURNING_SHIP:
+            z = complex(abs(z.real), abs(z.imag))
+
+        z = z * z + c
+        iterations += 1
+
+        if check_periodicity:
+            dz = z - z_checkpoint
+            if dz.real * dz.real + dz.imag * dz.imag < tolerance_squared:
+                return z, iterations, PERIODIC
+
+            checkpoint_steps += 1
+            if checkpoint_steps == checkpoint_window:
+                z_checkpoint = z
+                checkpoint_steps = 0
+                checkpoint_window *= 2
+
+    # Orbits escaping at the last iteration are still bounded, and escape at the start of the next launch
+    if iterations >= max_iterations:
+        return z, iterations, BOUNDED
+
+    return z, iterations, ESCAPED
+
+
+@numba.jit(nopython=True, parallel=True, cache=True)
+def continue_escape(field, z, iterations, status, fractal, x_offset, y_offset, width, height, max_iterations,
+                    periodicity_tolerance, re_start, re_end, im_start, im_end, cx, cy):
+    """
+    Continue the orbits of the pixels that are still bounded up to the max iterations, using multi-threading. Pixels
+    that were never iterated start from the beginning of their orbits. The results are the same as computing the field
+    with the max iterations at once, except for orbits found periodic.
+
+    Args:
+        field: Reference to the array of smooth iteration counts of shape [height, width], INTERIOR for points
+               inside the set
+        z: Reference to the last value of the orbit of each pixel (complex128)
+        iterations: Reference to the number of iterations of each pixel, 0 for pixels never iterated (int64)
+        status: Reference to the status of each pixel, BOUNDED, ESCAPED or PERIODIC (uint8)
+        fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+        x_offset: Horizontal position of the field in the image, in pixels
+        y_offset: Vertical position of the field in the image, in pixels
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        re_start: Minimum value of the real complex plane
+        re_end: Maximum value of the real complex plane
+        im_start: Minimum value of the imaginary complex plane
+        im_end: Maximum value of the imaginary complex plane
+        cx: Real part of the julia set constant
+        cy: Imaginary part of the julia set constant
+    """
+
+    for y in prange(0, field.shape[0]):
+        for x in prange(0, field.shape[1]):
+            if status[y, x] != BOUNDED:
+                continue
+
+            point = complex((re_start + ((x_offset + x) / width) * (re_end - re_start)),
+                            (im_start + ((y_offset + y) / height) * (im_end - im_start)))
+
+            if fractal == JULIA:
+                c = complex(cx, cy)
+
+                # Orbits of julia sets start at the point
+                if iterations[y, x] == 0:
+                    z[y, x] = point
+            else:
+                c = point
+
+                # Points in the main cardioid or the period-2 bulb never escape
+                if fractal == MANDELBROT and iterations[y, x] == 0 and in_main_cardioid_or_bulb(c.real, c.imag):
+                    status[y, x] = PERIODIC
+                    field[y, x] = INTERIOR
+                    continue
+
+            pixel_z, pixel_iterations, pixel_status = __continue_orbit(fractal, z[y, x], c, iterations[y, x],
+                                                                       max_iterations, periodicity_tolerance)
+
+            z[y, x] = pixel_z
+            iterations[y, x] = pixel_iterations
+            status[y, x] = pixel_status
+
+            if pixel_status == ESCAPED:
+                # Smooth iteration count
+                field[y, x] = pixel_iterations - math.log(math.log(pixel_z.real * pixel_z.real +
+                                                                   pixel_z.imag * pixel_z.imag)) + 4.0
+            else:
+                field[y, x] = INTERIOR
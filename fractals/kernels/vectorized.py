@@ -0,0 +1,174 @@
+"""
+Contains the vectorized NumPy kernels, which need no compilation. Pixels are iterated in chunks, and pixels that escape
+or are found periodic are dropped from the arrays, so that iterations only cost as much as the pixels left.
+"""
+
+import numpy as np
+
+from fractals.kernels.common import MANDELBROT, JULIA, BURNING_SHIP, INTERIOR
+
+
+def __smooth_iterations(iterations, z):
+    # Same expression as the compiled kernels
+    return iterations - np.log(np.log(z.real * z.real + z.imag * z.imag)) + 4.0
+
+
+def __in_main_cardioid_or_bulb(c):
+    # See fractals.kernels.common.in_main_cardioid_or_bulb
+    c_imag_squared = c.imag * c.imag
+    q = (c.real - 0.25) * (c.real - 0.25) + c_imag_squared
+
+    return ((q * (q + (c.real - 0.25)) <= 0.25 * c_imag_squared) |
+            ((c.real + 1.0) * (c.real + 1.0) + c_imag_squared <= 0.0625))
+
+
+def __square_plus(z, c, absolute):
+    """
+    Compute z^2 + c, or (|Re(z)| + i|Im(z)|)^2 + c if absolute, with the float64 operations of the compiled kernels.
+    NumPy's complex multiplication may fuse multiply-adds, whose rounding differences grow into other escape counts.
+    """
+
+    real = np.abs(z.real) if absolute else z.real
+    imag = np.abs(z.imag) if absolute else z.imag
+
+    # Re(z^2) = real * real - imag * imag, and Im(z^2) = real * imag + imag * real = 2 * (real * imag) exactly
+    result = np.empty_like(z)
+    result_real = result.real
+    result_imag = result.imag
+
+    np.multiply(real, real, out=result_real)
+    result_real -= imag * imag
+    result_real += c.real
+
+    np.multiply(real, imag, out=result_imag)
+    result_imag *= 2.0
+    result_imag += c.imag
+
+    return result
+
+
+def __keep(mask, index, c, z, z_checkpoint):
+    # The julia set constant is the same for every point
+    if mask.all():
+        return index, c, z, z_checkpoint
+
+    return index[mask], c if np.ndim(c) == 0 else c[mask], z[mask], z_checkpoint[mask]
+
+
+def __escape(values, points, fractal, max_iterations, periodicity_tolerance, c):
+    """
+    Iterate the orbits of points and write the smooth iteration counts of the points that escape.
+
+    Args:
+        values: Reference to the smooth iteration counts of the points, INTERIOR on input
+        points: Points of the complex plane
+        fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        c: Julia set constant, ignored for other fractals
+    """
+
+    index = np.arange(points.size)
+
+    if fractal == JULIA:
+        z = points
+    else:
+        c = points
+        z = np.zeros_like(points)
+
+        # Points in the main cardioid or the period-2 bulb never escape
+        if fractal == MANDELBROT:
+            outside = ~__in_main_cardioid_or_bulb(c)
+            index, c, z = index[outside], c[outside], z[outside]
+
+    check_periodicity = periodicity_tolerance > 0.0
+    tolerance_squared = periodicity_tolerance * periodicity_tolerance
+    z_checkpoint = z.copy()
+    checkpoint_window = 8
+    checkpoint_steps = 0
+
+    for iterations in range(max_iterations):
+        if iterations > 0 and check_periodicity:
+            # Brent-style periodicity checking, see fractals.kernels.mandelbrot.mandelbrot_escape. Every orbit
+            # refreshes its checkpoint after the same numbers of iterations.
+            dz = z - z_checkpoint
+            aperiodic = dz.real * dz.real + dz.imag * dz.imag >= tolerance_squared
+            index, c, z, z_checkpoint = __keep(aperiodic, index, c, z, z_checkpoint)
+
+            checkpoint_steps += 1
+            if checkpoint_steps == checkpoint_window:
+                z_checkpoint = z.copy()
+                checkpoint_steps = 0
+                checkpoint_window *= 2
+
+        escaped = np.abs(z) >= 4.0
+        values[index[escaped]] = __smooth_iterations(iterations, z[escaped])
+        index, c, z, z_checkpoint = __keep(~escaped, index, c, z, z_checkpoint)
+
+        # Points escaping at the last iteration are still inside the set, so the last iteration is never needed
+        if index.size == 0 or iterations == max_iterations - 1:
+            break
+
+        z = __square_plus(z, c, fractal == BURNING_SHIP)
+
+
+def escape_time_vectorized(field, fractal, x_offset, y_offset, width, height, max_iterations, periodicity_tolerance,
+                           re_start, re_end, im_start, im_end, cx, cy, chunk_pixels):
+    """
+    Compute the smooth iteration counts of an escape-time fractal with NumPy.
+
+    Args:
+        field: Reference to the array of smooth iteration counts of shape [height, width], INTERIOR for points
+               inside the set
+        fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+        x_offset: Horizontal position of the field in the image, in pixels
+        y_offset: Vertical position of the field in the image, in pixels
+        width: Width of the image in pixels
+        height: Height of the image in pixels
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        re_start: Minimum value of the real complex plane
+        re_end: Maximum value of the real complex plane
+        im_start: Minimum value of the imaginary complex plane
+        im_end: Maximum value of the imaginary complex plane
+        cx: Real part of the julia set constant
+        cy: Imaginary part of the julia set constant
+        chunk_pixels: Number of pixels iterated at once
+    """
+
+    rows_per_chunk = max(1, chunk_pixels // field.shape[1])
+    real = re_start + (np.arange(x_offset, x_offset + field.shape[1]) / width) * (re_end - re_start)
+
+    for row in range(0, field.shape[0], rows_per_chunk):
+        rows = min(rows_per_chunk, field.shape[0] - row)
+        imag = im_start + (np.arange(y_offset + row, y_offset + row + rows) / height) * (im_end - im_start)
+
+        points = np.empty([rows, field.shape[1]], dtype=np.complex128)
+        points.real = real[np.newaxis, :]
+        points.imag = imag[:, np.newaxis]
+
+        values = np.full(points.size, INTERIOR, dtype=np.float32)
+        __escape(values, points.ravel(), fractal, max_iterations, periodicity_tolerance, complex(cx, cy))
+        field[row:row + rows] = values.reshape(rows, field.shape[1])
+
+
+def escape_time_points_vectorized(values, fractal, points, max_iterations, periodicity_tolerance, cx, cy, chunk_pixels):
+    """
+    Compute the smooth iteration counts of points of the complex plane with NumPy.
+
+    Args:
+        values: Reference to the array of smooth iteration counts of the points, INTERIOR for points inside the set
+        fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+        points: Points of the complex plane (complex128)
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        cx: Real part of the julia set constant
+        cy: Imaginary part of the julia set constant
+        chunk_pixels: Number of points iterated at once
+    """
+
+    for start in range(0, points.shape[0], chunk_pixels):
+        chunk_values = np.full(min(chunk_pixels, points.shape[0] - start), INTERIOR, dtype=np.float32)
+        __escape(chunk_values, points[start:start + chunk_values.size], fractal, max_iterations, periodicity_tolerance,
+                 complex(cx, cy))
+        values[start:start + chunk_values.size] = chunk_values
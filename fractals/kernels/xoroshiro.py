@@ -0,0 +1,137 @@
+"""
+Xoroshiro128+ random number generator for the CPU kernels. Each thread draws from its own stream, so results are
+reproducible for a given seed and number of streams. Streams are spaced 2^64 draws apart, like the CUDA generator in
+numba.cuda.random.
+"""
+
+import numba
+import numpy as np
+from numba import uint32, uint64
+
+
+@numba.jit(nopython=True, cache=True)
+def __rotl(x, k):
+    return (x << uint32(k)) | (x >> uint32(64 - k))
+
+
+@numba.jit(nopython=True, cache=True)
+def __splitmix64(x):
+    z = x + uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> uint32(30))) * uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> uint32(27))) * uint64(0x94D049BB133111EB)
+    return z ^ (z >> uint32(31))
+
+
+@numba.jit(nopython=True, cache=True)
+def xoroshiro128p_next(states, index):
+    """
+    Advance a stream and return its next random number.
+
+    Args:
+        states: RNG states, one row of two uint64 words per stream
+        index: Index of the stream
+
+    Returns:
+        Random uint64
+    """
+
+    s0 = states[index, 0]
+    s1 = states[index, 1]
+    result = s0 + s1
+
+    s1 ^= s0
+    states[index, 0] = __rotl(s0, 55) ^ s1 ^ (s1 << uint32(14))
+    states[index, 1] = __rotl(s1, 36)
+
+    return result
+
+
+@numba.jit(nopython=True, cache=True)
+def xoroshiro128p_jump(states, index):
+    """
+    Advance a stream by 2^64 draws.
+
+    Args:
+        states: RNG states, one row of two uint64 words per stream
+        index: Index of the stream
+    """
+
+    jump = (uint64(0xbeac0467eba5facb), uint64(0xd86b048b86aa9922))
+
+    s0 = uint64(0)
+    s1 = uint64(0)
+
+    for i in range(2):
+        for b in range(64):
+            if jump[i] & (uint64(1) << uint32(b)):
+                s0 ^= states[index, 0]
+                s1 ^= states[index, 1]
+            xoroshiro128p_next(states, index)
+
+    states[index, 0] = s0
+    states[index, 1] = s1
+
+
+@numba.jit(nopython=True, cache=True)
+def xoroshiro128p_uniform_float64(states, index):
+    """
+    Draw a random float64 from a stream.
+
+    Args:
+        states: RNG states, one row of two uint64 words per stream
+        index: Index of the stream
+
+    Returns:
+        Random float64 in [0, 1)
+    """
+
+    return (xoroshiro128p_next(states, index) >> uint32(11)) * (1.0 / 9007199254740992.0)
+
+
+@numba.jit(nopython=True, cache=True)
+def xoroshiro128p_fill_uniform_float64(states, index, out):
+    """
+    Fill an array with random float64 values drawn from a stream.
+
+    Args:
+        states: RNG states, one row of two uint64 words per stream
+        index: Index of the stream
+        out: Array to fill with random values in [0, 1)
+    """
+
+    for i in range(0, out.shape[0]):
+        out[i] = xoroshiro128p_uniform_float64(states, index)
+
+
+@numba.jit(nopython=True, cache=True)
+def __init_xoroshiro128p_states(states, seed, first_stream):
+    s0 = __splitmix64(seed)
+    states[0, 0] = s0
+    states[0, 1] = __splitmix64(s0)
+
+    for _ in range(0, first_stream):
+        xoroshiro128p_jump(states, 0)
+
+    for i in range(1, states.shape[0]):
+        states[i, 0] = states[i - 1, 0]
+        states[i, 1] = states[i - 1, 1]
+        xoroshiro128p_jump(states, i)
+
+
+def create_xoroshiro128p_states(n, seed, first_stream=0):
+    """
+    Create independent xoroshiro128+ streams.
+
+    Args:
+        n: Number of streams
+        seed: Seed of the generator
+        first_stream: Index of the first stream, to continue the streams of another set of states
+
+    Returns:
+        RNG states, one row of two uint64 words per stream
+    """
+
+    states = np.empty((n, 2), dtype=np.uint64)
+    __init_xoroshiro128p_states(states, np.uint64(seed), first_stream)
+
+    return states
@@ -0,0 +1,87 @@
+"""
+Contains the high-precision reference orbits of deep zooms, which perturbation kernels iterate pixels around
+"""
+
+import functools
+from decimal import Decimal, InvalidOperation, localcontext
+
+import numpy as np
+
+from fractals.common import DeepZoomView
+from fractals.kernels.common import MANDELBROT, BURNING_SHIP
+
+# Width of the real axis of the view at zoom 1, that of the default view of the CLIs
+BASE_VIEW_WIDTH = Decimal("3.4")
+
+# Decimal digits computed beyond those that tell two adjacent pixels apart
+GUARD_DIGITS = 20
+
+
+def parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid decimal number '{value}'") from None
+
+
+def pixel_spacing(view: DeepZoomView, width):
+    """
+    Compute the distance between two pixels of a deep zoom in the complex plane.
+
+    Args:
+        view: View of the deep zoom
+        width: Width of the image in pixels
+
+    Returns:
+        Distance between two pixels as a Decimal
+    """
+
+    zoom = parse_decimal(view.zoom)
+    if zoom <= 0:
+        raise ValueError(f"Zoom must be positive, got {view.zoom}")
+
+    return BASE_VIEW_WIDTH / zoom / width
+
+
+# Tiles of a deep zoom share the reference orbit of its center
+@functools.lru_cache(maxsize=4)
+def reference_orbit(fractal, view: DeepZoomView, width, max_iterations):
+    """
+    Iterate the orbit of the center of a deep zoom in decimal arithmetic, with enough digits to resolve pixels.
+
+    Args:
+        fractal: Fractal of the orbit (MANDELBROT or BURNING_SHIP)
+        view: View of the deep zoom
+        width: Width of the image in pixels
+        max_iterations: Max iterations for orbital escape
+
+    Returns:
+        Orbit from z = 0 up to and including its first escaped value, or up to max_iterations, rounded to complex128
+    """
+
+    if fractal not in (MANDELBROT, BURNING_SHIP):
+        raise ValueError("Deep zooms are only available for the mandelbrot and the burning ship")
+
+    center_real = parse_decimal(view.center_real)
+    center_imag = parse_decimal(view.center_imag)
+    spacing = pixel_spacing(view, width)
+
+    orbit = np.zeros(max_iterations + 1, dtype=np.complex128)
+
+    with localcontext() as context:
+        context.prec = max(-spacing.adjusted(), 0) + GUARD_DIGITS
+
+        z_real = Decimal(0)
+        z_imag = Decimal(0)
+        iterations = 0
+
+        while z_real * z_real + z_imag * z_imag < 16 and iterations < max_iterations:
+            if fractal == BURNING_SHIP:
+                z_real, z_imag = z_real * z_real - z_imag * z_imag + center_real, 2 * abs(z_real * z_imag) + center_imag
+            else:
+                z_real, z_imag = z_real * z_real - z_imag * z_imag + center_real, 2 * z_real * z_imag + center_imag
+
+            iterations += 1
+            orbit[iterations] = complex(float(z_real), float(z_imag))
+
+    return orbit[:iterations + 1]
@@ -0,0 +1,160 @@
+"""
+Contains the progressive rendering of escape-time fractals, which yields a coarse preview of an image within
+milliseconds and refines it pass after pass. The first pass computes one pixel per block of FIRST_BLOCK_SIZE pixels, and
+each interlaced pass then halves the width or the height of the blocks by computing only the pixels between those
+already computed, so the last frame is the full image and every pixel is computed once.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from fractals.common import Plane2d, ComplexPlane
+from fractals.kernels.common import INTERIOR
+
+# Width and height in pixels of the blocks of the first frame, a power of 2
+FIRST_BLOCK_SIZE = 32
+
+# Difference between the smooth iteration counts of a pixel and of the block it was previewed with above which the
+# pixel changed
+DEFAULT_CHANGE_THRESHOLD = 1.0
+
+
+@dataclass
+class ProgressiveFrame:
+    # Smooth iteration counts of the top-left pixel of each block, of shape [ceil(height / block_height),
+    # ceil(width / block_width)], owned by the frame
+    samples: np.ndarray
+    plane: Plane2d
+    block_width: int
+    block_height: int
+    # Fraction of the pixels of the image computed so far
+    computed_fraction: float
+    # Fraction of the pixels computed by the pass that changed from the previous frame, which decreases as the
+    # previews get closer to the image
+    changed_fraction: float
+
+    @property
+    def is_final(self) -> bool:
+        return self.block_width == 1 and self.block_height == 1
+
+    @property
+    def field(self) -> np.ndarray:
+        """
+        Array of smooth iteration counts of shape [height, width], each block filled with its sample
+        """
+
+        return self.__upsample(self.samples)
+
+    def pixels(self, colorize):
+        """
+        Colorize the frame. Only the samples are colorized, then the colors are upsampled, which is cheaper than
+        colorizing the field for coarse frames.
+
+        Args:
+            colorize: Function that maps a field to RGB pixels of shape [height, width, 3]
+
+        Returns:
+            Array of RGB pixels of shape [height, width, 3]
+        """
+
+        return self.__upsample(colorize(self.samples))
+
+    def __upsample(self, array):
+        if self.is_final:
+            return array
+
+        array = np.repeat(np.repeat(array, self.block_height, axis=0), self.block_width, axis=1)
+
+        return array[:self.plane.height, :self.plane.width]
+
+
+def interlaced_passes(first_block_size=FIRST_BLOCK_SIZE):
+    """
+    Create the passes of a progressive rendering. A pass computes the pixels of a strided grid, after which the image is
+    covered by blocks whose top-left pixels are computed. Passes alternate between halving the width of blocks, by
+    computing the pixels between computed columns, and halving their height, by computing the rows between computed
+    rows, as in Adam7 interlacing.
+
+    Args:
+        first_block_size: Width and height in pixels of the blocks of the first frame, a power of 2
+
+    Returns:
+        Generator of passes, as tuples (x_start, x_step, y_start, y_step, block_width, block_height)
+    """
+
+    if first_block_size <= 0 or first_block_size & (first_block_size - 1) != 0:
+        raise ValueError("The first block size of a progressive rendering must be a power of 2")
+
+    yield 0, first_block_size, 0, first_block_size, first_block_size, first_block_size
+
+    block_size = first_block_size
+    while block_size > 1:
+        half = block_size // 2
+
+        yield half, block_size, 0, block_size, half, block_size
+        yield 0, half, half, block_size, half, half
+
+        block_size = half
+
+
+def progressive_frames(compute_points, plane: Plane2d, complex_plane: ComplexPlane, first_block_size=FIRST_BLOCK_SIZE,
+                       threshold=DEFAULT_CHANGE_THRESHOLD):
+    """
+    Render an image progressively. Callers can stop iterating at any frame, e.g. once the changed fraction of the
+    frames is low enough, and no further pixels are computed.
+
+    Args:
+        compute_points: Function that computes and returns the smooth iteration counts of an array of points
+        plane: Size of the image
+        complex_plane: Part of the complex plane covered by the image
+        first_block_size: Width and height in pixels of the blocks of the first frame, a power of 2
+        threshold: Difference between smooth iteration counts above which a pixel changed from the previous frame
+
+    Returns:
+        Generator of frames, the last of which is the full image
+    """
+
+    field = np.empty([plane.height, plane.width], dtype=np.float32)
+    computed = 0
+    block_width = block_height = None
+
+    # Coordinates of the pixels, as computed by the escape-time kernels
+    real = complex_plane.real_begin + (np.arange(plane.width) / plane.width) * (complex_plane.real_end -
+                                                                                 complex_plane.real_begin)
+    imag = complex_plane.imag_begin + (np.arange(plane.height) / plane.height) * (complex_plane.imag_end -
+                                                                                   complex_plane.imag_begin)
+
+    for x_start, x_step, y_start, y_step, next_block_width, next_block_height in interlaced_passes(first_block_size):
+        xs = np.arange(x_start, plane.width, x_step)
+        ys = np.arange(y_start, plane.height, y_step)
+
+        if xs.size > 0 and ys.size > 0:
+            points = np.empty([ys.size, xs.size], dtype=np.complex128)
+            points.real = real[xs]
+            points.imag = imag[ys, np.newaxis]
+
+            values = compute_points(points.ravel()).reshape(points.shape)
+            field[y_start::y_step, x_start::x_step] = values
+            computed += values.size
+
+            if block_width is None:
+                changed_fraction = 1.0
+            else:
+                # Pixels of the previous frame at the pixels of the pass, those of the top-left pixels of their blocks
+                previous = field[np.ix_(ys // block_height * block_height, xs // block_width * block_width)]
+                changed = (((values == INTERIOR) != (previous == INTERIOR)) |
+                           ((np.abs(values - previous) > threshold) & (values != INTERIOR) & (previous != INTERIOR)))
+                changed_fraction = np.count_nonzero(changed) / values.size
+        else:
+            changed_fraction = 0.0
+
+        block_width, block_height = next_block_width, next_block_height
+
+        # Views of the field would tie the frames kept by callers to the passes, and writing into their samples would
+        # change the next frames, so frames get a copy of their samples, except the last one, which is the field itself
+        samples = field[::block_height, ::block_width]
+        if block_width != 1 or block_height != 1:
+            samples = samples.copy()
+
+        yield ProgressiveFrame(samples, plane, block_width, block_height, computed / field.size, changed_fraction)
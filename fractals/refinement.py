@@ -0,0 +1,125 @@
+"""
+Contains the incremental refinement of escape-time fractals. The orbit of every pixel is kept between refinements, so
+that raising the max iterations only continues the orbits that are still bounded instead of computing the image
+again from the first iteration.
+"""
+
+import dataclasses
+from dataclasses import dataclass
+
+import numpy as np
+
+from fractals.backends import get_backend, REFINE
+from fractals.common import Plane2d, ComplexPlane, Tile
+from fractals.kernels.common import INTERIOR, BOUNDED, ESCAPED
+
+# Change in the fraction of unresolved boundary pixels under which deepening stops, and max iterations it stops at
+STABLE_FRACTION_TOLERANCE = 1e-4
+DEFAULT_ITERATIONS_LIMIT = 100000
+
+
+@dataclass
+class EscapeState:
+    # Smooth iteration counts, last value of the orbit, number of iterations and status of each pixel
+    field: np.ndarray
+    z: np.ndarray
+    iterations: np.ndarray
+    status: np.ndarray
+
+    # View the orbits belong to, and max iterations they were continued up to
+    view: tuple
+    max_iterations: int = 0
+
+
+def refine_escape_state(state, fractal, backend, plane: Plane2d, complex_plane: ComplexPlane, max_iterations,
+                        periodicity_tolerance=0.0, cx=0.0, cy=0.0):
+    """
+    Continue the orbits of the pixels of an image that are still bounded, up to the max iterations. Orbits start from
+    the beginning when there is no state yet, or when the view or the max iterations changed in a way the state cannot
+    be continued from.
+
+    Args:
+        state: Escape state of the previous refinement, or None
+        fractal: Fractal to compute, MANDELBROT, JULIA or BURNING_SHIP
+        backend: Backend computing the field, or its name, see fractals.backends
+        plane: Size of the image
+        complex_plane: Part of the complex plane covered by the image
+        max_iterations: Max iterations for orbital escape
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        cx: Real part of the julia set constant
+        cy: Imaginary part of the julia set constant
+
+    Returns:
+        The escape state, continued up to the max iterations
+    """
+
+    backend = get_backend(backend, REFINE)
+
+    # The view is copied, since the planes of a fractal can be changed in place
+    view = (dataclasses.astuple(plane), dataclasses.astuple(complex_plane), cx, cy)
+
+    if state is None or state.view != view or state.max_iterations > max_iterations:
+        shape = [plane.height, plane.width]
+        state = EscapeState(np.full(shape, INTERIOR, dtype=np.float32), np.zeros(shape, dtype=np.complex128),
+                            np.zeros(shape, dtype=np.int64), np.full(shape, BOUNDED, dtype=np.uint8), view)
+
+    backend.refine(state.field, state.z, state.iterations, state.status, fractal, Tile(0, 0, plane.width, plane.height),
+                   plane, max_iterations, periodicity_tolerance, complex_plane, cx, cy)
+    state.max_iterations = max_iterations
+
+    return state
+
+
+def unresolved_boundary_fraction(state: EscapeState):
+    """
+    Fraction of the pixels of an image that are still bounded but next to a pixel that escaped. These pixels are on
+    the boundary of the set, where more iterations resolve more detail.
+
+    Args:
+        state: Escape state of the image
+
+    Returns:
+        Fraction of unresolved boundary pixels, between 0 and 1
+    """
+
+    escaped = state.status == ESCAPED
+
+    # Pixels that escaped or have a neighbour that escaped
+    near_escaped = escaped.copy()
+    near_escaped[1:] |= escaped[:-1]
+    near_escaped[:-1] |= escaped[1:]
+    near_escaped[:, 1:] |= escaped[:, :-1]
+    near_escaped[:, :-1] |= escaped[:, 1:]
+
+    return np.count_nonzero(near_escaped & (state.status == BOUNDED)) / state.status.size
+
+
+def deepen_until_stable(fractal, backend, periodicity_tolerance=0.0, iterations_limit=DEFAULT_ITERATIONS_LIMIT,
+                        tolerance=STABLE_FRACTION_TOLERANCE):
+    """
+    Refine an escape-time fractal, doubling its max iterations, until the fraction of unresolved boundary pixels
+    changes by less than a tolerance between two refinements, or the max iterations reach a limit
+
+    Args:
+        fractal: Mandelbrot, Julia or BurningShip, whose max iterations are the first ones refined to
+        backend: Backend computing the field, or its name, see fractals.backends
+        periodicity_tolerance: Distance under which an orbit is considered periodic, or 0 to disable the check
+        iterations_limit: Max iterations at which deepening stops
+        tolerance: Change in the fraction of unresolved boundary pixels under which deepening stops
+
+    Returns:
+        Array of smooth iteration counts at the final max iterations of the fractal
+    """
+
+    field = fractal.refine_field(0, backend, periodicity_tolerance)
+    fraction = unresolved_boundary_fraction(fractal.escape_state)
+
+    while fractal.max_iterations < iterations_limit:
+        extra_iterations = min(max(fractal.max_iterations, 1), iterations_limit - fractal.max_iterations)
+        field = fractal.refine_field(extra_iterations, backend, periodicity_tolerance)
+
+        previous_fraction, fraction = fraction, unresolved_boundary_fraction(fractal.escape_state)
+        if abs(previous_fraction - fraction) < tolerance:
+            break
+
+    return field
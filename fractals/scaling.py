@@ -0,0 +1,102 @@
+"""
+Contains the scaling benchmark, which measures how the time to compute an escape-time fractal with the numba backend
+decreases with the number of threads, with the static scheduling of Numba and with the load-balanced scheduling of the
+backend. Fractals and Numba are imported when the benchmark runs, so that the CLI can import the module.
+"""
+
+import time
+from dataclasses import dataclass
+
+from fractals.backends import get_backend, NumbaBackend
+from fractals.common import Plane2d, ComplexPlane, HsvColor
+
+# Fractals of the benchmark, in the default views of their CLIs
+SCALING_FRACTALS = ("mandelbrot", "julia", "burningship")
+
+
+@dataclass
+class ScalingMeasurement:
+    threads: int = 1
+    static_seconds: float = 0.0
+    balanced_seconds: float = 0.0
+
+
+def default_thread_counts():
+    """
+    Numbers of threads measured by default: powers of two up to the number of cores, and the number of cores
+    """
+
+    import numba
+
+    thread_counts = [1]
+    while thread_counts[-1] * 2 < numba.config.NUMBA_NUM_THREADS:
+        thread_counts.append(thread_counts[-1] * 2)
+
+    if thread_counts[-1] != numba.config.NUMBA_NUM_THREADS:
+        thread_counts.append(numba.config.NUMBA_NUM_THREADS)
+
+    return thread_counts
+
+
+def create_fractal(name, plane: Plane2d, max_iterations):
+    """
+    Create a fractal of the benchmark
+
+    Args:
+        name: Name of the fractal, one of SCALING_FRACTALS
+        plane: Size of the image
+        max_iterations: Max iterations for orbital escape
+
+    Returns:
+        The fractal
+    """
+
+    from fractals.BurningShip import BurningShip
+    from fractals.Julia import Julia
+    from fractals.Mandelbrot import Mandelbrot
+
+    if name == "julia":
+        return Julia(plane, ComplexPlane(-1.6, 1.6, -1.2, 1.2), max_iterations, HsvColor(), -0.4, 0.6)
+    elif name == "burningship":
+        return BurningShip(plane, ComplexPlane(-2.2, 1.2, -1.9, 0.7), max_iterations, HsvColor())
+
+    return Mandelbrot(plane, ComplexPlane(-2.2, 1.2, -1.2, 1.2), max_iterations, HsvColor())
+
+
+def measure_scaling(fractal, thread_counts, repeats=3):
+    """
+    Measure the time to compute the field of a fractal with each number of threads, with static chunks of one per
+    thread and with the load-balanced chunks of the numba backend
+
+    Args:
+        fractal: Escape-time fractal
+        thread_counts: Numbers of threads to measure
+        repeats: Number of measurements of each configuration, of which the fastest is kept
+
+    Returns:
+        List of measurements, one per number of threads
+    """
+
+    # Compile the kernels before measuring
+    fractal.compute_field(get_backend(NumbaBackend.name))
+
+    measurements = []
+    for threads in thread_counts:
+        seconds = []
+
+        for chunk_size in (0, NumbaBackend.defaults["chunk_size"]):
+            backend = get_backend(NumbaBackend.name, threads=threads, chunk_size=chunk_size)
+
+            fastest = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                fractal.compute_field(backend)
+                elapsed = time.perf_counter() - start
+
+                fastest = elapsed if fastest is None else min(fastest, elapsed)
+
+            seconds.append(fastest)
+
+        measurements.append(ScalingMeasurement(threads, *seconds))
+
+    return measurements
@@ -0,0 +1,196 @@
+"""
+Contains the sharded buddhabrot, where worker processes (possibly on other hosts sharing a directory) trace independent
+RNG streams into partial histograms that are merged into the final histogram
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import astuple
+
+import numba
+import numpy as np
+
+from fractals.checkpoint import BuddhabrotCheckpoint
+
+# Number of RNG streams reserved for each shard, i.e. the max number of threads of a worker
+SHARD_STREAMS = 1024
+
+# Number of histogram columns added at once when merging shards
+MERGE_BLOCK_COLUMNS = 256
+
+
+def shard_path(directory, shard_index):
+    return os.path.join(directory, f"shard-{shard_index:04d}")
+
+
+def shard_samples(total_samples, shard_index, shard_count):
+    return (shard_index + 1) * total_samples // shard_count - shard_index * total_samples // shard_count
+
+
+def shard_job(buddhabrot, shard_count, total_samples, seed, sampling, warmup_samples):
+    """
+    Describe the job of a sharded buddhabrot, i.e. everything that the partial histograms of its shards depend on.
+    Each shard records its job, so that shards of different jobs are never merged.
+
+    Args:
+        buddhabrot: Buddhabrot to compute
+        shard_count: Total number of shards
+        total_samples: Total number of samples over all shards
+        seed: Seed of the random number generator, shared by all shards
+        sampling: Sampling mode, see Buddhabrot.compute
+        warmup_samples: Number of warm-up mutations per Markov chain with Metropolis sampling
+
+    Returns:
+        JSON-serializable parameters of the job
+    """
+
+    return {"width": buddhabrot.plane.width, "height": buddhabrot.plane.height,
+            "complex_plane": [float(value) for value in astuple(buddhabrot.complex_plane)],
+            "channel_iterations": list(buddhabrot.channel_iterations), "shard_count": shard_count,
+            "total_samples": total_samples, "seed": seed, "sampling": sampling, "warmup_samples": warmup_samples}
+
+
+def run_shard(buddhabrot, directory, shard_index, shard_count, total_samples=10000000, seed=3123, sampling="uniform",
+              warmup_samples=1000, checkpoint_interval=600, threads=None):
+    """
+    Trace the samples of one shard into its partial histogram. Each shard is a checkpointed job, so running a shard
+    again after a crash continues where it left off.
+
+    Args:
+        buddhabrot: Buddhabrot to compute
+        directory: Directory of the partial histograms, shared by all workers
+        shard_index: Index of the shard to run
+        shard_count: Total number of shards
+        total_samples: Total number of samples over all shards
+        seed: Seed of the random number generator, shared by all shards
+        sampling: Sampling mode, see Buddhabrot.compute
+        warmup_samples: Number of warm-up mutations per Markov chain with Metropolis sampling
+        checkpoint_interval: Minimum number of seconds between two checkpoints of the partial histogram
+        threads: Number of threads of the worker, or None to use all cores
+    """
+
+    if threads is not None:
+        numba.set_num_threads(threads)
+
+    if numba.get_num_threads() > SHARD_STREAMS:
+        raise ValueError(f"Shards support at most {SHARD_STREAMS} threads per worker")
+
+    path = shard_path(directory, shard_index)
+    job = shard_job(buddhabrot, shard_count, total_samples, seed, sampling, warmup_samples)
+
+    if BuddhabrotCheckpoint.exists(path):
+        checkpoint = BuddhabrotCheckpoint.open(path)
+
+        if checkpoint.parameters.get("job") != job:
+            raise ValueError(f"Shard {path} was started by another job: "
+                             f"{__job_differences(checkpoint.parameters.get('job', {}), job)}")
+    else:
+        checkpoint = BuddhabrotCheckpoint.create(path, buddhabrot.counters_shape,
+                                                 {"shard_index": shard_index, "job": job},
+                                                 buddhabrot.counters_dtype(sampling))
+
+    # Each shard draws from its own range of streams, so that no two shards trace the same samples
+    buddhabrot.compute_counters(shard_samples(total_samples, shard_index, shard_count), seed, sampling,
+                                warmup_samples, checkpoint, checkpoint_interval,
+                                first_stream=shard_index * SHARD_STREAMS)
+
+
+def run_shards(buddhabrot, directory, workers, total_samples=10000000, seed=3123, sampling="uniform",
+               warmup_samples=1000, checkpoint_interval=600):
+    """
+    Run one shard per local worker process, splitting the cores evenly between workers.
+
+    Args:
+        buddhabrot: Buddhabrot to compute
+        directory: Directory of the partial histograms
+        workers: Number of worker processes (and shards)
+        total_samples: Total number of samples over all shards
+        seed: Seed of the random number generator
+        sampling: Sampling mode, see Buddhabrot.compute
+        warmup_samples: Number of warm-up mutations per Markov chain with Metropolis sampling
+        checkpoint_interval: Minimum number of seconds between two checkpoints of the partial histograms
+    """
+
+    threads = max(1, numba.config.NUMBA_NUM_THREADS // workers)
+
+    # Spawn workers rather than forking, as forking a process that already started Numba's threads is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(run_shard, buddhabrot, directory, shard_index, workers, total_samples, seed,
+                                   sampling, warmup_samples, checkpoint_interval, threads)
+                   for shard_index in range(0, workers)]
+
+        for future in futures:
+            future.result()
+
+
+def merge_shards(directory, job, shape, dtype=np.uint64, allow_partial=False):
+    """
+    Sum the partial histograms of all shards in a directory. Partial histograms are memory-mapped and added in blocks
+    of columns, so memory stays bounded by the size of the final histogram.
+
+    Args:
+        directory: Directory of the partial histograms
+        job: Job that every shard must belong to, see shard_job
+        shape: Shape of the histogram, see Buddhabrot.counters_shape
+        dtype: Type of the histogram, see Buddhabrot.counters_dtype
+        allow_partial: Whether to merge the shards found even if some shards are missing or have not finished
+
+    Returns:
+        The merged histogram and the number of samples traced over all shards
+    """
+
+    # All shards are checked before any is merged
+    checkpoints = []
+    shard_indices = set()
+    unfinished = []
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.startswith("shard-") or not BuddhabrotCheckpoint.exists(path):
+            continue
+
+        checkpoint = BuddhabrotCheckpoint.open(path, mmap_mode="r")
+        if checkpoint.counters.shape != tuple(shape) or checkpoint.counters.dtype != dtype:
+            raise ValueError(f"Shard {path} has a histogram of shape {checkpoint.counters.shape} and type "
+                             f"{checkpoint.counters.dtype}, expected {tuple(shape)} and {np.dtype(dtype)}")
+
+        if "job" not in checkpoint.parameters:
+            raise ValueError(f"Shard {path} does not record its job")
+
+        if checkpoint.parameters["job"] != job:
+            raise ValueError(f"Shard {path} belongs to another job: "
+                             f"{__job_differences(checkpoint.parameters['job'], job)}")
+
+        shard_index = checkpoint.parameters["shard_index"]
+        shard_indices.add(shard_index)
+        if checkpoint.samples < shard_samples(job["total_samples"], shard_index, job["shard_count"]):
+            unfinished.append(shard_index)
+
+        checkpoints.append(checkpoint)
+
+    if not shard_indices:
+        raise ValueError(f"No shards found in {directory}")
+
+    missing = sorted(set(range(0, job["shard_count"])) - shard_indices)
+    if not allow_partial and missing:
+        raise ValueError(f"Shards {', '.join(map(str, missing))} of {job['shard_count']} are missing from {directory}")
+
+    if not allow_partial and unfinished:
+        raise ValueError(f"Shards {', '.join(map(str, sorted(unfinished)))} of {job['shard_count']} have not finished")
+
+    counters = np.zeros(shape, dtype=dtype)
+    samples = 0
+
+    for checkpoint in checkpoints:
+        for x in range(0, counters.shape[1], MERGE_BLOCK_COLUMNS):
+            counters[:, x:x + MERGE_BLOCK_COLUMNS] += checkpoint.counters[:, x:x + MERGE_BLOCK_COLUMNS]
+
+        samples += checkpoint.samples
+
+    return counters, samples
+
+
+def __job_differences(job, expected_job):
+    return ", ".join(f"{name} is {job.get(name)} instead of {expected_job.get(name)}"
+                     for name in sorted(set(job) | set(expected_job)) if job.get(name) != expected_job.get(name))
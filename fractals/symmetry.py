@@ -0,0 +1,123 @@
+"""
+Contains the symmetric rendering of escape-time fractals. The mandelbrot set is symmetric about the real axis and julia
+sets are symmetric about the origin, so when a view covers both sides of the axis, only one side is computed and the
+other is copied from it. A pixel is only copied when the coordinates of its mirror image are on the pixel grid, within a
+millionth of a pixel: views that are not centered on the axis, or pixel grids that do not align with it, fall back to
+computing the pixels that have no mirror image.
+"""
+
+import numpy as np
+
+from fractals.common import Plane2d, ComplexPlane, Tile
+
+# Distance in pixels under which two coordinates are considered opposite. Coordinates of mirrored pixels are rarely
+# exactly opposite, since they are rounded differently.
+MIRROR_TOLERANCE = 1e-6
+
+
+def __runs(mask):
+    # Start and stop of each run of True values
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+
+    return zip(edges[::2], edges[1::2])
+
+
+def mirror_pixels(start, end, size, offset, count):
+    """
+    Find the mirror image of each pixel of a part of an axis of the image, i.e. the pixel of the opposite coordinate.
+    Coordinates are computed as in the kernels.
+
+    Args:
+        start: Coordinate of the first pixel of the image
+        end: Coordinate of the end of the last pixel of the image
+        size: Number of pixels of the image along the axis
+        offset: First pixel of the part
+        count: Number of pixels of the part
+
+    Returns:
+        Array of the index in the part of the mirror image of each pixel, or -1 for pixels without mirror image
+    """
+
+    coordinates = start + (np.arange(offset, offset + count) / size) * (end - start)
+    tolerance = MIRROR_TOLERANCE * abs(end - start) / size
+
+    order = np.argsort(coordinates)
+    sorted_coordinates = coordinates[order]
+
+    # Closest coordinate to the opposite of each coordinate, on either side of its insertion point
+    positions = np.searchsorted(sorted_coordinates, -coordinates)
+    below = np.clip(positions - 1, 0, count - 1)
+    above = np.clip(positions, 0, count - 1)
+    below_distance = np.abs(sorted_coordinates[below] + coordinates)
+    above_distance = np.abs(sorted_coordinates[above] + coordinates)
+    closest = np.where(below_distance <= above_distance, below, above)
+
+    return np.where(np.abs(sorted_coordinates[closest] + coordinates) <= tolerance, order[closest], -1)
+
+
+def compute_symmetric_field(compute_tile, tile: Tile, plane: Plane2d, complex_plane: ComplexPlane,
+                            point_symmetric=False):
+    """
+    Compute the field of a tile of a symmetric fractal. Of each pair of mirrored rows, the row with the lower index is
+    computed and the other one is copied from it.
+
+    Args:
+        compute_tile: Function that computes and returns the field of a tile
+        tile: Part of the image to compute
+        plane: Size of the image
+        complex_plane: Part of the complex plane covered by the image
+        point_symmetric: Whether the fractal is symmetric about the origin, rather than about the real axis
+
+    Returns:
+        Array of smooth iteration counts of shape [tile.height, tile.width]
+    """
+
+    row_mirrors = mirror_pixels(complex_plane.imag_begin, complex_plane.imag_end, plane.height, tile.y, tile.height)
+    rows = np.arange(tile.height)
+    mirrored_rows = (row_mirrors >= 0) & (row_mirrors < rows) & (row_mirrors[np.maximum(row_mirrors, 0)] == rows)
+
+    if not mirrored_rows.any():
+        return compute_tile(tile)
+
+    field = np.empty([tile.height, tile.width], dtype=np.float32)
+
+    for start, stop in __runs(~mirrored_rows):
+        field[start:stop] = compute_tile(Tile(tile.x, tile.y + start, tile.width, stop - start))
+
+    source_rows = row_mirrors[mirrored_rows]
+
+    if not point_symmetric:
+        # Rows of conjugate points share their real parts
+        field[mirrored_rows] = field[source_rows]
+
+        return field
+
+    column_mirrors = mirror_pixels(complex_plane.real_begin, complex_plane.real_end, plane.width, tile.x, tile.width)
+    mirrored_columns = column_mirrors >= 0
+
+    field[np.ix_(mirrored_rows, mirrored_columns)] = field[np.ix_(source_rows, column_mirrors[mirrored_columns])]
+
+    # Pixels of mirrored rows whose columns have no mirror image
+    for row_start, row_stop in __runs(mirrored_rows):
+        for column_start, column_stop in __runs(~mirrored_columns):
+            field[row_start:row_stop, column_start:column_stop] = compute_tile(
+                Tile(tile.x + column_start, tile.y + row_start, column_stop - column_start, row_stop - row_start))
+
+    return field
+
+
+def is_conjugate_symmetric(plane: Plane2d, complex_plane: ComplexPlane):
+    """
+    Check whether a view is symmetric about the real axis, within the mirror tolerance
+
+    Args:
+        plane: Size of the image
+        complex_plane: Part of the complex plane covered by the image
+
+    Returns:
+        True if the conjugates of the points of the view are in the view, False otherwise
+    """
+
+    tolerance = MIRROR_TOLERANCE * abs(complex_plane.imag_end - complex_plane.imag_begin) / plane.height
+
+    return abs(complex_plane.imag_begin + complex_plane.imag_end) <= tolerance
@@ -0,0 +1,308 @@
+"""
+Contains the tile cache of escape-time fractals. Fields are cached by tiles of a grid aligned on the origin of the
+complex plane, so that views at the same pixel spacing share the tiles they overlap, whatever their position. Tiles are
+content-addressed: their key is a hash of everything their smooth iteration counts depend on. The cache has a
+size-bounded in-memory LRU tier and an optional compressed on-disk tier, which persists tiles across processes.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, astuple
+
+import numpy as np
+
+from fractals.common import Plane2d, ComplexPlane
+
+# Width and height in pixels of the tiles of the grid
+CACHE_TILE_SIZE = 256
+
+# Max size in bytes of the tiles in memory
+DEFAULT_MEMORY_BYTES = 256 * 1024 * 1024
+
+# zlib level of the tiles on disk. Tiles are stored as byte planes, the first bytes of every float32 then the second
+# bytes and so on, which compresses better and faster as the high bytes of neighbouring counts are often equal.
+DISK_COMPRESSION_LEVEL = 1
+
+# Significant digits of the pixel spacing of views, so that panning, which recomputes the spacing with rounding errors,
+# keeps the same grid
+SPACING_DIGITS = 12
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.disk_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.hits + self.disk_hits) / self.lookups if self.lookups > 0 else 0.0
+
+
+def tile_key(fractal, complex_plane: ComplexPlane, plane: Plane2d, **parameters):
+    """
+    Create the key of a tile, a hash of the parameters of its field. Floats are hashed exactly, through their hex
+    representation.
+
+    Args:
+        fractal: Fractal of the tile, MANDELBROT, JULIA or BURNING_SHIP
+        complex_plane: Part of the complex plane covered by the tile
+        plane: Size of the tile
+        parameters: Other parameters of the field, e.g. max iterations, backend or julia set constant
+
+    Returns:
+        Key of the tile (hex string)
+    """
+
+    def exact(value):
+        return float(value).hex() if isinstance(value, float) else value
+
+    description = {"fractal": fractal,
+                   "complex_plane": [exact(float(value)) for value in astuple(complex_plane)],
+                   "plane": [plane.width, plane.height],
+                   **{name: exact(value) for name, value in parameters.items()}}
+
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+class TileCache:
+    """
+    Cache of the fields of tiles, safe to share between threads. Cached fields are read-only, as they are shared by
+    every lookup.
+    """
+
+    @property
+    def statistics(self) -> CacheStatistics:
+        return self._statistics
+
+    @property
+    def memory_bytes(self):
+        return self._memory_bytes
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def __init__(self, memory_bytes=DEFAULT_MEMORY_BYTES, directory=None):
+        """
+        Args:
+            memory_bytes: Max size in bytes of the tiles in memory, least recently used tiles are evicted first
+            directory: Directory of the on-disk tier, or None to only cache tiles in memory
+        """
+
+        self._memory_bytes = memory_bytes
+        self._directory = directory
+        self._statistics = CacheStatistics()
+        self._tiles = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def get(self, key):
+        """
+        Look up a tile in memory, then on disk. Tiles found on disk are added to memory.
+
+        Args:
+            key: Key of the tile, see tile_key
+
+        Returns:
+            Field of the tile, or None when it is not cached
+        """
+
+        with self._lock:
+            field = self._tiles.get(key)
+
+            if field is not None:
+                self._tiles.move_to_end(key)
+                self._statistics.hits += 1
+                return field
+
+        field = self.__load(key)
+
+        with self._lock:
+            if field is None:
+                self._statistics.misses += 1
+                return None
+
+            self._statistics.disk_hits += 1
+            self.__insert(key, field)
+
+        return field
+
+    def put(self, key, field):
+        """
+        Add a tile to memory and to disk.
+
+        Args:
+            key: Key of the tile, see tile_key
+            field: Field of the tile
+
+        Returns:
+            Read-only field of the tile
+        """
+
+        field = np.array(field)
+        field.flags.writeable = False
+
+        with self._lock:
+            self.__insert(key, field)
+
+        self.__store(key, field)
+
+        return field
+
+    def get_or_compute(self, key, compute):
+        """
+        Look up a tile, and compute and add it on a miss.
+
+        Args:
+            key: Key of the tile, see tile_key
+            compute: Function that computes and returns the field of the tile
+
+        Returns:
+            Read-only field of the tile
+        """
+
+        field = self.get(key)
+
+        return field if field is not None else self.put(key, compute())
+
+    def clear(self):
+        """
+        Remove every tile from memory. Tiles on disk are kept.
+        """
+
+        with self._lock:
+            self._tiles.clear()
+            self._used_bytes = 0
+
+    def __insert(self, key, field):
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return
+
+        self._tiles[key] = field
+        self._used_bytes += field.nbytes
+
+        while self._used_bytes > self._memory_bytes and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._used_bytes -= evicted.nbytes
+            self._statistics.evictions += 1
+
+    def __path(self, key):
+        # Tiles are spread over 256 subdirectories, so that directories stay small
+        return os.path.join(self._directory, key[:2], key + ".npy.z")
+
+    def __load(self, key):
+        if self._directory is None:
+            return None
+
+        try:
+            with open(self.__path(key), "rb") as tile_file:
+                planes = np.load(io.BytesIO(zlib.decompress(tile_file.read())))
+        except FileNotFoundError:
+            return None
+
+        field = np.ascontiguousarray(np.moveaxis(planes, 0, -1)).view(np.float32)[..., 0]
+
+        field.flags.writeable = False
+
+        return field
+
+    def __store(self, key, field):
+        if self._directory is None:
+            return
+
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        buffer = io.BytesIO()
+        np.save(buffer, np.moveaxis(field.astype(np.float32)[..., np.newaxis].view(np.uint8), -1, 0))
+
+        # Written to a file of the thread, then renamed, so that readers and concurrent writers never see partial tiles
+        temporary_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as tile_file:
+            tile_file.write(zlib.compress(buffer.getbuffer(), DISK_COMPRESSION_LEVEL))
+        os.replace(temporary_path, path)
+
+
+def grid_spacing(plane: Plane2d, complex_plane: ComplexPlane):
+    """
+    Get the pixel spacing of a view, rounded to SPACING_DIGITS significant digits
+
+    Args:
+        plane: Size of the view
+        complex_plane: Part of the complex plane covered by the view
+
+    Returns:
+        Horizontal and vertical distance between pixels in the complex plane
+    """
+
+    return (float(f"{(complex_plane.real_end - complex_plane.real_begin) / plane.width:.{SPACING_DIGITS}g}"),
+            float(f"{(complex_plane.imag_end - complex_plane.imag_begin) / plane.height:.{SPACING_DIGITS}g}"))
+
+
+def compute_cached_field(compute_tile, key, cache: TileCache, plane: Plane2d, complex_plane: ComplexPlane,
+                         tile_size=CACHE_TILE_SIZE):
+    """
+    Compute the field of a view from the tiles of the grid at its pixel spacing. The view is snapped to the nearest
+    pixels of the grid, i.e. it is moved by less than half a pixel.
+
+    Args:
+        compute_tile: Function that computes and returns the field of a tile, given its size and part of the complex
+                      plane
+        key: Function that creates the key of a tile, given its part of the complex plane and size, see tile_key
+        cache: Cache of the tiles
+        plane: Size of the view
+        complex_plane: Part of the complex plane covered by the view
+        tile_size: Width and height in pixels of the tiles of the grid
+
+    Returns:
+        Array of smooth iteration counts of shape [height, width]
+    """
+
+    spacing_x, spacing_y = grid_spacing(plane, complex_plane)
+
+    # Position in the grid of the first pixel of the view
+    start_x = round(complex_plane.real_begin / spacing_x)
+    start_y = round(complex_plane.imag_begin / spacing_y)
+
+    field = np.empty([plane.height, plane.width], dtype=np.float32)
+    tile_plane = Plane2d(tile_size, tile_size)
+
+    for row in range(math.floor(start_y / tile_size), math.floor((start_y + plane.height - 1) / tile_size) + 1):
+        for column in range(math.floor(start_x / tile_size), math.floor((start_x + plane.width - 1) / tile_size) + 1):
+            tile_complex_plane = ComplexPlane(column * tile_size * spacing_x, (column + 1) * tile_size * spacing_x,
+                                              row * tile_size * spacing_y, (row + 1) * tile_size * spacing_y)
+
+            tile_field = cache.get_or_compute(key(tile_complex_plane, tile_plane),
+                                              functools.partial(compute_tile, tile_plane, tile_complex_plane))
+
+            # Overlap of the tile and the view, in pixels of the grid
+            x_begin = max(column * tile_size, start_x)
+            x_end = min((column + 1) * tile_size, start_x + plane.width)
+            y_begin = max(row * tile_size, start_y)
+            y_end = min((row + 1) * tile_size, start_y + plane.height)
+
+            field[y_begin - start_y:y_end - start_y, x_begin - start_x:x_end - start_x] = \
+                tile_field[y_begin - row * tile_size:y_end - row * tile_size,
+                           x_begin - column * tile_size:x_end - column * tile_size]
+
+    return field
@@ -0,0 +1,182 @@
+"""
+Contains the load generator of the tile server. Each client is a viewer that explores a fractal with a random walk of
+pans and zooms: after each move, it requests the tiles of its viewport and waits for them, while it prefetches the
+tiles of the next zoom level under the center of the view. The prefetches of a move that are not done by the next move
+are aborted, by closing their connections.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field as dataclass_field
+
+import numpy as np
+
+from fractals.tileserver import TileServer, TileSettings, MAX_ZOOM
+
+# Width and height in tiles of the viewport of clients
+VIEWPORT = (4, 3)
+
+# Zoom levels that clients explore
+LOAD_ZOOMS = (1, 8)
+
+# Moves of clients and their weights: pans to the left, right, top and bottom, zoom in and zoom out
+MOVES = (((-1, 0, 0), 3), ((1, 0, 0), 3), ((0, -1, 0), 3), ((0, 1, 0), 3), ((0, 0, 1), 2), ((0, 0, -1), 1))
+
+
+@dataclass
+class LoadResults:
+    seconds: float = 0.0
+    # Latencies in seconds of the visible tiles
+    latencies: list = dataclass_field(default_factory=list)
+    prefetched: int = 0
+    aborted: int = 0
+    errors: int = 0
+
+    @property
+    def tiles(self) -> int:
+        return len(self.latencies) + self.prefetched
+
+    @property
+    def tiles_per_second(self) -> float:
+        return self.tiles / self.seconds if self.seconds > 0 else 0.0
+
+    def latency_percentile(self, percentile):
+        """
+        Latency of the visible tiles below which a percentage of them were served, in seconds
+        """
+
+        return float(np.percentile(self.latencies, percentile)) if self.latencies else 0.0
+
+
+async def fetch(host, port, path):
+    """
+    Request a path from a server on a new connection
+
+    Args:
+        host: Address of the server
+        port: Port of the server
+        path: Path and query of the request
+
+    Returns:
+        Status code of the response
+    """
+
+    reader, writer = await asyncio.open_connection(host, port)
+
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+
+        response = await reader.read()
+    finally:
+        writer.close()
+
+    return int(response.split(b" ", 2)[1]) if response else 0
+
+
+async def __fetch_tile(host, port, fractal_name, tile, results, prefetch=False):
+    z, x, y = tile
+    start = time.perf_counter()
+
+    try:
+        status = await fetch(host, port, f"/{fractal_name}/{z}/{x}/{y}.png{'?prefetch=1' if prefetch else ''}")
+    except ConnectionError:
+        status = 0
+
+    if status != 200:
+        results.errors += 1
+    elif prefetch:
+        results.prefetched += 1
+    else:
+        results.latencies.append(time.perf_counter() - start)
+
+
+async def __client(host, port, fractal_name, rng, deadline, results):
+    z = LOAD_ZOOMS[0]
+    x, y = rng.randrange(2 ** z), rng.randrange(2 ** z)
+
+    while time.perf_counter() < deadline:
+        columns = range(max(x - VIEWPORT[0] // 2, 0), min(x - VIEWPORT[0] // 2 + VIEWPORT[0], 2 ** z))
+        rows = range(max(y - VIEWPORT[1] // 2, 0), min(y - VIEWPORT[1] // 2 + VIEWPORT[1], 2 ** z))
+
+        prefetches = []
+        if z < MAX_ZOOM:
+            prefetches = [asyncio.create_task(__fetch_tile(host, port, fractal_name, (z + 1, 2 * x + i, 2 * y + j),
+                                                           results, prefetch=True))
+                          for i in (0, 1) for j in (0, 1)]
+
+        await asyncio.gather(*(__fetch_tile(host, port, fractal_name, (z, column, row), results)
+                               for column in columns for row in rows))
+
+        for prefetch in prefetches:
+            if not prefetch.done():
+                prefetch.cancel()
+                results.aborted += 1
+        await asyncio.gather(*prefetches, return_exceptions=True)
+
+        (dx, dy, dz), = rng.choices([move for move, _ in MOVES], [weight for _, weight in MOVES])
+        if dz > 0 and z < LOAD_ZOOMS[1]:
+            z, x, y = z + 1, 2 * x + rng.randrange(2), 2 * y + rng.randrange(2)
+        elif dz < 0 and z > LOAD_ZOOMS[0]:
+            z, x, y = z - 1, x // 2, y // 2
+        else:
+            x = min(max(x + dx, 0), 2 ** z - 1)
+            y = min(max(y + dy, 0), 2 ** z - 1)
+
+
+async def generate_load(host, port, fractal_name="mandelbrot", clients=8, seconds=10.0, seed=0):
+    """
+    Explore a fractal with concurrent clients for a duration
+
+    Args:
+        host: Address of the server
+        port: Port of the server
+        fractal_name: Name of the fractal, one of fractals.tileserver.TILE_FRACTALS
+        clients: Number of concurrent clients
+        seconds: Duration of the load, clients finish their current move after it
+        seed: Seed of the random walks of the clients
+
+    Returns:
+        Results of the load
+    """
+
+    results = LoadResults()
+    start = time.perf_counter()
+
+    await asyncio.gather(*(__client(host, port, fractal_name, random.Random(seed * clients + client), start + seconds,
+                                    results)
+                           for client in range(clients)))
+
+    results.seconds = time.perf_counter() - start
+
+    return results
+
+
+async def benchmark_server(settings: TileSettings = TileSettings(), workers=None, cache_directory=None,
+                           fractal_name="mandelbrot", clients=8, seconds=10.0, seed=0):
+    """
+    Start a tile server on a free local port and measure it under the load of concurrent clients
+
+    Args:
+        settings: Settings of the tiles
+        workers: Number of worker processes of the server, defaults to one per core
+        cache_directory: Directory of the disk tier of the tile caches of the workers, or None for memory only
+        fractal_name: Name of the fractal, one of fractals.tileserver.TILE_FRACTALS
+        clients: Number of concurrent clients
+        seconds: Duration of the load
+        seed: Seed of the random walks of the clients
+
+    Returns:
+        Results of the load and statistics of the server
+    """
+
+    server = TileServer(settings, workers, cache_directory)
+    await server.start("127.0.0.1", 0)
+
+    try:
+        results = await generate_load("127.0.0.1", server.port, fractal_name, clients, seconds, seed)
+    finally:
+        await server.close()
+
+    return results, server.statistics
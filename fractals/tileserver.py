@@ -0,0 +1,536 @@
+"""
+Contains the tile server, an asyncio HTTP server of the PNG tiles of escape-time fractals in the z/x/y scheme of web map
+viewers, and the page of a viewer. Tiles are computed by a pool of worker processes, each with a single numba thread and
+a tile cache whose disk tier is shared by all workers, see fractals.tilecache.
+
+Requests for a tile already queued or being computed wait for the same job instead of computing it again. Jobs of
+visible tiles are started before jobs of prefetched tiles, which are requested with ?prefetch=1, and among jobs of the
+same priority the most recent are started first, as viewers request the tiles they need now last. When every client
+waiting for a tile disconnects, e.g. as a viewer aborts the requests of tiles that were panned out of view, its job is
+cancelled unless it already started.
+"""
+
+import asyncio
+import functools
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field as dataclass_field
+
+from fractals.common import Plane2d, ComplexPlane, HsvColor
+
+# Width and height in pixels of tiles
+TILE_SIZE = 256
+
+# Part of the complex plane covered by the single tile of zoom 0 of each fractal, rows from top to bottom as in the
+# images of the CLIs
+TILE_FRACTALS = {"mandelbrot": ComplexPlane(-2.5, 1.5, -2.0, 2.0),
+                 "julia": ComplexPlane(-2.0, 2.0, -2.0, 2.0),
+                 "burningship": ComplexPlane(-2.3, 1.3, -2.4, 1.2)}
+
+# Deepest zoom, beyond which pixels are too close together for float64
+MAX_ZOOM = 40
+
+# Priorities of jobs, lowest first
+VISIBLE = 0
+PREFETCH = 1
+
+# Number of PNG tiles kept in the memory of the server, so that tiles requested again are served without a worker
+RESPONSE_CACHE_TILES = 4096
+
+# zlib level of the PNG tiles, low as tiles are compressed on every miss
+TILE_COMPRESSION_LEVEL = 1
+
+# Max size in bytes of the tile cache of each worker
+WORKER_CACHE_BYTES = 64 * 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+@dataclass(frozen=True)
+class TileSettings:
+    max_iterations: int = 500
+    # Max iterations added per zoom level, as deeper tiles need more iterations to resolve the boundary
+    iterations_per_zoom: int = 0
+    hsv_color: HsvColor = dataclass_field(default_factory=HsvColor)
+    cx: float = -0.4
+    cy: float = 0.6
+    periodicity_tolerance: float = 0.0
+    backend: str = "numba"
+
+
+@dataclass
+class ServerStatistics:
+    requests: int = 0
+    # Requests served from the PNG tiles in memory, or by waiting for a job of another request
+    response_hits: int = 0
+    coalesced: int = 0
+    computed: int = 0
+    cancelled: int = 0
+    errors: int = 0
+
+
+def tile_complex_plane(fractal_name, z, x, y):
+    """
+    Get the part of the complex plane covered by a tile
+
+    Args:
+        fractal_name: Name of the fractal, one of TILE_FRACTALS
+        z: Zoom level, the fractal is covered by 2^z x 2^z tiles
+        x: Column of the tile, from the left
+        y: Row of the tile, from the top
+
+    Returns:
+        Part of the complex plane covered by the tile
+    """
+
+    world = TILE_FRACTALS[fractal_name]
+    tiles = 2 ** z
+    width = (world.real_end - world.real_begin) / tiles
+    height = (world.imag_end - world.imag_begin) / tiles
+
+    return ComplexPlane(world.real_begin + x * width, world.real_begin + (x + 1) * width,
+                        world.imag_begin + y * height, world.imag_begin + (y + 1) * height)
+
+
+def parse_tile_path(path):
+    """
+    Parse the path of a tile, /<fractal>/<z>/<x>/<y>.png
+
+    Args:
+        path: Path of the request, without the query
+
+    Returns:
+        Tuple (fractal name, z, x, y), or None when the path is not the path of a tile
+    """
+
+    parts = path.strip("/").split("/")
+    if len(parts) != 4 or parts[0] not in TILE_FRACTALS or not parts[3].endswith(".png"):
+        return None
+
+    try:
+        z, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-len(".png")])
+    except ValueError:
+        return None
+
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        return None
+
+    return parts[0], z, x, y
+
+
+# Tile cache of the worker process, created by init_worker
+__worker_cache = None
+
+
+def init_worker(cache_directory):
+    """
+    Create the tile cache of a worker process. Workers ignore interruptions, which the server handles by stopping
+    them.
+
+    Args:
+        cache_directory: Directory of the disk tier of the tile cache, or None for memory only
+    """
+
+    from fractals.tilecache import TileCache
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    global __worker_cache
+    __worker_cache = TileCache(WORKER_CACHE_BYTES, cache_directory)
+
+
+def render_tile(settings: TileSettings, fractal_name, z, x, y, cache=None):
+    """
+    Compute and encode a tile. Runs in the worker processes of the server, whose tile cache is used when no cache is
+    given.
+
+    Args:
+        settings: Settings of the tiles
+        fractal_name: Name of the fractal, one of TILE_FRACTALS
+        z: Zoom level
+        x: Column of the tile
+        y: Row of the tile
+        cache: Tile cache of the fields of tiles, see fractals.tilecache, or None
+
+    Returns:
+        Bytes of the PNG tile
+    """
+
+    from fractals.BurningShip import BurningShip
+    from fractals.Julia import Julia
+    from fractals.Mandelbrot import Mandelbrot
+    from fractals.backends import get_backend, ESCAPE_TIME
+    from fractals.kernels.common import MANDELBROT, JULIA, BURNING_SHIP
+    from fractals.tilecache import tile_key
+    from fractals.writers import encode_png
+
+    cache = cache if cache is not None else __worker_cache
+
+    plane = Plane2d(TILE_SIZE, TILE_SIZE)
+    complex_plane = tile_complex_plane(fractal_name, z, x, y)
+    max_iterations = settings.max_iterations + settings.iterations_per_zoom * z
+    # A single thread per worker, as the workers already use every core
+    backend = get_backend(settings.backend, ESCAPE_TIME, threads=1)
+
+    # Keys have the parameters of the keys of the compute_cached_field methods of the fractals
+    key = functools.partial(tile_key, complex_plane=complex_plane, plane=plane, max_iterations=max_iterations,
+                            periodicity_tolerance=settings.periodicity_tolerance, engine="brute-force",
+                            backend=backend.name)
+
+    if fractal_name == "julia":
+        fractal = Julia(plane, complex_plane, max_iterations, settings.hsv_color, settings.cx, settings.cy)
+        key = key(JULIA, cx=settings.cx, cy=settings.cy)
+    elif fractal_name == "burningship":
+        fractal = BurningShip(plane, complex_plane, max_iterations, settings.hsv_color)
+        key = key(BURNING_SHIP)
+    else:
+        fractal = Mandelbrot(plane, complex_plane, max_iterations, settings.hsv_color)
+        key = key(MANDELBROT)
+
+    compute_field = functools.partial(fractal.compute_field, backend, settings.periodicity_tolerance)
+
+    field = cache.get_or_compute(key, compute_field) if cache is not None else compute_field()
+
+    return encode_png(fractal.colorize(field), TILE_COMPRESSION_LEVEL)
+
+
+def warmup_worker(settings: TileSettings):
+    """
+    Load the kernels of every fractal in a worker process, by rendering the tile of zoom 0 of each fractal
+
+    Args:
+        settings: Settings of the tiles
+    """
+
+    for fractal_name in TILE_FRACTALS:
+        render_tile(settings, fractal_name, 0, 0, 0)
+
+
+@dataclass
+class TileJob:
+    tile: tuple
+    priority: int
+    future: asyncio.Future
+    waiters: int = 0
+    started: bool = False
+
+
+class TileServer:
+    """
+    HTTP server of the tiles of the fractals, see the module. Serves:
+    - /: the page of a viewer
+    - /<fractal>/<z>/<x>/<y>.png: a tile, a prefetched tile with ?prefetch=1
+    - /stats: the statistics of the server as JSON
+    """
+
+    @property
+    def statistics(self) -> ServerStatistics:
+        return self._statistics
+
+    @property
+    def port(self):
+        return self._port
+
+    def __init__(self, settings: TileSettings = TileSettings(), workers=None, cache_directory=None):
+        """
+        Args:
+            settings: Settings of the tiles
+            workers: Number of worker processes, defaults to one per core
+            cache_directory: Directory of the disk tier of the tile caches of the workers, or None for memory only
+        """
+
+        self._settings = settings
+        self._workers = workers or os.cpu_count()
+        self._cache_directory = cache_directory
+        self._statistics = ServerStatistics()
+        self._responses = OrderedDict()
+        self._jobs = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._ready = None
+        self._executor = None
+        self._dispatchers = []
+        self._server = None
+        self._port = None
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """
+        Start and warm up the worker processes, and listen.
+
+        Args:
+            host: Address to listen on
+            port: Port to listen on, 0 for any free port
+        """
+
+        loop = asyncio.get_running_loop()
+
+        self._executor = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=init_worker, initargs=(self._cache_directory,))
+
+        # Workers are started on demand, so each warmup, which blocks a worker, starts the next one
+        await asyncio.gather(*(loop.run_in_executor(self._executor, warmup_worker, self._settings)
+                               for _ in range(self._workers)))
+
+        self._ready = asyncio.Condition()
+        self._dispatchers = [asyncio.create_task(self.__dispatch()) for _ in range(self._workers)]
+        self._server = await asyncio.start_server(self.__handle_connection, host, port)
+        self._port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Stop listening, cancel the jobs that did not start and stop the worker processes.
+        """
+
+        self._server.close()
+        await self._server.wait_closed()
+
+        for dispatcher in self._dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    async def tile(self, fractal_name, z, x, y, priority=VISIBLE):
+        """
+        Get a PNG tile, from the tiles in memory, from the job of another request of the tile, or from a new job.
+
+        Args:
+            fractal_name: Name of the fractal, one of TILE_FRACTALS
+            z: Zoom level
+            x: Column of the tile
+            y: Row of the tile
+            priority: VISIBLE or PREFETCH
+
+        Returns:
+            Bytes of the PNG tile
+        """
+
+        tile = (fractal_name, z, x, y)
+        self._statistics.requests += 1
+
+        response = self._responses.get(tile)
+        if response is not None:
+            self._responses.move_to_end(tile)
+            self._statistics.response_hits += 1
+            return response
+
+        job = self._jobs.get(tile)
+        if job is None:
+            job = TileJob(tile, priority, asyncio.get_running_loop().create_future())
+            # Errors of jobs whose clients all disconnected are not retrieved otherwise
+            job.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+            self._jobs[tile] = job
+            await self.__enqueue(job)
+        else:
+            self._statistics.coalesced += 1
+
+            if priority < job.priority and not job.started:
+                # Prefetched tiles that become visible move to the queue of visible tiles
+                job.priority = priority
+                await self.__enqueue(job)
+
+        job.waiters += 1
+        try:
+            # Shielded, so that the job survives the cancellation of one of its requests
+            return await asyncio.shield(job.future)
+        finally:
+            job.waiters -= 1
+
+    async def __enqueue(self, job):
+        async with self._ready:
+            # Entries of jobs whose priority changed are left in the queue, and skipped when popped
+            heapq.heappush(self._queue, (job.priority, -next(self._sequence), job))
+            self._ready.notify()
+
+    async def __next_job(self):
+        async with self._ready:
+            while True:
+                await self._ready.wait_for(lambda: self._queue)
+                priority, _, job = heapq.heappop(self._queue)
+
+                if job.started or priority != job.priority:
+                    continue
+
+                if job.waiters == 0:
+                    self._statistics.cancelled += 1
+                    del self._jobs[job.tile]
+                    job.future.cancel()
+                    continue
+
+                job.started = True
+                return job
+
+    async def __dispatch(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job = await self.__next_job()
+
+            try:
+                response = await loop.run_in_executor(self._executor, render_tile, self._settings, *job.tile)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as error:
+                self._statistics.errors += 1
+                job.future.set_exception(error)
+            else:
+                self._statistics.computed += 1
+                self.__add_response(job.tile, response)
+                job.future.set_result(response)
+            finally:
+                del self._jobs[job.tile]
+
+    def __add_response(self, tile, response):
+        self._responses[tile] = response
+
+        while len(self._responses) > RESPONSE_CACHE_TILES:
+            self._responses.popitem(last=False)
+
+    async def __handle_connection(self, reader, writer):
+        # First byte of the next request, when a client sends it while a tile is computed
+        pending = b""
+
+        try:
+            while True:
+                try:
+                    head = pending + await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    return
+
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ")
+                except ValueError:
+                    await self.__write_response(writer, 400, "text/plain", b"Bad request\n", close=True)
+                    return
+
+                headers = {name.strip().lower(): value.strip()
+                           for name, _, value in (line.partition(":") for line in header_lines if line)}
+                close = (headers.get("connection", "").lower() == "close" or
+                         (version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive"))
+
+                response, pending = await self.__respond(method, target, reader)
+                if response is None:
+                    # The client disconnected while its tile was computed
+                    return
+
+                await self.__write_response(writer, *response, close=close)
+                if close:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def __respond(self, method, target, reader):
+        url = urllib.parse.urlsplit(target)
+
+        if method != "GET":
+            return (405, "text/plain", b"Method not allowed\n"), b""
+
+        if url.path == "/":
+            return (200, "text/html; charset=utf-8", VIEWER_PAGE.encode()), b""
+
+        if url.path == "/stats":
+            return (200, "application/json", json.dumps(self._statistics.__dict__).encode()), b""
+
+        tile = parse_tile_path(url.path)
+        if tile is None:
+            return (404, "text/plain", b"Not found\n"), b""
+
+        query = urllib.parse.parse_qs(url.query)
+        priority = PREFETCH if query.get("prefetch", ["0"])[0] not in ("", "0") else VISIBLE
+
+        # A disconnection is an empty read. Clients may also send their next request before the response.
+        tile_task = asyncio.ensure_future(self.tile(*tile, priority=priority))
+        read_task = asyncio.ensure_future(reader.read(1))
+        await asyncio.wait((tile_task, read_task), return_when=asyncio.FIRST_COMPLETED)
+
+        pending = b""
+        if read_task.done():
+            pending = read_task.result()
+
+            if not pending:
+                tile_task.cancel()
+                await asyncio.gather(tile_task, return_exceptions=True)
+                return None, b""
+        else:
+            read_task.cancel()
+            await asyncio.gather(read_task, return_exceptions=True)
+
+            if read_task.done() and not read_task.cancelled():
+                pending = read_task.result()
+
+        try:
+            return (200, "image/png", await tile_task), pending
+        except Exception as error:
+            return (500, "text/plain", f"{type(error).__name__}: {error}\n".encode()), pending
+
+    @staticmethod
+    async def __write_response(writer, status, content_type, body, close=False):
+        headers = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                   f"Content-Type: {content_type}\r\n"
+                   f"Content-Length: {len(body)}\r\n"
+                   f"Cache-Control: {'max-age=86400' if status == 200 else 'no-store'}\r\n"
+                   f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+
+        writer.write(headers.encode("latin-1") + body)
+        await writer.drain()
+
+
+# Page of the viewer, with Leaflet. Tiles of the next zoom level around the view are prefetched after each move, and
+# the prefetches of the previous move are aborted.
+VIEWER_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>FractalGen</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; background: #000; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+const fractals = ["mandelbrot", "julia", "burningship"];
+const map = L.map("map", {crs: L.CRS.Simple, minZoom: 0, maxZoom: 40, zoomSnap: 1}).setView([-128, 128], 1);
+const layers = {};
+for (const name of fractals) {
+    layers[name] = L.tileLayer("/" + name + "/{z}/{x}/{y}.png", {tileSize: 256, noWrap: true, maxZoom: 40,
+                                                                 bounds: [[0, 0], [-256, 256]]});
+}
+layers.mandelbrot.addTo(map);
+L.control.layers(layers).addTo(map);
+
+let current = "mandelbrot";
+map.on("baselayerchange", (event) => { current = fractals.find((name) => layers[name] === event.layer); });
+
+let prefetches = new AbortController();
+map.on("moveend", () => {
+    prefetches.abort();
+    prefetches = new AbortController();
+
+    const zoom = map.getZoom() + 1;
+    const bounds = map.getPixelBounds();
+    const scale = 2 / 256;
+    for (let x = Math.floor(bounds.min.x * scale); x <= Math.floor(bounds.max.x * scale); x++) {
+        for (let y = Math.floor(bounds.min.y * scale); y <= Math.floor(bounds.max.y * scale); y++) {
+            if (x >= 0 && y >= 0 && x < 2 ** zoom && y < 2 ** zoom && zoom <= 40) {
+                fetch("/" + current + "/" + zoom + "/" + x + "/" + y + ".png?prefetch=1",
+                      {signal: prefetches.signal}).catch(() => {});
+            }
+        }
+    }
+});
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,56 @@
+"""
+Contains the tiled renderer, which computes images of escape-time fractals one tile at a time and streams the tiles to
+an image writer, so that the memory used does not depend on the size of the image
+"""
+
+from fractals.common import Plane2d, Tile, timed
+
+# Width and height in pixels of tiles
+TILE_SIZE = 512
+
+
+def tiles(plane: Plane2d, tile_size=TILE_SIZE):
+    """
+    Split an image into tiles, in row order. Tiles on the right and bottom edges are smaller when the size of the
+    image is not a multiple of the tile size.
+
+    Args:
+        plane: Size of the image
+        tile_size: Width and height in pixels of tiles
+
+    Returns:
+        Generator of tiles
+    """
+
+    for y in range(0, plane.height, tile_size):
+        for x in range(0, plane.width, tile_size):
+            yield Tile(x, y, min(tile_size, plane.width - x), min(tile_size, plane.height - y))
+
+
+def render_tiles(compute_field, colorize, plane: Plane2d, writer, tile_size=TILE_SIZE, timings=None):
+    """
+    Render an image one tile at a time and write the tiles in row order.
+
+    Args:
+        compute_field: Function that computes the field of smooth iteration counts of a tile, given as the tile
+                       keyword argument
+        colorize: Function that maps a field to RGB pixels of shape [height, width, 3]
+        plane: Size of the image
+        writer: Image writer, see fractals.writers
+        tile_size: Width and height in pixels of tiles
+        timings: Dictionary receiving the seconds spent computing, colorizing and encoding tiles, or None
+    """
+
+    if timings is None:
+        timings = {}
+
+    for tile in tiles(plane, tile_size):
+        with timed(timings, "Compute"):
+            field = compute_field(tile=tile)
+
+        with timed(timings, "Colorize"):
+            pixels = colorize(field)
+
+        # Writers may compress in other threads, this is the time spent waiting for them
+        with timed(timings, "Encode"):
+            writer.write_tile(tile, pixels)
@@ -0,0 +1,72 @@
+"""
+Contains the warmup, which compiles the kernels of every fractal before any render, so that their machine code is in
+the on-disk cache of Numba when renders start. The cache is next to the kernels in __pycache__, or in NUMBA_CACHE_DIR
+when it is set, e.g. to bake it into deployment images.
+"""
+
+import time
+
+from fractals.Buddhabrot import Buddhabrot, SAMPLING_MODES
+from fractals.BurningShip import BurningShip
+from fractals.Julia import Julia
+from fractals.Mandelbrot import Mandelbrot
+from fractals.common import Plane2d, ComplexPlane, HsvColor, DeepZoomView, ENGINES
+
+# Size of the images rendered to compile the kernels
+WARMUP_PLANE = Plane2d(16, 16)
+
+
+def warmup(use_gpu=False):
+    """
+    Compile the kernels of every fractal, engine and sampling mode by rendering tiny images. Kernels are compiled for
+    the types of their arguments, so arguments have the types passed by the CLIs. The kernels of the numpy backend
+    need no compilation.
+
+    Args:
+        use_gpu: Whether to also compile the CUDA kernels
+
+    Returns:
+        Seconds spent compiling (or loading from the cache) the kernels of each fractal, by name of fractal
+    """
+
+    complex_plane = ComplexPlane(-2.2, 1.2, -1.2, 1.2)
+    hsv_color = HsvColor(204, 0.64, 2.0)
+    view = DeepZoomView("-0.5", "0", "1")
+    timings = {}
+
+    for name, fractal in (("Mandelbrot", Mandelbrot(WARMUP_PLANE, complex_plane, 50, hsv_color)),
+                          ("Julia", Julia(WARMUP_PLANE, complex_plane, 50, hsv_color, -0.4, 0.6)),
+                          ("Burning Ship", BurningShip(WARMUP_PLANE, complex_plane, 50, hsv_color))):
+        start = time.perf_counter()
+
+        for engine in ENGINES:
+            fractal.colorize(fractal.compute_field("numba", periodicity_tolerance=1e-10, engine=engine))
+
+        fractal.refine_field(0, "numba", periodicity_tolerance=1e-10)
+        fractal.anti_alias(fractal.compute_field("numba"), "numba", periodicity_tolerance=1e-10)
+
+        if hasattr(fractal, "compute_deep_zoom_field"):
+            fractal.compute_deep_zoom_field(view, "numba")
+
+        if use_gpu:
+            fractal.compute_field("cuda", periodicity_tolerance=1e-10)
+
+            if hasattr(fractal, "compute_deep_zoom_field"):
+                fractal.compute_deep_zoom_field(view, "cuda")
+
+        timings[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    for channel_iterations in (None, [50, 20, 10]):
+        buddhabrot = Buddhabrot(WARMUP_PLANE, complex_plane, 50, hsv_color, channel_iterations)
+
+        for sampling in SAMPLING_MODES:
+            buddhabrot.compute(total_samples=100, sampling=sampling, warmup_samples=10)
+
+            if use_gpu:
+                buddhabrot.compute_gpu(samples_per_thread=1, sampling=sampling, warmup_samples=10)
+
+    timings["Buddhabrot"] = time.perf_counter() - start
+
+    return timings
@@ -0,0 +1,424 @@
+"""
+Contains image writers, which receive the tiles of an image in row order and write them to a file without holding the
+whole image in memory
+"""
+
+import collections
+import math
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from fractals.common import Plane2d, Tile, image_rgb_from_rows
+
+# Formats that images can be streamed to: PNG compressed by several threads, uncompressed tiled TIFF, and
+# uncompressed row-major RGB as a .npy array or as raw bytes without a header
+FORMATS = ("png", "tiff", "npy", "raw")
+
+# Formats of the extensions of output image files
+EXTENSION_FORMATS = {".png": "png", ".tif": "tiff", ".tiff": "tiff", ".npy": "npy", ".raw": "raw"}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Approximate number of bytes of the strips of rows compressed by the threads of the PNG writer
+PNG_STRIP_SIZE = 1 << 20
+
+# Width and height in pixels of the tiles of TIFF images, which must be multiples of 16
+TIFF_TILE_SIZE = 256
+
+# TIFF field types
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_LONG8 = 16
+
+
+class PngStreamWriter:
+    """
+    Writes an 8-bit RGB PNG image. PNG stores rows from top to bottom in a single compressed stream, so the tiles of a
+    row of tiles are gathered into a band, which is filtered and compressed once the row is complete.
+
+    Bands are split into strips that a pool of threads filters and compresses concurrently. Each strip is a deflate
+    stream flushed to a byte boundary without a final block, so that the strips concatenate into a single stream.
+    """
+
+    def __init__(self, path, plane: Plane2d, compression_level=6, threads=None):
+        self._plane = plane
+        self._file = open(path, "wb")
+        self._compression_level = compression_level
+        self._threads = threads or os.cpu_count()
+        self._executor = ThreadPoolExecutor(max_workers=self._threads)
+        self._pending = collections.deque()
+        self._adler = 1
+        self._band = None
+
+        self._file.write(PNG_SIGNATURE)
+        # Bit depth 8, color type 2 (RGB), default compression, filtering and no interlacing
+        self.__write_chunk(b"IHDR", struct.pack(">IIBBBBB", plane.width, plane.height, 8, 2, 0, 0, 0))
+        # zlib header of a deflate stream with a 32K window
+        self.__write_chunk(b"IDAT", b"\x78\x9c")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    @staticmethod
+    def __compress_strip(rows, compression_level):
+        scanlines = np.empty([rows.shape[0], 1 + rows.shape[1] * 3], dtype=np.uint8)
+        filtered = scanlines[:, 1:].reshape(rows.shape)
+
+        # Each scanline starts with its filter type, Sub (1) stores the difference with the pixel on the left
+        scanlines[:, 0] = 1
+        filtered[:, 0] = rows[:, 0]
+        np.subtract(rows[:, 1:], rows[:, :-1], out=filtered[:, 1:])
+
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = compressor.compress(scanlines) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        return data, zlib.adler32(scanlines), scanlines.nbytes
+
+    def __write_strip(self):
+        data, adler, length = self._pending.popleft().result()
+
+        self._adler = adler32_combine(self._adler, adler, length)
+        self.__write_chunk(b"IDAT", data)
+
+    def __write_rows(self, rows):
+        strip_rows = max(PNG_STRIP_SIZE // (1 + rows.shape[1] * 3), 1)
+
+        for start in range(0, rows.shape[0], strip_rows):
+            self._pending.append(self._executor.submit(self.__compress_strip, rows[start:start + strip_rows],
+                                                       self._compression_level))
+
+            # Strips are written in order, with a bounded number of strips in flight
+            while self._pending and (self._pending[0].done() or len(self._pending) > 2 * self._threads):
+                self.__write_strip()
+
+    def write_tile(self, tile, rows):
+        """
+        Write a tile. Tiles must be written in row order.
+
+        Args:
+            tile: Position and size of the tile
+            rows: Array of RGB pixels of the tile, of shape [height, width, 3]
+        """
+
+        if tile.width == self._plane.width:
+            # Tiles as wide as the image are compressed without being copied to a band
+            self.__write_rows(rows)
+            return
+
+        if tile.x == 0:
+            self._band = np.empty([tile.height, self._plane.width, 3], dtype=np.uint8)
+
+        self._band[:, tile.x:tile.x + tile.width] = rows
+
+        if tile.x + tile.width == self._plane.width:
+            self.__write_rows(self._band)
+            self._band = None
+
+    def close(self):
+        """
+        Finish the compressed stream and close the file.
+        """
+
+        if self._file.closed:
+            return
+
+        while self._pending:
+            self.__write_strip()
+
+        self._executor.shutdown()
+
+        # Empty final deflate block, then the checksum of the uncompressed stream
+        self.__write_chunk(b"IDAT", b"\x03\x00" + struct.pack(">I", self._adler))
+        self.__write_chunk(b"IEND", b"")
+        self._file.close()
+
+
+class TiffTileWriter:
+    """
+    Writes an uncompressed 8-bit RGB tiled TIFF image. The layout of the file only depends on the size of the image,
+    so the tiles are memory-mapped and written in place. Images of 4 GB or more are written as BigTIFF.
+    """
+
+    def __init__(self, path, plane: Plane2d, tile_size=TIFF_TILE_SIZE):
+        self._tile_size = tile_size
+
+        tiles_across = math.ceil(plane.width / tile_size)
+        tiles_down = math.ceil(plane.height / tile_size)
+        header, data_offset = self.__header(plane, tile_size, tiles_across * tiles_down)
+
+        with open(path, "wb") as file:
+            file.write(header)
+            file.truncate(data_offset + tiles_across * tiles_down * tile_size * tile_size * 3)
+
+        self._tiles = np.memmap(path, dtype=np.uint8, mode="r+", offset=data_offset,
+                                shape=(tiles_down, tiles_across, tile_size, tile_size, 3))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def __header(plane, tile_size, tile_count):
+        # Header, then the image file directory and the values of its entries that do not fit in them, then the tiles
+        tile_bytes = tile_size * tile_size * 3
+        big_tiff = tile_count * tile_bytes + 16 * tile_count + 1024 >= 1 << 32
+
+        if big_tiff:
+            header_size, count_format, entry_format, offset_format, offset_type = 16, "<Q", "<HHQ", "<Q", TIFF_LONG8
+        else:
+            header_size, count_format, entry_format, offset_format, offset_type = 8, "<H", "<HHI", "<I", TIFF_LONG
+
+        value_formats = {TIFF_SHORT: "H", TIFF_LONG: "I", TIFF_LONG8: "Q"}
+        inline_size = struct.calcsize(offset_format)
+
+        entries = [(256, TIFF_LONG, [plane.width]),
+                   (257, TIFF_LONG, [plane.height]),
+                   (258, TIFF_SHORT, [8, 8, 8]),
+                   (259, TIFF_SHORT, [1]),
+                   (262, TIFF_SHORT, [2]),
+                   (277, TIFF_SHORT, [3]),
+                   (284, TIFF_SHORT, [1]),
+                   (322, TIFF_LONG, [tile_size]),
+                   (323, TIFF_LONG, [tile_size]),
+                   (324, offset_type, [0] * tile_count),
+                   (325, offset_type, [tile_bytes] * tile_count)]
+
+        ifd_size = (struct.calcsize(count_format) + len(entries) * (struct.calcsize(entry_format) + inline_size) +
+                    inline_size)
+        values_size = sum(len(values) * struct.calcsize(value_formats[value_type])
+                          for _, value_type, values in entries
+                          if len(values) * struct.calcsize(value_formats[value_type]) > inline_size)
+        data_offset = (header_size + ifd_size + values_size + 15) // 16 * 16
+
+        # Tile offsets
+        entries[9] = (324, offset_type, [data_offset + index * tile_bytes for index in range(tile_count)])
+
+        if big_tiff:
+            header = b"II" + struct.pack("<HHHQ", 43, 8, 0, header_size)
+        else:
+            header = b"II" + struct.pack("<HI", 42, header_size)
+
+        ifd = struct.pack(count_format, len(entries))
+        values_offset = header_size + ifd_size
+        values = b""
+
+        for tag, value_type, entry_values in entries:
+            data = struct.pack(f"<{len(entry_values)}{value_formats[value_type]}", *entry_values)
+            ifd += struct.pack(entry_format, tag, value_type, len(entry_values))
+
+            if len(data) <= inline_size:
+                ifd += data.ljust(inline_size, b"\0")
+            else:
+                ifd += struct.pack(offset_format, values_offset + len(values))
+                values += data
+
+        # No next image file directory
+        ifd += struct.pack(offset_format, 0)
+
+        return (header + ifd + values).ljust(data_offset, b"\0"), data_offset
+
+    def write_tile(self, tile, rows):
+        """
+        Write a tile into the TIFF tiles it overlaps.
+
+        Args:
+            tile: Position and size of the tile
+            rows: Array of RGB pixels of the tile, of shape [height, width, 3]
+        """
+
+        size = self._tile_size
+
+        for tiff_y in range(tile.y // size, (tile.y + tile.height - 1) // size + 1):
+            for tiff_x in range(tile.x // size, (tile.x + tile.width - 1) // size + 1):
+                # Overlap of the tile and the TIFF tile, in pixels of the image
+                y_start = max(tile.y, tiff_y * size)
+                y_end = min(tile.y + tile.height, (tiff_y + 1) * size)
+                x_start = max(tile.x, tiff_x * size)
+                x_end = min(tile.x + tile.width, (tiff_x + 1) * size)
+
+                tiff_tile = self._tiles[tiff_y, tiff_x, :y_end - tiff_y * size, :x_end - tiff_x * size]
+                tiff_tile[y_start - tiff_y * size:, x_start - tiff_x * size:] = rows[y_start - tile.y:y_end - tile.y,
+                                                                                     x_start - tile.x:x_end - tile.x]
+
+    def close(self):
+        """
+        Flush the image to the file.
+        """
+
+        if self._tiles is None:
+            return
+
+        self._tiles.flush()
+        self._tiles = None
+
+
+class NpyStreamWriter:
+    """
+    Writes an RGB image to a memory-mapped .npy array of shape [height, width, 3], or to a raw file of the same bytes
+    without a header, so that each tile is written in place and paged out by the operating system.
+    """
+
+    def __init__(self, path, plane: Plane2d, raw=False):
+        shape = (plane.height, plane.width, 3)
+
+        if raw:
+            self._image = np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
+        else:
+            self._image = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_tile(self, tile, rows):
+        """
+        Write a tile.
+
+        Args:
+            tile: Position and size of the tile
+            rows: Array of RGB pixels of the tile, of shape [height, width, 3]
+        """
+
+        self._image[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width] = rows
+
+    def close(self):
+        """
+        Flush the image to the file.
+        """
+
+        if self._image is None:
+            return
+
+        self._image.flush()
+        self._image = None
+
+
+def adler32_combine(adler1, adler2, length2):
+    """
+    Compute the Adler-32 checksum of two concatenated sequences of bytes from their checksums, like the
+    adler32_combine of zlib, which Python does not expose.
+
+    Args:
+        adler1: Checksum of the first sequence
+        adler2: Checksum of the second sequence
+        length2: Length of the second sequence
+
+    Returns:
+        Checksum of the concatenation
+    """
+
+    base = 65521
+    sum1 = ((adler1 & 0xffff) + (adler2 & 0xffff) - 1) % base
+    sum2 = ((adler1 >> 16) + (adler2 >> 16) + length2 * ((adler1 & 0xffff) - 1)) % base
+
+    return sum1 | (sum2 << 16)
+
+
+def resolve_format(path, image_format=None):
+    """
+    Find the format an image is written in.
+
+    Args:
+        path: Path of the output image file
+        image_format: One of FORMATS, or None to use the extension of the file, see EXTENSION_FORMATS
+
+    Returns:
+        One of FORMATS, or None for images written with Pillow
+    """
+
+    return image_format or EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def open_writer(path, plane: Plane2d, image_format=None, threads=None):
+    """
+    Open the image writer of a format.
+
+    Args:
+        path: Path of the output image file
+        plane: Size of the image
+        image_format: One of FORMATS, or None to use the extension of the file, see EXTENSION_FORMATS
+        threads: Number of threads compressing PNG images, or None for one per core
+
+    Returns:
+        Image writer
+    """
+
+    image_format = resolve_format(path, image_format)
+
+    if image_format == "png":
+        return PngStreamWriter(path, plane, threads=threads)
+    elif image_format == "tiff":
+        return TiffTileWriter(path, plane)
+    elif image_format in ("npy", "raw"):
+        return NpyStreamWriter(path, plane, raw=image_format == "raw")
+
+    raise ValueError(f"Cannot stream images to {path}, use one of the formats {', '.join(FORMATS)} or the "
+                     f"extensions {', '.join(EXTENSION_FORMATS)}")
+
+
+def save_image(path, pixels, image_format=None, threads=None):
+    """
+    Save an image. Images in one of FORMATS are written straight from the array, other formats go through Pillow.
+
+    Args:
+        path: Path of the output image file
+        pixels: Array of RGB pixels of shape [height, width, 3]
+        image_format: One of FORMATS, or None to use the extension of the file, see EXTENSION_FORMATS
+        threads: Number of threads compressing PNG images, or None for one per core
+    """
+
+    if resolve_format(path, image_format) is None:
+        image_rgb_from_rows(pixels).save(path)
+        return
+
+    plane = Plane2d(pixels.shape[1], pixels.shape[0])
+
+    with open_writer(path, plane, image_format, threads) as writer:
+        writer.write_tile(Tile(0, 0, plane.width, plane.height), pixels)
+
+
+def encode_png(pixels, compression_level=6):
+    """
+    Encode an image as an 8-bit RGB PNG in memory, e.g. to serve it over HTTP. Scanlines use the Sub filter, as in
+    PngStreamWriter.
+
+    Args:
+        pixels: Array of RGB pixels of shape [height, width, 3]
+        compression_level: zlib level of the image data
+
+    Returns:
+        Bytes of the PNG image
+    """
+
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(data,
+                                                                                                zlib.crc32(chunk_type)))
+
+    scanlines = np.empty([pixels.shape[0], 1 + pixels.shape[1] * 3], dtype=np.uint8)
+    filtered = scanlines[:, 1:].reshape(pixels.shape)
+
+    scanlines[:, 0] = 1
+    filtered[:, 0] = pixels[:, 0]
+    np.subtract(pixels[:, 1:], pixels[:, :-1], out=filtered[:, 1:])
+
+    return (PNG_SIGNATURE +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", pixels.shape[1], pixels.shape[0], 8, 2, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(scanlines, compression_level)) +
+            chunk(b"IEND", b""))
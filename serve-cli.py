@@ -0,0 +1,6 @@
+import sys
+
+import fractalgen
+
+if __name__ == '__main__':
+    fractalgen.main(["serve"] + sys.argv[1:])
@@ -0,0 +1,5 @@
+import os
+
+# Run the CUDA kernels on the Numba CUDA simulator unless told otherwise, so that they are tested on hosts without a
+# GPU. This must be set before Numba is imported.
+os.environ.setdefault("NUMBA_ENABLE_CUDASIM", "1")
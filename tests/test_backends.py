@@ -0,0 +1,76 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from fractals.BurningShip import BurningShip
+from fractals.Julia import Julia
+from fractals.Mandelbrot import Mandelbrot
+from fractals.common import Plane2d, ComplexPlane, HsvColor
+from fractals.scaling import create_fractal
+
+PLANE = Plane2d(320, 200)
+HSV_COLOR = HsvColor(204, 0.64, 8.0)
+
+FRACTALS = {
+    "mandelbrot": lambda complex_plane: Mandelbrot(PLANE, complex_plane, 256, HSV_COLOR),
+    "julia": lambda complex_plane: Julia(PLANE, complex_plane, 256, HSV_COLOR, -0.8, 0.156),
+    "burning-ship": lambda complex_plane: BurningShip(PLANE, complex_plane, 256, HSV_COLOR),
+}
+
+VIEWS = {
+    "mandelbrot": [ComplexPlane(-2.2, 1.2, -1.2, 1.2), ComplexPlane(-0.78, -0.72, 0.08, 0.12)],
+    "julia": [ComplexPlane(-1.6, 1.6, -1.0, 1.0), ComplexPlane(-0.4, 0.6, 0.1, 0.7)],
+    "burning-ship": [ComplexPlane(-2.2, 1.2, -1.8, 0.6), ComplexPlane(-1.8, -1.7, -0.08, 0.01)],
+}
+
+
+@pytest.mark.parametrize("periodicity_tolerance", [0.0, 1e-10])
+@pytest.mark.parametrize("name, complex_plane", [(name, view) for name, views in VIEWS.items() for view in views])
+def test_numpy_matches_numba(name, complex_plane, periodicity_tolerance):
+    fractal = FRACTALS[name](complex_plane)
+
+    expected = fractal.compute_field("numba", periodicity_tolerance)
+    field = fractal.compute_field("numpy", periodicity_tolerance)
+
+    np.testing.assert_array_equal(field, expected)
+
+
+# Computes the field of the scaling benchmark with static and balanced chunks on the threading layer of the environment
+THREADING_LAYER_SCRIPT = """
+import sys
+
+import numba
+import numpy as np
+
+from fractals.backends import get_backend, NumbaBackend
+from fractals.common import Plane2d
+from fractals.scaling import create_fractal
+
+fractal = create_fractal("mandelbrot", Plane2d(320, 200), 256)
+for chunk_size in (0, 1):
+    np.save(f"{sys.argv[1]}/{chunk_size}.npy", fractal.compute_field(get_backend(NumbaBackend.name, threads=4,
+                                                                                  chunk_size=chunk_size)))
+
+print(numba.threading_layer())
+"""
+
+
+@pytest.mark.parametrize("threading_layer", ["tbb", "omp", "workqueue"])
+def test_chunks_match_on_threading_layer(threading_layer, tmp_path):
+    # The threading layer is chosen once per process
+    environment = dict(os.environ, NUMBA_THREADING_LAYER=threading_layer, NUMBA_NUM_THREADS="4")
+    result = subprocess.run([sys.executable, "-c", THREADING_LAYER_SCRIPT, str(tmp_path)], env=environment,
+                            cwd=pathlib.Path(__file__).parents[1], capture_output=True, text=True)
+    if "No threading layer could be loaded" in result.stderr:
+        pytest.skip(f"The {threading_layer} threading layer is not installed")
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == [threading_layer]
+
+    expected = create_fractal("mandelbrot", Plane2d(320, 200), 256).compute_field("numba")
+    np.testing.assert_array_equal(np.load(tmp_path / "0.npy"), expected)
+    np.testing.assert_array_equal(np.load(tmp_path / "1.npy"), expected)
@@ -0,0 +1,236 @@
+import numpy as np
+import pytest
+
+import fractals.Buddhabrot
+from fractals.Buddhabrot import Buddhabrot
+from fractals.checkpoint import BuddhabrotCheckpoint
+from fractals.common import Plane2d, ComplexPlane, HsvColor
+from fractals.kernels.buddhabrot import buddhabrot, buddhabrot_binned
+from fractals.kernels.common import in_main_cardioid_or_bulb
+from fractals.kernels.xoroshiro import create_xoroshiro128p_states, xoroshiro128p_uniform_float64
+
+WIDTH = 40
+HEIGHT = 32
+VIEW = (-2.2, 1.2, -1.2, 1.2)
+
+
+def serial_buddhabrot(rng_states, uniform, stream_samples, channel_iterations, mirror, width=WIDTH, height=HEIGHT):
+    """
+    Trace the samples of each RNG stream in turn into a single histogram, one counter at a time
+    """
+
+    re_start, re_end, im_start, im_end = VIEW
+    counters = np.zeros((len(channel_iterations), width, height), dtype=np.uint64)
+    max_iterations = max(channel_iterations)
+
+    def count(x, y, iterations):
+        if 0 < x < width and 0 < y < height:
+            for channel, channel_max_iterations in enumerate(channel_iterations):
+                if iterations < channel_max_iterations:
+                    counters[channel, x, y] += 1
+
+    for stream, samples in enumerate(stream_samples):
+        for _ in range(0, samples):
+            sample_real = uniform(rng_states, stream) * (re_end - re_start) + re_start
+            sample_imag = uniform(rng_states, stream) * (im_end - im_start) + im_start
+            if in_main_cardioid_or_bulb(sample_real, sample_imag):
+                continue
+
+            c = complex(sample_real, sample_imag)
+            z = 0.0j
+            orbit = []
+            while abs(z) < 10.0 and len(orbit) < max_iterations:
+                z = z * z + c
+                orbit.append(z)
+
+            if not 20 < len(orbit) < max_iterations:
+                continue
+
+            for z in orbit:
+                x = int((z.real - re_start) / ((re_end - re_start) / width))
+                count(x, int((z.imag - im_start) / ((im_end - im_start) / height)), len(orbit))
+                if mirror:
+                    count(x, int((-z.imag - im_start) / ((im_end - im_start) / height)), len(orbit))
+
+    return counters
+
+
+@pytest.mark.parametrize("private_histograms", [1, 2, 4])
+@pytest.mark.parametrize("channel_iterations, mirror", [((100,), False), ((30, 60, 100), True)])
+def test_private_histograms_match_serial_reference(private_histograms, channel_iterations, mirror):
+    streams = 4
+    total_samples = 3001
+
+    counters = np.zeros((len(channel_iterations), WIDTH, HEIGHT), dtype=np.uint64)
+    private_counters = np.zeros((private_histograms,) + counters.shape, dtype=np.uint32)
+    rng_states = create_xoroshiro128p_states(streams, 7)
+
+    # Histograms are accumulated across calls, and the private histograms are reused
+    for _ in range(0, 2):
+        buddhabrot(counters, private_counters, rng_states, WIDTH, HEIGHT, np.array(channel_iterations), total_samples,
+                   *VIEW, mirror)
+
+    stream_samples = [2 * ((stream + 1) * total_samples // streams - stream * total_samples // streams)
+                      for stream in range(0, streams)]
+    expected = serial_buddhabrot(create_xoroshiro128p_states(streams, 7), xoroshiro128p_uniform_float64,
+                                 stream_samples, channel_iterations, mirror)
+
+    assert counters.sum() > 0
+    np.testing.assert_array_equal(counters, expected)
+    assert not private_counters.any()
+
+
+@pytest.mark.parametrize("slots, bands, capacity", [(1, 1, 200), (2, 8, 200), (4, 5, 1000)])
+@pytest.mark.parametrize("channel_iterations, mirror", [((100,), False), ((30, 60, 100), True)])
+def test_bins_match_serial_reference(slots, bands, capacity, channel_iterations, mirror):
+    streams = 4
+    total_samples = 3001
+
+    # Small bins take many rounds of tracing and adding bins
+    counters = np.zeros((len(channel_iterations), WIDTH, HEIGHT), dtype=np.uint64)
+    bins = np.empty((slots, bands, capacity), dtype=np.int64)
+    bin_counts = np.zeros((slots, bands), dtype=np.int64)
+    rng_states = create_xoroshiro128p_states(streams, 7)
+
+    for _ in range(0, 2):
+        buddhabrot_binned(counters, bins, bin_counts, rng_states, WIDTH, HEIGHT, np.array(channel_iterations),
+                          total_samples, *VIEW, mirror)
+
+    stream_samples = [2 * ((stream + 1) * total_samples // streams - stream * total_samples // streams)
+                      for stream in range(0, streams)]
+    expected = serial_buddhabrot(create_xoroshiro128p_states(streams, 7), xoroshiro128p_uniform_float64,
+                                 stream_samples, channel_iterations, mirror)
+
+    assert counters.sum() > 0
+    np.testing.assert_array_equal(counters, expected)
+    assert not bin_counts.any()
+
+
+# The simulator draws random numbers with NumPy scalars, which warn when the xoroshiro128+ arithmetic wraps around
+@pytest.mark.filterwarnings("ignore::RuntimeWarning", "ignore::numba.NumbaWarning")
+def test_cuda_matches_serial_reference():
+    from numba import cuda
+    from numba.cuda.random import create_xoroshiro128p_states as create_cuda_states, xoroshiro128p_uniform_float32
+
+    from fractals.kernels.cuda.buddhabrot import buddhabrot_cuda
+
+    if not cuda.is_available():
+        pytest.skip("CUDA is not available, and the CUDA simulator is disabled")
+
+    blocks, threads_per_block, samples_per_thread = 2, 8, 12
+    channel_iterations = (30, 60, 100)
+
+    rng_states = create_cuda_states(blocks * threads_per_block, seed=11)
+    initial_rng_states = rng_states.copy_to_host()
+
+    device_counters = cuda.to_device(np.zeros((len(channel_iterations), WIDTH, HEIGHT), dtype=np.uint64))
+    buddhabrot_cuda[blocks, threads_per_block](device_counters, rng_states, WIDTH, HEIGHT,
+                                               np.array(channel_iterations), samples_per_thread, *VIEW, True)
+
+    expected = serial_buddhabrot(initial_rng_states, xoroshiro128p_uniform_float32,
+                                 [samples_per_thread] * (blocks * threads_per_block), channel_iterations, True)
+
+    assert expected.sum() > 0
+    np.testing.assert_array_equal(device_counters.copy_to_host(), expected)
+
+
+# The simulator draws random numbers with NumPy scalars, which warn when the xoroshiro128+ arithmetic wraps around
+@pytest.mark.filterwarnings("ignore::RuntimeWarning", "ignore::numba.NumbaWarning")
+def test_cuda_counts_colliding_hits():
+    from numba import cuda
+    from numba.cuda.random import create_xoroshiro128p_states as create_cuda_states, xoroshiro128p_uniform_float32
+
+    from fractals.kernels.cuda.buddhabrot import buddhabrot_cuda
+
+    if not cuda.is_available():
+        pytest.skip("CUDA is not available, and the CUDA simulator is disabled")
+
+    # Only pixel (1, 1) of a 2x2 image counts hits, so every thread increments the same counters
+    blocks, threads_per_block, samples_per_thread = 4, 64, 4
+    channel_iterations = (30, 60, 100)
+
+    rng_states = create_cuda_states(blocks * threads_per_block, seed=13)
+    initial_rng_states = rng_states.copy_to_host()
+
+    device_counters = cuda.to_device(np.zeros((len(channel_iterations), 2, 2), dtype=np.uint64))
+    buddhabrot_cuda[blocks, threads_per_block](device_counters, rng_states, 2, 2, np.array(channel_iterations),
+                                               samples_per_thread, *VIEW, True)
+
+    expected = serial_buddhabrot(initial_rng_states, xoroshiro128p_uniform_float32,
+                                 [samples_per_thread] * (blocks * threads_per_block), channel_iterations, True, 2, 2)
+
+    assert expected[:, 1, 1].min() > 100
+    np.testing.assert_array_equal(device_counters.copy_to_host(), expected)
+
+
+@pytest.mark.parametrize("binned", [False, True])
+def test_metropolis_matches_uniform_sampling(binned, monkeypatch):
+    # Histograms too large for private copies are traced into bins, here small ones that take many rounds
+    if binned:
+        monkeypatch.setattr(fractals.Buddhabrot, "PRIVATE_COUNTERS_BYTES", 0)
+        monkeypatch.setattr(fractals.Buddhabrot, "BINS_BYTES", 1024 * 1024)
+
+    # The view covers the sampling domain of Metropolis-Hastings sampling, so both modes render the same buddhabrot
+    fractal = Buddhabrot(Plane2d(48, 48), ComplexPlane(-2.0, 2.0, -2.0, 2.0), 100, HsvColor())
+
+    uniform_samples, metropolis_samples = 16000000, 4000000
+    uniform = fractal.compute_counters(uniform_samples, seed=1)[0]
+    metropolis = fractal.compute_counters(metropolis_samples, seed=1, sampling="metropolis", warmup_samples=100)[0]
+
+    # Each step of the chains counts as one uniform sample on average
+    assert 0.9 < (metropolis.sum() / metropolis_samples) / (uniform.sum() / uniform_samples) < 1.1
+
+    # Unweighted chains are off by about 0.08, and the noise is about 0.02 at these sample counts
+    difference = np.abs(metropolis / metropolis.sum() - uniform / uniform.sum()).sum()
+    assert difference < 0.05
+
+
+@pytest.mark.parametrize("sampling", ["uniform", "metropolis"])
+def test_seed_reproduces_histogram(sampling):
+    fractal = Buddhabrot(Plane2d(WIDTH, HEIGHT), ComplexPlane(*VIEW), 100, HsvColor())
+
+    counters = fractal.compute_counters(50000, seed=3, sampling=sampling, warmup_samples=10)
+
+    np.testing.assert_array_equal(fractal.compute_counters(50000, seed=3, sampling=sampling, warmup_samples=10),
+                                  counters)
+    assert (fractal.compute_counters(50000, seed=4, sampling=sampling, warmup_samples=10) != counters).any()
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.mark.parametrize("sampling", ["uniform", "metropolis"])
+def test_resumed_checkpoint_matches_uninterrupted_run(sampling, tmp_path, monkeypatch):
+    monkeypatch.setattr(fractals.Buddhabrot, "BATCH_SAMPLES", 10000)
+    fractal = Buddhabrot(Plane2d(WIDTH, HEIGHT), ComplexPlane(*VIEW), 100, HsvColor())
+    total_samples = 55000
+
+    expected = fractal.compute_counters(total_samples, seed=3, sampling=sampling, warmup_samples=10)
+
+    # Crash while saving the third batch, which was traced into the histogram in memory but is not on disk
+    save = BuddhabrotCheckpoint.save
+
+    def crashing_save(checkpoint, rng_states, samples):
+        if samples > 20000:
+            raise Crash()
+
+        save(checkpoint, rng_states, samples)
+
+    path = str(tmp_path / "checkpoint")
+    checkpoint = BuddhabrotCheckpoint.create(path, fractal.counters_shape, {}, fractal.counters_dtype(sampling))
+    with monkeypatch.context() as context:
+        context.setattr(BuddhabrotCheckpoint, "save", crashing_save)
+
+        with pytest.raises(Crash):
+            fractal.compute_counters(total_samples, seed=3, sampling=sampling, warmup_samples=10,
+                                     checkpoint=checkpoint, checkpoint_interval=0)
+
+    checkpoint = BuddhabrotCheckpoint.open(path)
+    assert checkpoint.samples == 20000
+
+    counters = fractal.compute_counters(total_samples, seed=3, sampling=sampling, warmup_samples=10,
+                                        checkpoint=checkpoint, checkpoint_interval=0)
+
+    np.testing.assert_array_equal(counters, expected)
+    np.testing.assert_array_equal(BuddhabrotCheckpoint.open(path).counters, expected)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from fractals.BurningShip import BurningShip
+from fractals.Julia import Julia
+from fractals.Mandelbrot import Mandelbrot
+from fractals.common import Plane2d, ComplexPlane, HsvColor
+
+PLANE = Plane2d(320, 200)
+HSV_COLOR = HsvColor(204, 0.64, 8.0)
+
+# Full set, a view asymmetric about the real axis, and a zoom on the period-3 minibrot. Views whose filaments are
+# thinner than a pixel are avoided, as Mariani-Silver cannot see them cross the border of a rectangle.
+MANDELBROT_VIEWS = [ComplexPlane(-2.2, 1.2, -1.2, 1.2), ComplexPlane(-1.5, 0.5, -0.2, 1.1),
+                    ComplexPlane(-1.79, -1.72, -0.025, 0.025)]
+
+JULIA_VIEWS = [ComplexPlane(-1.6, 1.6, -1.0, 1.0), ComplexPlane(-0.4, 0.6, 0.1, 0.7)]
+
+JULIA_CONSTANTS = [(-0.8, 0.156), (0.285, 0.01)]
+
+
+@pytest.mark.parametrize("complex_plane", MANDELBROT_VIEWS)
+def test_mandelbrot_matches_brute_force(complex_plane):
+    mandelbrot = Mandelbrot(PLANE, complex_plane, 256, HSV_COLOR)
+
+    expected = mandelbrot.compute_field("numba", engine="brute-force")
+    field = mandelbrot.compute_field("numba", engine="mariani-silver")
+
+    np.testing.assert_array_equal(field, expected)
+
+
+@pytest.mark.parametrize("cx, cy", JULIA_CONSTANTS)
+@pytest.mark.parametrize("complex_plane", JULIA_VIEWS)
+def test_julia_matches_brute_force(complex_plane, cx, cy):
+    julia = Julia(PLANE, complex_plane, 256, HSV_COLOR, cx, cy)
+
+    expected = julia.compute_field("numba", engine="brute-force")
+    field = julia.compute_field("numba", engine="mariani-silver")
+
+    np.testing.assert_array_equal(field, expected)
+
+
+def test_burning_ship_rejects_mariani_silver():
+    burning_ship = BurningShip(PLANE, ComplexPlane(-2.2, 1.2, -1.8, 0.6), 256, HSV_COLOR)
+
+    with pytest.raises(ValueError, match="mariani-silver"):
+        burning_ship.compute_field("numba", engine="mariani-silver")
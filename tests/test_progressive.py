@@ -0,0 +1,26 @@
+import numpy as np
+
+from fractals.Mandelbrot import Mandelbrot
+from fractals.common import Plane2d, ComplexPlane, HsvColor
+
+# The blocks do not divide the image
+PLANE = Plane2d(100, 70)
+FIRST_BLOCK_SIZE = 16
+
+
+def test_frames_own_their_samples():
+    mandelbrot = Mandelbrot(PLANE, ComplexPlane(-2.2, 1.2, -1.2, 1.2), 256, HsvColor())
+
+    frames = []
+    for frame in mandelbrot.compute_progressive("numba", first_block_size=FIRST_BLOCK_SIZE):
+        frames.append(frame)
+
+        # As a caller colorizing the samples in place would
+        if not frame.is_final:
+            frame.samples[:] = -1.0
+
+    assert frames[-1].is_final
+    np.testing.assert_array_equal(frames[-1].field, mandelbrot.compute_field("numba"))
+    assert all(frame.changed_fraction < 1.0 for frame in frames[1:])
+    assert all(np.all(frame.samples == -1.0) for frame in frames[:-1])
+
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from fractals.Buddhabrot import Buddhabrot
+from fractals.checkpoint import BuddhabrotCheckpoint
+from fractals.common import Plane2d, ComplexPlane, HsvColor
+from fractals.sharding import run_shard, merge_shards, shard_job, shard_path
+
+SHARD_COUNT = 3
+TOTAL_SAMPLES = 30001
+SEED = 5
+
+
+@pytest.fixture
+def buddhabrot():
+    return Buddhabrot(Plane2d(40, 32), ComplexPlane(-2.2, 1.2, -1.2, 1.2), 100, HsvColor())
+
+
+def run_shards(buddhabrot, directory, shard_indices=range(0, SHARD_COUNT)):
+    for shard_index in shard_indices:
+        run_shard(buddhabrot, str(directory), shard_index, SHARD_COUNT, TOTAL_SAMPLES, SEED)
+
+
+def merge(buddhabrot, directory, allow_partial=False, seed=SEED):
+    job = shard_job(buddhabrot, SHARD_COUNT, TOTAL_SAMPLES, seed, "uniform", 1000)
+
+    return merge_shards(str(directory), job, buddhabrot.counters_shape, allow_partial=allow_partial)
+
+
+def test_merge_sums_shards(buddhabrot, tmp_path):
+    run_shards(buddhabrot, tmp_path)
+
+    counters, samples = merge(buddhabrot, tmp_path)
+
+    expected = sum(BuddhabrotCheckpoint.open(shard_path(str(tmp_path), shard_index)).counters
+                   for shard_index in range(0, SHARD_COUNT))
+    assert samples == TOTAL_SAMPLES
+    assert counters.sum() > 0
+    np.testing.assert_array_equal(counters, expected)
+
+
+def test_merge_rejects_missing_shards(buddhabrot, tmp_path):
+    run_shards(buddhabrot, tmp_path, [0, 2])
+
+    with pytest.raises(ValueError, match="Shards 1 of 3 are missing"):
+        merge(buddhabrot, tmp_path)
+
+    _, samples = merge(buddhabrot, tmp_path, allow_partial=True)
+    assert samples < TOTAL_SAMPLES
+
+
+def test_merge_rejects_unfinished_shards(buddhabrot, tmp_path):
+    run_shards(buddhabrot, tmp_path)
+
+    # As if shard 1 were still running on another host
+    checkpoint = BuddhabrotCheckpoint.open(shard_path(str(tmp_path), 1))
+    checkpoint.save(checkpoint.rng_states, 1)
+
+    with pytest.raises(ValueError, match="Shards 1 of 3 have not finished"):
+        merge(buddhabrot, tmp_path)
+
+    merge(buddhabrot, tmp_path, allow_partial=True)
+
+
+def test_merge_rejects_shards_of_another_job(buddhabrot, tmp_path):
+    run_shards(buddhabrot, tmp_path)
+
+    with pytest.raises(ValueError, match="seed is 5 instead of 6"):
+        merge(buddhabrot, tmp_path, seed=6)
+
+
+def test_merge_rejects_empty_directory(buddhabrot, tmp_path):
+    with pytest.raises(ValueError, match="No shards found"):
+        merge(buddhabrot, tmp_path, allow_partial=True)
@@ -0,0 +1,65 @@
+import functools
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from fractals.Mandelbrot import Mandelbrot
+from fractals.common import Plane2d, ComplexPlane, HsvColor, DeepZoomView
+from fractals.perturbation import reference_orbit
+from fractals.tiling import render_tiles
+from fractals.writers import open_writer, FORMATS
+
+# The tiles do not divide the image, and the image spans several TIFF tiles
+PLANE = Plane2d(300, 200)
+TILE_SIZE = 48
+
+DEEP_ZOOM_VIEW = DeepZoomView("-0.743643887037158704752191506114774", "0.131825904205311970493132056385139", "1e8")
+
+# A low intensity keeps the colors of slowly escaping pixels apart
+HSV_COLOR = HsvColor(204, 0.64, 1.0)
+
+
+def read_image(path, image_format):
+    if image_format == "npy":
+        return np.load(path)
+
+    if image_format == "raw":
+        return np.fromfile(path, dtype=np.uint8).reshape(PLANE.height, PLANE.width, 3)
+
+    with Image.open(path) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def render(compute_field, colorize, path, image_format):
+    with open_writer(str(path), PLANE, image_format, threads=2) as writer:
+        render_tiles(compute_field, colorize, PLANE, writer, TILE_SIZE)
+
+    return read_image(str(path), image_format)
+
+
+@pytest.mark.parametrize("image_format", FORMATS)
+def test_tiles_match_monolithic_render(image_format, tmp_path):
+    # The view is symmetric about the real axis, so tiles also copy mirrored pixels
+    mandelbrot = Mandelbrot(PLANE, ComplexPlane(-2.2, 1.2, -1.2, 1.2), 256, HSV_COLOR)
+
+    pixels = render(functools.partial(mandelbrot.compute_field, "numba"), mandelbrot.colorize,
+                    tmp_path / f"image.{image_format}", image_format)
+
+    np.testing.assert_array_equal(pixels, mandelbrot.compute("numba"))
+
+
+@pytest.mark.parametrize("image_format", FORMATS)
+def test_deep_zoom_tiles_match_monolithic_render(image_format, tmp_path):
+    mandelbrot = Mandelbrot(PLANE, ComplexPlane(), 3000, HSV_COLOR)
+
+    reference_orbit.cache_clear()
+    expected = mandelbrot.compute_deep_zoom(DEEP_ZOOM_VIEW, "numba")
+    assert len(np.unique(expected.reshape(-1, 3), axis=0)) > 100
+
+    pixels = render(functools.partial(mandelbrot.compute_deep_zoom_field, DEEP_ZOOM_VIEW, "numba"),
+                    mandelbrot.colorize, tmp_path / f"image.{image_format}", image_format)
+
+    # Every tile reuses the reference orbit of the monolithic render
+    assert reference_orbit.cache_info().misses == 1
+    np.testing.assert_array_equal(pixels, expected)